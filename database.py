@@ -1,12 +1,29 @@
 try:
     import psycopg2
+    import psycopg2.errors
     from psycopg2.extras import RealDictCursor
 except Exception as e:
     raise RuntimeError(
         "psycopg2 не установлен или недоступен в этом окружении. Установите его: `pip install psycopg2-binary`"
     ) from e
 
+import base64
+import bisect
+import functools
+import inspect
+import itertools
+import json
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from dateutil.rrule import rrulestr
+
+from schedule_index import WEEK_TYPES, ScheduleIndex, WeekTypeIndex, as_date, as_time, conflict_text
 
 # параметры подключения
 DB_CONFIG = {
@@ -17,34 +34,822 @@ DB_CONFIG = {
     "password": "1234567890"
 }
 
+# параметры пула соединений
+DB_POOL_CONFIG = {
+    "maxconn": 5,
+    # сколько секунд ждать свободное соединение, прежде чем выдать ошибку
+    "acquire_timeout": 10,
+    # соединение, простоявшее дольше этого (сек), проверяется запросом SELECT 1
+    "health_check_interval": 30,
+    # настройки сессии, выставляются один раз на каждое новое соединение
+    "session": {
+        "application_name": "study_tracker",
+        "statement_timeout": "10s",
+        "idle_in_transaction_session_timeout": "60s",
+    },
+}
+
+# параметры кэша справочных таблиц (предметы, преподаватели, темы, настройки)
+DB_CACHE_CONFIG = {
+    "max_entries": 256,
+    # через сколько секунд запись считается устаревшей
+    "ttl": 300,
+}
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Соединение пула: помнит, какие prepared statements на нём уже созданы"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.backend_pid = self.get_backend_pid()
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений с проверкой здоровья и счётчиками"""
+
+    def __init__(self, config, pool_config):
+        self.config = config
+        self.maxconn = pool_config.get("maxconn", 5)
+        self.acquire_timeout = pool_config.get("acquire_timeout", 10)
+        self.health_check_interval = pool_config.get("health_check_interval", 30)
+        self.session = dict(pool_config.get("session") or {})
+
+        self._lock = threading.Condition()
+        self._idle = []  # список (conn, время возврата в пул)
+        self._in_use = 0
+        self._closed = False
+        # pid серверных процессов наших соединений: свои NOTIFY лента изменений пропускает
+        self.backend_pids = set()
+
+        self.stats = {
+            "hits": 0,  # выдано уже открытое соединение
+            "connects": 0,  # открыто новых соединений
+            "waits": 0,  # сколько раз ждали освобождения соединения
+            "wait_time_total": 0.0,
+            "connect_time_total": 0.0,
+            "connect_time_max": 0.0,
+            "health_check_failures": 0,
+            "discarded": 0,  # закрыто битых соединений
+        }
+
+    def _connect(self):
+        """Открывает новое соединение и выставляет настройки сессии"""
+        started = time.perf_counter()
+        try:
+            conn = psycopg2.connect(
+                host=self.config["host"],
+                port=self.config["port"],
+                dbname=self.config["dbname"],
+                user=self.config["user"],
+                password=self.config["password"],
+                connection_factory=PooledConnection,
+                cursor_factory=TimedCursor
+            )
+            if self.session:
+                with conn.cursor() as cur:
+                    for name, value in self.session.items():
+                        cur.execute("SELECT set_config(%s, %s, false)", (name, str(value)))
+                conn.commit()
+        except Exception as e:
+            # конвертируем ошибку подключения в более понятную для UI/лога
+            raise RuntimeError(f"DB connection failed: {e}") from e
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.backend_pids.add(conn.backend_pid)
+            self.stats["connects"] += 1
+            self.stats["connect_time_total"] += elapsed
+            self.stats["connect_time_max"] = max(self.stats["connect_time_max"], elapsed)
+        return conn
+
+    def _is_healthy(self, conn, idle_since):
+        """Проверяет, что соединение живое, прежде чем отдать его"""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self.backend_pids.discard(conn.backend_pid)
+
+    def _discard(self, conn):
+        self._close(conn)
+        with self._lock:
+            self.stats["discarded"] += 1
+
+    def getconn(self):
+        """Берёт соединение из пула (или открывает новое)"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("DB connection failed: пул соединений закрыт")
+
+            if not self._idle and self._in_use >= self.maxconn:
+                self.stats["waits"] += 1
+                started = time.perf_counter()
+                deadline = time.monotonic() + self.acquire_timeout
+                while not self._idle and self._in_use >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RuntimeError(
+                            f"DB connection failed: нет свободных соединений за {self.acquire_timeout} с"
+                        )
+                    self._lock.wait(remaining)
+                self.stats["wait_time_total"] += time.perf_counter() - started
+
+            idle = self._idle.pop() if self._idle else None
+            self._in_use += 1
+
+        try:
+            if idle is not None:
+                conn, idle_since = idle
+                if self._is_healthy(conn, idle_since):
+                    with self._lock:
+                        self.stats["hits"] += 1
+                    return conn
+                with self._lock:
+                    self.stats["health_check_failures"] += 1
+                self._discard(conn)
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def putconn(self, conn, broken=False):
+        """Возвращает соединение в пул; битые соединения закрываются"""
+        if broken or conn.closed:
+            self._discard(conn)
+        with self._lock:
+            self._in_use -= 1
+            keep = not conn.closed and not broken and not self._closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+        if not keep and not conn.closed:
+            self._close(conn)
+
+    def closeall(self):
+        """Закрывает все простаивающие соединения"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._in_use
+        stats["connect_time_avg"] = (
+            stats["connect_time_total"] / stats["connects"] if stats["connects"] else 0.0
+        )
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Возвращает общий пул соединений (создаётся при первом обращении)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, DB_POOL_CONFIG)
+    return _pool
+
+
+def get_pool_stats():
+    """Счётчики пула: попадания, ожидания, время подключения"""
+    return get_pool().get_stats()
+
+
+def _is_local_backend(pid):
+    """Принадлежит ли серверный процесс pid одному из соединений нашего пула"""
+    pool = _pool
+    return pool is not None and pid in pool.backend_pids
+
+
+def close_pool():
+    """Закрывает пул (например, при выходе из приложения)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+# соединение текущей сессии (unit of work) для каждого потока
+_local = threading.local()
+
+
 # контекстный менеджер для подключения к базе
 @contextmanager
 def get_connection():
-    try:
-        conn = psycopg2.connect(
-            host=DB_CONFIG["host"],
-            port=DB_CONFIG["port"],
-            dbname=DB_CONFIG["dbname"],
-            user=DB_CONFIG["user"],
-            password=DB_CONFIG["password"],
-            cursor_factory=RealDictCursor
-        )
-    except Exception as e:
-        # конвертируем ошибку подключения в более понятную для UI/лога
-        raise RuntimeError(f"DB connection failed: {e}") from e
+    session_conn = getattr(_local, "conn", None)
+    if session_conn is not None:
+        # внутри session(): работаем в её транзакции, COMMIT будет один - при выходе из сессии
+        yield session_conn
+        return
+
+    pool = get_pool()
+    span = _current_span()
+    if span is None:
+        conn = pool.getconn()
+    else:
+        started = time.perf_counter()
+        conn = pool.getconn()
+        elapsed = (time.perf_counter() - started) * 1000
+        span["connect"] += elapsed
+        _metrics.record_connect(elapsed)
+    broken = False
 
     try:
         yield conn
         conn.commit()
     except Exception as e:
-        conn.rollback()
+        # соединение могло умереть посреди запроса - в пул его не возвращаем
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
         raise e
     finally:
-        conn.close()
+        pool.putconn(conn, broken=broken)
 
-# инициализация схемы (создаёт таблицы, если их ещё нет)
-def init_db():
-    statements = [
+
+@contextmanager
+def session():
+    """Единица работы: все функции этого модуля, вызванные внутри блока,
+    используют одно соединение и одну транзакцию с одним COMMIT в конце.
+
+    Пример:
+        with database.session():
+            tasks = database.get_regular_tasks()
+            subjects = database.get_subjects()
+
+    Ошибка внутри блока откатывает всю сессию. Вложенные session()
+    присоединяются к внешней.
+    """
+    if getattr(_local, "conn", None) is not None:
+        yield _local.conn
+        return
+
+    _local.pending_invalidations = set()
+    _local.pending_month_days = set()
+    try:
+        with get_connection() as conn:
+            _local.conn = conn
+            try:
+                yield conn
+            finally:
+                _local.conn = None
+    except Exception:
+        # в кэш могли попасть данные из откатанной транзакции
+        clear_cache()
+        raise
+    finally:
+        pending, _local.pending_invalidations = _local.pending_invalidations, None
+        pending_days, _local.pending_month_days = _local.pending_month_days, None
+
+    # повторный сброс после COMMIT: другие потоки могли успеть закэшировать старые данные
+    if pending:
+        invalidate_cache(*pending)
+    if pending_days:
+        invalidate_month_counts(*pending_days)
+
+# ----------------------------
+# ИЗМЕРЕНИЯ ЗАПРОСОВ
+# ----------------------------
+# Каждый вызов функции модуля - это замер (span): полное время, время получения
+# соединения, время выполнения запросов, число строк и экран, из которого пришёл
+# вызов. Замеры собираются в гистограммы по функциям; их можно посмотреть на
+# скрытом экране отладки (F12) или выгрузить в JSON через dump_db_metrics().
+
+# STUDY_TRACKER_DB_METRICS=1 - включить замеры. По умолчанию функции модуля
+# не оборачиваются: обёртка добавляет работу к каждому вызову базы.
+DB_METRICS_ENABLED = os.environ.get("STUDY_TRACKER_DB_METRICS") == "1"
+
+# верхние границы корзин гистограмм, мс (последняя корзина - всё, что дольше)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+class Histogram:
+    """Гистограмма длительностей (мс) с фиксированными корзинами"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Оценка перцентиля q (0..1) сверху: граница корзины, в которую он попал"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(float(bound), self.max)
+        return self.max
+
+    def to_dict(self):
+        buckets = {f"<={bound}": count for bound, count in zip(self.bounds, self.counts) if count}
+        if self.counts[-1]:
+            buckets[f">{self.bounds[-1]}"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max, 3),
+            "buckets": buckets,
+        }
+
+
+class DbMetrics:
+    """Потокобезопасное хранилище замеров: гистограммы по функциям и счётчики по экранам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.functions = {}  # функция -> счётчики и гистограммы
+            self.screens = {}  # экран -> {"entries": n, "calls": {функция: n}}
+            self.connects = Histogram()  # получение соединения из пула
+
+    def _screen(self, name):
+        screen = self.screens.get(name)
+        if screen is None:
+            screen = self.screens[name] = {"entries": 0, "calls": {}}
+        return screen
+
+    def record_entry(self, screen):
+        with self._lock:
+            self._screen(screen)["entries"] += 1
+
+    def record_connect(self, elapsed_ms):
+        with self._lock:
+            self.connects.add(elapsed_ms)
+
+    def record_call(self, name, screen, total_ms, connect_ms, execute_ms, rows, failed):
+        with self._lock:
+            stats = self.functions.get(name)
+            if stats is None:
+                stats = self.functions[name] = {
+                    "errors": 0,
+                    "rows": 0,
+                    "total": Histogram(),
+                    "connect": Histogram(),
+                    "execute": Histogram(),
+                }
+            stats["total"].add(total_ms)
+            stats["connect"].add(connect_ms)
+            stats["execute"].add(execute_ms)
+            stats["rows"] += rows
+            if failed:
+                stats["errors"] += 1
+            calls = self._screen(screen)["calls"]
+            calls[name] = calls.get(name, 0) + 1
+
+    def snapshot(self):
+        """Копия замеров в виде словаря (готова к json.dumps)"""
+        with self._lock:
+            functions = {
+                name: {
+                    "calls": stats["total"].count,
+                    "errors": stats["errors"],
+                    "rows": stats["rows"],
+                    "total": stats["total"].to_dict(),
+                    "connect": stats["connect"].to_dict(),
+                    "execute": stats["execute"].to_dict(),
+                }
+                for name, stats in self.functions.items()
+            }
+            screens = {
+                name: {"entries": screen["entries"], "calls": dict(screen["calls"])}
+                for name, screen in self.screens.items()
+            }
+            connects = self.connects.to_dict()
+            started = self.started
+        for screen in screens.values():
+            total_calls = sum(screen["calls"].values())
+            screen["total_calls"] = total_calls
+            screen["calls_per_entry"] = (
+                round(total_calls / screen["entries"], 2) if screen["entries"] else None
+            )
+        return {
+            "since": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+            "functions": functions,
+            "screens": screens,
+            "get_connection": connects,
+            "pool": _pool.get_stats() if _pool is not None else None,
+        }
+
+
+_metrics = DbMetrics()
+
+# экран, открытый в UI-потоке: ему приписываются вызовы без явного caller()
+_ui_caller = None
+
+
+def set_ui_caller(name):
+    """Запоминает текущий экран UI-потока и считает вход на него"""
+    global _ui_caller
+    _ui_caller = name
+    if name:
+        _metrics.record_entry(name)
+
+
+@contextmanager
+def caller(name):
+    """Приписывает вызовы функций модуля внутри блока экрану name (для фоновых потоков)"""
+    previous = getattr(_local, "caller", None)
+    _local.caller = name
+    try:
+        yield
+    finally:
+        _local.caller = previous
+
+
+def current_caller():
+    explicit = getattr(_local, "caller", None)
+    if explicit:
+        return explicit
+    if threading.current_thread() is threading.main_thread():
+        return _ui_caller or "main"
+    return threading.current_thread().name
+
+
+def _current_span():
+    spans = getattr(_local, "spans", None)
+    return spans[-1] if spans else None
+
+
+class TimedCursor(RealDictCursor):
+    """Курсор, добавляющий время выполнения и число строк к текущему замеру"""
+
+    def execute(self, query, vars=None):
+        span = _current_span()
+        if span is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            span["execute"] += (time.perf_counter() - started) * 1000
+            # у именованных (серверных) курсоров число строк заранее неизвестно
+            if self.rowcount > 0 and self.description is not None:
+                span["rows"] += self.rowcount
+
+
+def _instrumented(func):
+    """Оборачивает функцию модуля в замер"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        spans = getattr(_local, "spans", None)
+        if spans is None:
+            spans = _local.spans = []
+        span = {"connect": 0.0, "execute": 0.0, "rows": 0}
+        spans.append(span)
+        failed = False
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            total = (time.perf_counter() - started) * 1000
+            spans.pop()
+            if spans:
+                # вложенный вызов входит и в замер внешней функции
+                parent = spans[-1]
+                parent["connect"] += span["connect"]
+                parent["execute"] += span["execute"]
+                parent["rows"] += span["rows"]
+            _metrics.record_call(name, current_caller(), total, span["connect"],
+                                 span["execute"], span["rows"], failed)
+
+    return wrapper
+
+
+def get_db_metrics():
+    """Замеры вызовов функций модуля: гистограммы по функциям и счётчики по экранам"""
+    return _metrics.snapshot()
+
+
+def get_slowest_functions(limit=10, key="p95_ms"):
+    """Самые медленные функции по полю гистограммы полного времени (p95_ms, avg_ms, max_ms, total_ms)"""
+    functions = get_db_metrics()["functions"]
+    ranked = sorted(functions.items(), key=lambda item: item[1]["total"][key], reverse=True)
+    return ranked[:limit]
+
+
+def dump_db_metrics(path=None):
+    """Возвращает замеры в виде JSON; если указан path - ещё и записывает в файл"""
+    data = json.dumps(get_db_metrics(), ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+    return data
+
+
+def reset_db_metrics():
+    """Обнуляет замеры"""
+    _metrics.reset()
+
+# ----------------------------
+# КЭШ СПРАВОЧНЫХ ТАБЛИЦ
+# ----------------------------
+
+class QueryCache:
+    """LRU-кэш результатов чтения справочных таблиц с TTL.
+
+    Каждая запись помечена таблицами, из которых она прочитана; запись в
+    таблицу (add_/update_/delete_) сбрасывает все связанные с ней записи.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # ключ -> (истекает, таблицы, значение)
+        self._generations = {}  # таблица -> номер поколения
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def generation(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def get(self, key):
+        """Возвращает (найдено, значение)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return True, entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return False, None
+
+    def put(self, key, tables, value, generation, ttl=None):
+        with self._lock:
+            # пока шёл запрос, таблицу успели изменить - результат уже устарел
+            if tuple(self._generations.get(table, 0) for table in tables) != generation:
+                return
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (expires, tables, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, entry in self._entries.items()
+                     if any(table in entry[1] for table in tables)]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            for table in self._generations:
+                self._generations[table] += 1
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_cache = QueryCache(**DB_CACHE_CONFIG)
+
+
+def cached(*tables, ttl=None):
+    """Декоратор read-through кэша для функций чтения из таблиц tables.
+
+    ttl - собственное время жизни записей (по умолчанию из DB_CACHE_CONFIG).
+    """
+    def decorator(func):
+        def make_key(args, kwargs):
+            return func.__name__, args, tuple(sorted(kwargs.items()))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            found, value = _cache.get(key)
+            if found:
+                return value
+            generation = _cache.generation(tables)
+            value = func(*args, **kwargs)
+            _cache.put(key, tables, value, generation, ttl)
+            return value
+
+        # прямой запрос в обход кэша
+        wrapper.uncached = func
+        # (найдено, значение) только из кэша, без запроса к базе - для UI-потока
+        wrapper.peek = lambda *args, **kwargs: _cache.get(make_key(args, kwargs))
+        return wrapper
+    return decorator
+
+
+def invalidate_cache(*tables):
+    """Сбрасывает закэшированные чтения из указанных таблиц"""
+    _cache.invalidate(*tables)
+    pending = getattr(_local, "pending_invalidations", None)
+    if pending is not None and getattr(_local, "conn", None) is not None:
+        pending.update(tables)
+
+
+def clear_cache():
+    _cache.clear()
+    _month_counts.clear()
+
+
+def get_cache_stats():
+    """Счётчики кэша: попадания, промахи, вытеснения, сбросы"""
+    return _cache.get_stats()
+
+# ----------------------------
+# ЛЕНТА ИЗМЕНЕНИЙ (LISTEN/NOTIFY)
+# ----------------------------
+# Триггеры (миграция 5) шлют NOTIFY с именем изменённой таблицы. Фоновый поток
+# слушает канал и увеличивает версию таблицы, а экраны перезагружают данные,
+# только если версии их таблиц сдвинулись с прошлого раза. Собственные записи
+# версии сдвигают ровно на один шаг (mark_changed), их эхо по NOTIFY пропускается.
+
+CHANGE_CHANNEL = "study_tracker_changes"
+
+
+class ChangeFeed:
+    """Версии таблиц, обновляемые по NOTIFY и по локальным записям"""
+
+    def __init__(self, config, channel=CHANGE_CHANNEL, poll_timeout=5, retry_delay=10):
+        self.config = config
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self.retry_delay = retry_delay
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # True, пока соединение LISTEN живо: только тогда версиям можно верить
+        self.live = False
+
+    def bump(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def bump_all(self):
+        with self._lock:
+            for table in self._versions:
+                self._versions[table] += 1
+
+    def versions(self, *tables):
+        """Кортеж версий таблиц или None, если ленте сейчас нельзя доверять"""
+        if not self.live:
+            return None
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(
+                    host=self.config["host"],
+                    port=self.config["port"],
+                    dbname=self.config["dbname"],
+                    user=self.config["user"],
+                    password=self.config["password"]
+                )
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+
+                # пока соединения не было, уведомления могли потеряться
+                self.bump_all()
+                _cache.clear()
+                _month_counts.clear()
+                self.live = True
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    conn.poll()
+                    changed = set()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        # свои записи уже учтены в mark_changed
+                        if not _is_local_backend(notify.pid):
+                            changed.add(notify.payload)
+                    if changed:
+                        self.bump(*changed)
+                        _cache.invalidate(*changed)
+                        # какие дни затронула чужая запись, неизвестно
+                        if "tasks" in changed:
+                            _month_counts.clear()
+            except Exception as e:
+                print("DB: лента изменений недоступна:", e)
+            finally:
+                self.live = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop.wait(self.retry_delay)
+
+
+_change_feed = ChangeFeed(DB_CONFIG)
+
+
+def start_change_listener():
+    """Запускает фоновый поток LISTEN (вызывается при старте приложения)"""
+    _change_feed.start()
+
+
+def stop_change_listener():
+    _change_feed.stop()
+
+
+def mark_changed(*tables):
+    """Отмечает локальную запись в таблицы: сдвигает их версии и сбрасывает кэш"""
+    _change_feed.bump(*tables)
+    invalidate_cache(*tables)
+
+
+def get_table_versions(*tables):
+    """Версии таблиц для проверки «изменилось ли что-то с прошлой загрузки».
+
+    Возвращает None, если лента изменений не подключена - тогда экран должен
+    перезагрузить данные как обычно.
+    """
+    return _change_feed.versions(*tables)
+
+# ----------------------------
+# МИГРАЦИИ СХЕМЫ
+# ----------------------------
+
+# версионированные шаги схемы: (версия, описание, список SQL).
+# Новые шаги добавляются только в конец, уже выпущенные не меняются.
+MIGRATIONS = [
+    (1, "базовая схема", [
         """
         CREATE TABLE IF NOT EXISTS settings (
             id SERIAL PRIMARY KEY,
@@ -82,7 +887,7 @@ def init_db():
             id SERIAL PRIMARY KEY,
             name TEXT,
             subject_id INTEGER REFERENCES subjects(id) ON DELETE CASCADE,
-            type TEXT  -- ТОЛЬКО ОДИН РАЗ ЗДЕСЬ
+            type TEXT
         )
         """,
         """
@@ -124,32 +929,405 @@ def init_db():
             reminder_time TIMESTAMP
         )
         """
-    ]
+    ]),
+    (2, "столбец topics.type для старых баз", [
+        "ALTER TABLE topics ADD COLUMN IF NOT EXISTS type TEXT"
+    ]),
+    (3, "отметка переноса просроченных задач", [
+        """
+        CREATE TABLE IF NOT EXISTS sweep_state (
+            name TEXT PRIMARY KEY,
+            watermark TIMESTAMP
+        )
+        """
+    ]),
+    (4, "индексы для основных запросов", [
+        # фильтры и сортировки экранов по дедлайну, типу и статусу
+        "CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks (due_date)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_type_due_date ON tasks (type, due_date)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_status_due_date ON tasks (status, due_date)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_subject_due_date ON tasks (subject_id, due_date)",
+        # кандидаты для переноса в задолженности
+        """
+        CREATE INDEX IF NOT EXISTS idx_tasks_overdue_candidates ON tasks (due_date)
+        WHERE is_automatic_debt = FALSE
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_topics_subject_id ON topics (subject_id)",
+        "CREATE INDEX IF NOT EXISTS idx_schedule_day_start ON schedule (day_of_week, start_time)",
+        "CREATE INDEX IF NOT EXISTS idx_attachments_task_id ON attachments (task_id)",
+        "CREATE INDEX IF NOT EXISTS idx_reminders_reminder_time ON reminders (reminder_time)",
+        "CREATE INDEX IF NOT EXISTS idx_reminders_task_id ON reminders (task_id)",
+    ]),
+    (5, "уведомления об изменениях таблиц (LISTEN/NOTIFY)", [
+        """
+        CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('study_tracker_changes', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ] + [
+        stmt
+        for table in ("tasks", "topics", "subjects", "schedule", "teachers", "reminders", "settings")
+        for stmt in (
+            f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table}",
+            f"""
+            CREATE TRIGGER {table}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+            """,
+        )
+    ]),
+    (6, "индексы для постраничной загрузки списков", [
+        "CREATE INDEX IF NOT EXISTS idx_tasks_created_at_id ON tasks (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_type_due_date_id ON tasks (type, due_date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_topics_name_id ON topics (name, id)",
+    ]),
+    (7, "отметка сработавших напоминаний", [
+        "ALTER TABLE reminders ADD COLUMN IF NOT EXISTS fired_at TIMESTAMP",
+        # планировщик читает только ещё не сработавшие напоминания, окнами по времени
+        """
+        CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (reminder_time, id)
+        WHERE fired_at IS NULL
+        """,
+    ]),
+    (8, "повторяющиеся задачи", [
+        # правило повторения (RRULE) у задачи-шаблона
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS recurrence TEXT",
+        # выполненное или изменённое повторение: шаблон и исходная дата повторения
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS recurrence_parent_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS occurrence_date TIMESTAMP",
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_occurrence ON tasks (recurrence_parent_id, occurrence_date)
+        WHERE recurrence_parent_id IS NOT NULL
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_tasks_recurring ON tasks (id) WHERE recurrence IS NOT NULL",
+    ]),
+    (9, "пары расписания одного дня не пересекаются", [
+        # Ограничение создаётся, только если расширение доступно и в таблице ещё нет
+        # пересекающихся пар; иначе пересечения проверяет только приложение.
+        """
+        DO $$
+        BEGIN
+            BEGIN
+                CREATE EXTENSION IF NOT EXISTS btree_gist;
+            EXCEPTION WHEN insufficient_privilege THEN
+                RAISE NOTICE 'нет прав на btree_gist - ограничение на пересечение пар не создано';
+                RETURN;
+            END;
+            IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'schedule_no_overlap') THEN
+                RETURN;
+            END IF;
+            IF EXISTS (
+                SELECT 1 FROM schedule a JOIN schedule b
+                ON a.day_of_week = b.day_of_week AND a.id < b.id
+                AND a.start_time < b.end_time AND b.start_time < a.end_time
+            ) OR EXISTS (SELECT 1 FROM schedule WHERE start_time >= end_time) THEN
+                RAISE NOTICE 'в расписании есть пересекающиеся пары - ограничение не создано';
+                RETURN;
+            END IF;
+            ALTER TABLE schedule ADD CONSTRAINT schedule_time_order CHECK (start_time < end_time);
+            ALTER TABLE schedule ADD CONSTRAINT schedule_no_overlap EXCLUDE USING gist (
+                day_of_week WITH =,
+                tsrange(DATE '2000-01-01' + start_time, DATE '2000-01-01' + end_time) WITH &&
+            ) WHERE (start_time IS NOT NULL AND end_time IS NOT NULL);
+        END
+        $$
+        """,
+    ]),
+    (10, "пары по нечётным/чётным неделям и в пределах семестра", [
+        """
+        ALTER TABLE schedule
+            ADD COLUMN IF NOT EXISTS week_type VARCHAR(4)
+                CONSTRAINT schedule_week_type CHECK (week_type IN ('odd', 'even')),
+            ADD COLUMN IF NOT EXISTS valid_from DATE,
+            ADD COLUMN IF NOT EXISTS valid_until DATE,
+            ADD CONSTRAINT schedule_valid_order CHECK (valid_from <= valid_until)
+        """,
+        # пары разных типов недель и с непересекающимися датами больше не конфликтуют:
+        # тип недели - диапазон 1 (нечётная), 2 (чётная) или оба
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'schedule_no_overlap') THEN
+                RETURN;
+            END IF;
+            ALTER TABLE schedule DROP CONSTRAINT schedule_no_overlap;
+            ALTER TABLE schedule ADD CONSTRAINT schedule_no_overlap EXCLUDE USING gist (
+                day_of_week WITH =,
+                tsrange(DATE '2000-01-01' + start_time, DATE '2000-01-01' + end_time) WITH &&,
+                int4range(CASE WHEN week_type = 'even' THEN 2 ELSE 1 END,
+                          CASE WHEN week_type = 'odd' THEN 2 ELSE 3 END) WITH &&,
+                daterange(valid_from, valid_until, '[]') WITH &&
+            ) WHERE (start_time IS NOT NULL AND end_time IS NOT NULL);
+        END
+        $$
+        """,
+    ]),
+    (11, "ограничение на пересечение пар там, где шаг 9 его не создал", [
+        # Шаг 9 ловил только нехватку прав: без пакета contrib он падал и отмечался
+        # пропущенным (OPTIONAL_MIGRATIONS). Здесь любая ошибка расширения - только NOTICE.
+        """
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'schedule_no_overlap') THEN
+                RETURN;
+            END IF;
+            BEGIN
+                CREATE EXTENSION IF NOT EXISTS btree_gist;
+            EXCEPTION WHEN OTHERS THEN
+                RAISE NOTICE 'btree_gist недоступно (%) - ограничение на пересечение пар не создано', SQLERRM;
+                RETURN;
+            END;
+            IF EXISTS (
+                SELECT 1 FROM schedule a JOIN schedule b
+                ON a.day_of_week = b.day_of_week AND a.id < b.id
+                AND a.start_time < b.end_time AND b.start_time < a.end_time
+                AND (a.week_type IS NULL OR b.week_type IS NULL OR a.week_type = b.week_type)
+                AND daterange(a.valid_from, a.valid_until, '[]') && daterange(b.valid_from, b.valid_until, '[]')
+            ) OR EXISTS (SELECT 1 FROM schedule WHERE start_time >= end_time) THEN
+                RAISE NOTICE 'в расписании есть пересекающиеся пары - ограничение не создано';
+                RETURN;
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'schedule_time_order') THEN
+                ALTER TABLE schedule ADD CONSTRAINT schedule_time_order CHECK (start_time < end_time);
+            END IF;
+            ALTER TABLE schedule ADD CONSTRAINT schedule_no_overlap EXCLUDE USING gist (
+                day_of_week WITH =,
+                tsrange(DATE '2000-01-01' + start_time, DATE '2000-01-01' + end_time) WITH &&,
+                int4range(CASE WHEN week_type = 'even' THEN 2 ELSE 1 END,
+                          CASE WHEN week_type = 'odd' THEN 2 ELSE 3 END) WITH &&,
+                daterange(valid_from, valid_until, '[]') WITH &&
+            ) WHERE (start_time IS NOT NULL AND end_time IS NOT NULL);
+        END
+        $$
+        """,
+    ]),
+    (12, "напоминания из прошлого считаются сработавшими", [
+        # миграция 7 оставила fired_at пустым у всех старых напоминаний, и при первом
+        # запуске планировщика сработала бы вся их история
+        """
+        UPDATE reminders SET fired_at = reminder_time
+        WHERE fired_at IS NULL AND reminder_time < NOW()
+        """,
+    ]),
+]
 
+# Шаги, которым нужны расширения сервера. Если такой шаг падает, он откатывается
+# до точки сохранения и отмечается пропущенным, а следующие шаги применяются.
+OPTIONAL_MIGRATIONS = {9}
+
+# ключ advisory-блокировки: миграции применяет только один клиент за раз
+MIGRATION_LOCK_ID = 727000
+
+
+def get_schema_version():
+    """Текущая версия схемы (0 - база ещё не инициализирована)"""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            for stmt in statements:
-                cur.execute(stmt)
+            # таблицу проверяем без ошибки: ROLLBACK после UndefinedTable откатил бы
+            # и работу открытой session(), в транзакции которой идёт запрос
+            cur.execute("SELECT to_regclass('schema_version') IS NOT NULL AS present")
+            if not cur.fetchone()['present']:
+                return 0
+            cur.execute("SELECT MAX(version) AS version FROM schema_version")
+            return cur.fetchone()['version'] or 0
+
+
+def migrate():
+    """Применяет недостающие миграции. Если схема актуальна - это один SELECT."""
+    latest = MIGRATIONS[-1][0]
+    if get_schema_version() >= latest:
+        return 0
+
+    applied = 0
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+            # перечитываем под блокировкой: другой клиент мог успеть раньше
+            cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+            current = cur.fetchone()['version']
+
+            for version, description, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                optional = version in OPTIONAL_MIGRATIONS
+                if optional:
+                    cur.execute("SAVEPOINT optional_migration")
+                try:
+                    for stmt in statements:
+                        cur.execute(stmt)
+                except psycopg2.Error as e:
+                    if not optional:
+                        raise
+                    cur.execute("ROLLBACK TO SAVEPOINT optional_migration")
+                    print(f"DB: миграция {version} пропущена: {e}")
+                    description = f"{description} (пропущена)"
+                cur.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                applied += 1
+                print(f"DB: применена миграция {version}: {description}")
+
+    return applied
+
 
-def add_missing_columns():
-    """Добавляет недостающие столбцы к существующим таблицам"""
+def init_db():
+    """Оставлено для совместимости: схема создаётся миграциями"""
+    return migrate()
+
+# ----------------------------
+# PREPARED STATEMENTS
+# ----------------------------
+# Частые запросы главного экрана разбираются и планируются сервером один раз
+# на соединение. Запрос готовится (PREPARE) при первом выполнении на каждом
+# соединении пула; новое соединение после переподключения начинает с пустого
+# набора и подготавливает запросы заново.
+
+# имя -> (типы параметров, текст запроса с $1, $2, ...)
+PREPARED_STATEMENTS = {}
+
+
+def register_prepared(name, sql, param_types=()):
+    """Регистрирует именованный запрос для execute_prepared"""
+    PREPARED_STATEMENTS[name] = (tuple(param_types), sql)
+
+
+def execute_prepared(cur, name, params=()):
+    """Выполняет зарегистрированный запрос, при необходимости подготовив его на этом соединении"""
+    conn = cur.connection
+    if name not in conn.prepared:
+        param_types, sql = PREPARED_STATEMENTS[name]
+        types = f" ({', '.join(param_types)})" if param_types else ""
+        cur.execute(f"PREPARE {name}{types} AS {sql}")
+        conn.prepared.add(name)
+
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", tuple(params))
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+# ----------------------------
+# ДИАПАЗОНЫ ДАТ
+# ----------------------------
+# Фильтры по дням строятся как полуоткрытые интервалы [start, end) по самому
+# столбцу due_date. Условия вида due_date::date = %s не дают использовать индекс.
+
+def _day_start(day):
+    """Начало суток для date/datetime"""
+    if isinstance(day, datetime):
+        day = day.date()
+    return datetime(day.year, day.month, day.day)
+
+
+def date_window(first_day, last_day):
+    """Интервал [начало first_day, начало дня после last_day) - оба дня включительно"""
+    return _day_start(first_day), _day_start(last_day) + timedelta(days=1)
+
+
+def day_window(day):
+    """Интервал одних суток"""
+    return date_window(day, day)
+
+
+def week_window(day):
+    """Интервал недели (с понедельника), в которую попадает day"""
+    start = _day_start(day) - timedelta(days=_day_start(day).weekday())
+    return start, start + timedelta(days=7)
+
+
+def month_window(year, month):
+    """Интервал календарного месяца"""
+    start = datetime(year, month, 1)
+    if month == 12:
+        return start, datetime(year + 1, 1, 1)
+    return start, datetime(year, month + 1, 1)
+
+# ----------------------------
+# ПОСТРАНИЧНАЯ ЗАГРУЗКА И ПОТОКОВОЕ ЧТЕНИЕ
+# ----------------------------
+# Страницы выбираются по ключу (столбец сортировки, id), а не через OFFSET:
+# следующая страница начинается сразу после последней строки предыдущей.
+# Курсор страницы - непрозрачная строка, её нужно просто передать обратно.
+
+PAGE_SIZE = 50
+
+
+def _encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        value = {"dt": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    raw = json.dumps([value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError(f"Некорректный курсор страницы: {cursor!r}") from e
+    if "dt" in value:
+        return datetime.fromisoformat(value["dt"]), row_id
+    return value["v"], row_id
+
+
+def _fetch_page(table, where, params, sort_column, descending, cursor, limit):
+    """Одна страница строк table, отсортированных по (sort_column, id); NULL - в конце"""
+    direction = "DESC" if descending else "ASC"
+    op = "<" if descending else ">"
+    conditions = [where] if where else []
+    params = list(params)
+
+    if cursor:
+        last_value, last_id = _decode_cursor(cursor)
+        if last_value is None:
+            # уже дошли до строк с пустым ключом - идём только по id
+            conditions.append(f"({sort_column} IS NULL AND id {op} %s)")
+            params.append(last_id)
+        else:
+            conditions.append(f"(({sort_column}, id) {op} (%s, %s) OR {sort_column} IS NULL)")
+            params.extend([last_value, last_id])
+
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            try:
-                # Проверяем существование столбца type в таблице topics
-                cur.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name='topics' AND column_name='type'
-                """)
-                if not cur.fetchone():
-                    # Добавляем столбец если он не существует
-                    cur.execute("ALTER TABLE topics ADD COLUMN type TEXT")
-                    print("DB: добавлен столбец 'type' в таблицу 'topics'")
-
-                print("DB: проверка структуры таблиц завершена")
-            except Exception as e:
-                print("DB: ошибка при добавлении столбцов:", e)
+            cur.execute(f"""
+                SELECT * FROM {table}
+                {where_sql}
+                ORDER BY {sort_column} {direction} NULLS LAST, id {direction}
+                LIMIT %s
+            """, params + [limit + 1])
+            rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][sort_column], rows[-1]['id'])
+    return rows, next_cursor
+
+
+_stream_counter = itertools.count()
+
+
+def _stream_rows(sql, params=(), batch_size=500):
+    """Генератор строк через серверный (именованный) курсор - без fetchall всей таблицы"""
+    with get_connection() as conn:
+        with conn.cursor(name=f"stream_{next(_stream_counter)}") as cur:
+            cur.itersize = batch_size
+            cur.execute(sql, params)
+            for row in cur:
+                yield row
 
 # ----------------------------
 # ОСНОВНЫЕ ФУНКЦИИ ДЛЯ ЗАДАЧ И ЭКЗАМЕНОВ
@@ -195,18 +1373,77 @@ def get_tasks_by_type(task_type=None):
                 cur.execute("SELECT * FROM tasks ORDER BY created_at DESC")
             return cur.fetchall()
 
+def get_tasks_page(cursor=None, limit=PAGE_SIZE):
+    """Страница всех задач (новые первыми): (строки, курсор следующей страницы или None)"""
+    return _fetch_page("tasks", "", (), "created_at", True, cursor, limit)
+
+
+def get_regular_tasks_page(cursor=None, limit=PAGE_SIZE):
+    """Страница обычных задач (НЕ экзаменов), новые первыми"""
+    return _fetch_page("tasks", "(type IS NULL OR type != 'exam')", (), "created_at", True, cursor, limit)
+
+
+def get_exams_page(cursor=None, limit=PAGE_SIZE):
+    """Страница экзаменов по убыванию даты"""
+    return _fetch_page("tasks", "type = 'exam'", (), "due_date", True, cursor, limit)
+
+
+def get_tasks_by_type_page(task_type=None, cursor=None, limit=PAGE_SIZE):
+    """Страница задач указанного типа (или всех), новые первыми"""
+    if task_type:
+        return _fetch_page("tasks", "type = %s", (task_type,), "created_at", True, cursor, limit)
+    return get_tasks_page(cursor, limit)
+
+
+def iter_tasks(task_type=None, batch_size=500):
+    """Потоково перебирает задачи (для экспорта), не держа всю таблицу в памяти"""
+    if task_type:
+        return _stream_rows("SELECT * FROM tasks WHERE type = %s ORDER BY created_at DESC, id DESC",
+                            (task_type,), batch_size)
+    return _stream_rows("SELECT * FROM tasks ORDER BY created_at DESC, id DESC", (), batch_size)
+
+
+def iter_exams(batch_size=500):
+    """Потоково перебирает экзамены"""
+    return _stream_rows("SELECT * FROM tasks WHERE type = 'exam' ORDER BY due_date DESC, id DESC",
+                        (), batch_size)
+
+
+def get_task(task_id):
+    """Одна задача по ID (None, если её нет)"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM tasks WHERE id = %s", (task_id,))
+            return cur.fetchone()
+
+
 def add_task(title, description=None, task_type='other', subject_id=None, topic_id=None,
-             due_date=None, status='pending', priority=1, is_automatic_debt=False):
-    """Добавление задачи с поддержкой учебных работ"""
+             due_date=None, status='pending', priority=1, is_automatic_debt=False, recurrence=None):
+    """Добавление задачи с поддержкой учебных работ.
+
+    recurrence - правило повторения (RRULE, например WEEKLY_RULE); due_date тогда
+    задаёт первое повторение.
+    """
+    if recurrence and due_date is None:
+        raise ValueError("У повторяющейся задачи должна быть дата первого повторения")
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO tasks 
-                (title, description, type, subject_id, topic_id, due_date, status, priority, is_automatic_debt)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (title, description, task_type, subject_id, topic_id, due_date, status, priority, is_automatic_debt))
-            return cur.fetchone()['id']
+                (title, description, type, subject_id, topic_id, due_date, status, priority, is_automatic_debt,
+                 recurrence)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id, due_date
+            """, (title, description, task_type, subject_id, topic_id, due_date, status, priority, is_automatic_debt,
+                  recurrence or None))
+            task = cur.fetchone()
+            task_id = task['id']
+            if due_date is not None and not recurrence:
+                _lower_overdue_watermark(cur, task_id)
+    mark_changed("tasks")
+    # повторения шаблона попадают во многие месяцы
+    invalidate_month_counts(ALL_MONTHS if recurrence else task['due_date'])
+    return task_id
 
 def add_exam(title, description=None, subject_id=None, topic_id=None, due_date=None):
     """Добавляет экзамен (отдельная функция для ясности)"""
@@ -226,14 +1463,25 @@ def delete_task(task_id):
     """Удаляет задачу по ID"""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
-
-def update_task(task_id, title=None, description=None, task_type=None, subject_id=None, due_date=None, status=None, priority=None):
-    """Обновляет задачу"""
+            cur.execute("DELETE FROM tasks WHERE id = %s RETURNING due_date, recurrence, occurrence_date",
+                        (task_id,))
+            deleted = cur.fetchone()
+    # напоминания и вложения задачи удаляются каскадно; своё NOTIFY лента пропускает,
+    # поэтому их версии сдвигаем сами - иначе планировщик покажет напоминание удалённой задачи
+    mark_changed("tasks", "reminders", "attachments")
+    if deleted:
+        # удалённая замена повторения возвращает на его дату виртуальное повторение
+        invalidate_month_counts(ALL_MONTHS if deleted['recurrence'] else deleted['due_date'],
+                                deleted['occurrence_date'])
+
+def update_task(task_id, title=None, description=None, task_type=None, subject_id=None, due_date=None, status=None,
+                priority=None, recurrence=None):
+    """Обновляет задачу. recurrence="" убирает правило повторения"""
     with get_connection() as conn:
         with conn.cursor() as cur:
             updates = []
             params = []
+            changed = None
 
             if title is not None:
                 updates.append("title = %s")
@@ -256,13 +1504,36 @@ def update_task(task_id, title=None, description=None, task_type=None, subject_i
             if priority is not None:
                 updates.append("priority = %s")
                 params.append(priority)
+            if recurrence is not None:
+                updates.append("recurrence = %s")
+                params.append(recurrence or None)
 
             if updates:
                 params.append(task_id)
-                query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = %s"
+                # old - строка до изменения: нужен прежний дедлайн для сброса кэша месяцев
+                query = f"""
+                    UPDATE tasks t SET {', '.join(updates)}
+                    FROM tasks old
+                    WHERE t.id = %s AND old.id = t.id
+                    RETURNING old.due_date as old_due_date, t.due_date,
+                              old.recurrence as old_recurrence, t.recurrence
+                """
                 cur.execute(query, params)
+                changed = cur.fetchone()
                 print(f"✅ Задача {task_id} обновлена: {', '.join(updates)}")
 
+                # задача могла снова стать кандидатом в задолженности
+                if due_date is not None or status is not None:
+                    _lower_overdue_watermark(cur, task_id)
+    if updates:
+        mark_changed("tasks")
+    # количество задач по дням зависит только от дедлайна, статуса и правила повторения
+    if changed and (changed['old_recurrence'] or changed['recurrence']) and (
+            due_date is not None or status is not None or recurrence is not None):
+        invalidate_month_counts(ALL_MONTHS)
+    elif changed and (due_date is not None or status is not None):
+        invalidate_month_counts(changed['old_due_date'], changed['due_date'])
+
 # ----------------------------
 # ПРЕДМЕТЫ
 # ----------------------------
@@ -272,6 +1543,8 @@ def delete_subject(subject_id):
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM subjects WHERE id = %s", (subject_id,))
+    # темы предмета удаляются каскадно, у задач и расписания предмет обнуляется
+    mark_changed("subjects", "topics", "tasks", "schedule")
 
 def update_subject(subject_id, name=None, teacher_id=None, classroom=None, color=None):
     """Обновляет данные предмета"""
@@ -297,7 +1570,9 @@ def update_subject(subject_id, name=None, teacher_id=None, classroom=None, color
                 params.append(subject_id)
                 query = f"UPDATE subjects SET {', '.join(updates)} WHERE id = %s"
                 cur.execute(query, params)
+    mark_changed("subjects")
 
+@cached("subjects")
 def get_subject_by_id(subject_id):
     """Получает предмет по ID"""
     with get_connection() as conn:
@@ -305,6 +1580,7 @@ def get_subject_by_id(subject_id):
             cur.execute("SELECT * FROM subjects WHERE id = %s", (subject_id,))
             return cur.fetchone()
 
+@cached("subjects")
 def get_subjects():
     with get_connection() as conn:
         with conn.cursor() as cur:
@@ -318,12 +1594,15 @@ def add_subject(name, teacher_id=None, classroom=None, color=None):
                 INSERT INTO subjects (name, teacher_id, classroom, color)
                 VALUES (%s, %s, %s, %s) RETURNING id
             """, (name, teacher_id, classroom, color))
-            return cur.fetchone()['id']
+            subject_id = cur.fetchone()['id']
+    mark_changed("subjects")
+    return subject_id
 
 # ----------------------------
 # SETTINGS
 # ----------------------------
 
+@cached("settings")
 def get_settings():
     with get_connection() as conn:
         with conn.cursor() as cur:
@@ -339,6 +1618,7 @@ def update_settings(theme=None, notifications_enabled=None, default_notification
                 notifications_enabled = COALESCE(%s, notifications_enabled),
                 default_notification_time = COALESCE(%s, default_notification_time)
             """, (theme, notifications_enabled, default_notification_time))
+    mark_changed("settings")
 
 # ----------------------------
 # USERS
@@ -360,6 +1640,7 @@ def add_user(username, age):
 # TEACHERS
 # ----------------------------
 
+@cached("teachers")
 def get_teachers():
     with get_connection() as conn:
         with conn.cursor() as cur:
@@ -373,8 +1654,11 @@ def add_teacher(full_name, contact_info=None, requirements=None):
                 INSERT INTO teachers (full_name, contact_info, requirements)
                 VALUES (%s, %s, %s) RETURNING id
             """, (full_name, contact_info, requirements))
-            return cur.fetchone()['id']
+            teacher_id = cur.fetchone()['id']
+    mark_changed("teachers")
+    return teacher_id
 
+@cached("teachers")
 def get_teacher_name(teacher_id):
     """Получает имя преподавателя по ID"""
     with get_connection() as conn:
@@ -387,6 +1671,7 @@ def get_teacher_name(teacher_id):
 # TOPICS
 # ----------------------------
 
+@cached("topics")
 def get_topics(subject_id=None):
     with get_connection() as conn:
         with conn.cursor() as cur:
@@ -396,6 +1681,27 @@ def get_topics(subject_id=None):
                 cur.execute("SELECT * FROM topics ORDER BY name")
             return cur.fetchall()
 
+def get_topics_page(subject_id=None, cursor=None, limit=PAGE_SIZE):
+    """Страница тем/задолженностей по алфавиту"""
+    if subject_id:
+        return _fetch_page("topics", "subject_id = %s", (subject_id,), "name", False, cursor, limit)
+    return _fetch_page("topics", "", (), "name", False, cursor, limit)
+
+
+def iter_topics(subject_id=None, batch_size=500):
+    """Потоково перебирает темы/задолженности"""
+    if subject_id:
+        return _stream_rows("SELECT * FROM topics WHERE subject_id = %s ORDER BY name, id",
+                            (subject_id,), batch_size)
+    return _stream_rows("SELECT * FROM topics ORDER BY name, id", (), batch_size)
+
+def get_topic(topic_id):
+    """Одна тема/задолженность по ID (None, если её нет)"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM topics WHERE id = %s", (topic_id,))
+            return cur.fetchone()
+
 def add_topic(name, subject_id=None, work_type='не указан'):
     """Добавляет тему/задолженность"""
     with get_connection() as conn:
@@ -404,13 +1710,16 @@ def add_topic(name, subject_id=None, work_type='не указан'):
                 INSERT INTO topics (name, subject_id, type)
                 VALUES (%s, %s, %s) RETURNING id
             """, (name, subject_id, work_type))
-            return cur.fetchone()['id']
+            topic_id = cur.fetchone()['id']
+    mark_changed("topics")
+    return topic_id
 
 def delete_topic(topic_id):
     """Удаляет тему по ID"""
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM topics WHERE id = %s", (topic_id,))
+    mark_changed("topics")
 
 def update_topic(topic_id, name=None, work_type=None, subject_id=None):
     """Обновляет тему"""
@@ -433,6 +1742,7 @@ def update_topic(topic_id, name=None, work_type=None, subject_id=None):
                 params.append(topic_id)
                 query = f"UPDATE topics SET {', '.join(updates)} WHERE id = %s"
                 cur.execute(query, params)
+    mark_changed("topics")
 
 # ----------------------------
 # SCHEDULE
@@ -451,7 +1761,9 @@ def add_schedule_entry(subject_id, day_of_week, start_time, end_time):
                 INSERT INTO schedule (subject_id, day_of_week, start_time, end_time)
                 VALUES (%s, %s, %s, %s) RETURNING id
             """, (subject_id, day_of_week, start_time, end_time))
-            return cur.fetchone()['id']
+            entry_id = cur.fetchone()['id']
+    mark_changed("schedule")
+    return entry_id
 
 # ----------------------------
 # ATTACHMENTS
@@ -489,7 +1801,55 @@ def add_reminder(task_id, reminder_time):
                 INSERT INTO reminders (task_id, reminder_time)
                 VALUES (%s, %s) RETURNING id
             """, (task_id, reminder_time))
-            return cur.fetchone()['id']
+            reminder_id = cur.fetchone()['id']
+    mark_changed("reminders")
+    return reminder_id
+
+
+def delete_reminder(reminder_id):
+    """Удаляет напоминание"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM reminders WHERE id = %s", (reminder_id,))
+    mark_changed("reminders")
+
+
+def get_pending_reminders(after=None, until=None, limit=500):
+    """Не сработавшие напоминания по возрастанию (reminder_time, id), с названием задачи.
+
+    after - пара (reminder_time, id), после которой начинать (None - с самого раннего,
+    включая пропущенные), until - верхняя граница времени (не включительно).
+    """
+    conditions = ["r.fired_at IS NULL", "r.reminder_time IS NOT NULL"]
+    params = []
+    if after is not None:
+        conditions.append("(r.reminder_time, r.id) > (%s, %s)")
+        params.extend(after)
+    if until is not None:
+        conditions.append("r.reminder_time < %s")
+        params.append(until)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT r.id, r.task_id, r.reminder_time, t.title, t.due_date
+                FROM reminders r
+                LEFT JOIN tasks t ON t.id = r.task_id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY r.reminder_time, r.id
+                LIMIT %s
+            """, params + [limit])
+            return cur.fetchall()
+
+
+def mark_reminders_fired(reminder_ids, fired_at=None):
+    """Отмечает напоминания сработавшими, чтобы после перезапуска они не сработали снова"""
+    if not reminder_ids:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE reminders SET fired_at = %s WHERE id = ANY(%s)",
+                        (fired_at or datetime.now(), list(reminder_ids)))
+    mark_changed("reminders")
 
 # ----------------------------
 # ДОПОЛНИТЕЛЬНЫЕ ФУНКЦИИ
@@ -497,19 +1857,694 @@ def add_reminder(task_id, reminder_time):
 
 def get_tasks_by_subject_and_date(subject_id, date):
     """Получает задания по предмету и дате"""
+    start, end = day_window(date)
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 SELECT * FROM tasks 
-                WHERE subject_id = %s AND DATE(due_date) = %s
+                WHERE subject_id = %s AND due_date >= %s AND due_date < %s
                 ORDER BY due_date
-            """, (subject_id, date))
+            """, (subject_id, start, end))
             return cur.fetchall()
 
+# ----------------------------
+# ПОВТОРЯЮЩИЕСЯ ЗАДАЧИ
+# ----------------------------
+# Задача с правилом повторения (RRULE, tasks.recurrence) - шаблон: её due_date
+# задаёт первое повторение (DTSTART), а сами повторения в таблице не хранятся и
+# раскладываются в памяти только на просматриваемое окно дат. Строкой в tasks
+# становится лишь повторение, которое выполнили или изменили: у такой строки
+# recurrence_parent_id указывает на шаблон, а occurrence_date - на исходную дату
+# повторения, которое она заменяет.
+
+# правило «каждую неделю в тот же день», которое предлагает экран задач
+WEEKLY_RULE = "FREQ=WEEKLY"
+
+# больше повторений одного шаблона за один просмотр не раскладываем
+MAX_OCCURRENCES_PER_VIEW = 400
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_rule(recurrence, dtstart):
+    return rrulestr(recurrence, dtstart=dtstart)
+
+
+@cached("tasks", "subjects")
+def get_recurring_tasks():
+    """Шаблоны повторяющихся задач; overrides - даты повторений, уже ставших строками"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT t.*, s.name as subject_name,
+                       COALESCE((SELECT array_agg(o.occurrence_date) FROM tasks o
+                                 WHERE o.recurrence_parent_id = t.id), '{}') as overrides
+                FROM tasks t
+                LEFT JOIN subjects s ON t.subject_id = s.id
+                WHERE t.recurrence IS NOT NULL
+                AND t.due_date IS NOT NULL
+                AND t.status != 'completed'
+            """)
+            templates = []
+            for row in cur.fetchall():
+                template = dict(row)
+                template['overrides'] = frozenset(template['overrides'])
+                templates.append(template)
+            return templates
+
+
+def _occurrence(template, when):
+    """Виртуальное повторение: копия шаблона со своей датой"""
+    occurrence = dict(template)
+    del occurrence['overrides']
+    occurrence.update(due_date=when, recurrence_parent_id=template['id'],
+                      occurrence_date=when, is_occurrence=True)
+    return occurrence
+
+
+def _template_occurrences(template, start, end=None):
+    """Даты повторений шаблона начиная с start (и до end, не включительно), без заменённых строками"""
+    rule = _parse_rule(template['recurrence'], template['due_date'])
+    for when in itertools.islice(rule.xafter(start, inc=True), MAX_OCCURRENCES_PER_VIEW):
+        if end is not None and when >= end:
+            return
+        if when not in template['overrides']:
+            yield when
+
+
+def expand_occurrences(start, end, predicate=None):
+    """Виртуальные повторения с датой в [start, end), отсортированные по дате.
+
+    predicate(шаблон) - какие шаблоны учитывать (по умолчанию все).
+    """
+    occurrences = []
+    for template in get_recurring_tasks():
+        if predicate is None or predicate(template):
+            occurrences.extend(_occurrence(template, when)
+                               for when in _template_occurrences(template, start, end))
+    occurrences.sort(key=lambda task: task['due_date'])
+    return occurrences
+
+
+def next_occurrences(start, predicate=None):
+    """Ближайшее повторение каждого шаблона начиная с start"""
+    occurrences = []
+    for template in get_recurring_tasks():
+        if predicate is None or predicate(template):
+            when = next(_template_occurrences(template, start), None)
+            if when is not None:
+                occurrences.append(_occurrence(template, when))
+    return occurrences
+
+
+def _count_occurrences(counts, start, end):
+    """Добавляет повторения из [start, end) к счётчикам {date: count}"""
+    for occurrence in expand_occurrences(start, end):
+        day = occurrence['due_date'].date()
+        counts[day] = counts.get(day, 0) + 1
+    return counts
+
+
+def _is_regular_template(template):
+    return template['status'] == 'active' and template['type'] != 'exam'
+
+
+def _is_exam_template(template):
+    return template['type'] == 'exam'
+
+
+def materialize_occurrence(template_id, occurrence_date, **changes):
+    """Превращает повторение шаблона в обычную строку tasks (или находит уже созданную)
+    и применяет к ней changes (аргументы update_task). Возвращает id строки или None,
+    если шаблона нет."""
+    with session():
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO tasks (title, description, type, subject_id, topic_id, due_date,
+                                       status, priority, recurrence_parent_id, occurrence_date)
+                    SELECT title, description, type, subject_id, topic_id, %s,
+                           status, priority, id, %s
+                    FROM tasks WHERE id = %s AND recurrence IS NOT NULL
+                    ON CONFLICT (recurrence_parent_id, occurrence_date)
+                        WHERE recurrence_parent_id IS NOT NULL DO NOTHING
+                    RETURNING id
+                """, (occurrence_date, occurrence_date, template_id))
+                row = cur.fetchone()
+                if row is None:
+                    cur.execute("""
+                        SELECT id FROM tasks
+                        WHERE recurrence_parent_id = %s AND occurrence_date = %s
+                    """, (template_id, occurrence_date))
+                    row = cur.fetchone()
+                elif occurrence_date < datetime.now():
+                    # новая строка с прошедшим дедлайном: её должен подобрать перенос в долги
+                    _lower_overdue_watermark(cur, row['id'])
+        if row is None:
+            return None
+        mark_changed("tasks")
+        invalidate_month_counts(occurrence_date)
+        if changes:
+            update_task(row['id'], **changes)
+    return row['id']
+
+
+def complete_occurrence(template_id, occurrence_date):
+    """Отмечает одно повторение выполненным (остальные повторения не меняются)"""
+    return materialize_occurrence(template_id, occurrence_date, status='completed')
+
+
+def get_next_occurrence(template_id, start):
+    """Ближайшее повторение шаблона не раньше start, ещё не ставшее строкой (None - его нет)"""
+    for template in get_recurring_tasks():
+        if template['id'] == template_id:
+            when = next(_template_occurrences(template, start), None)
+            return _occurrence(template, when) if when is not None else None
+    return None
+
+# ----------------------------
+# КАЛЕНДАРЬ И ГЛАВНЫЙ ЭКРАН
+# ----------------------------
+
+register_prepared("month_task_counts", """
+    SELECT due_date::date as task_date, COUNT(*) as task_count
+    FROM tasks 
+    WHERE due_date >= $1 AND due_date < $2
+    AND status != 'completed'
+    AND recurrence IS NULL
+    GROUP BY due_date::date
+""", ("timestamp", "timestamp"))
+
+
+def get_tasks_for_month(year, month):
+    """Количество незавершённых задач по дням месяца: {date: count}"""
+    start, end = month_window(year, month)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_prepared(cur, "month_task_counts", (start, end))
+            counts = {row['task_date']: row['task_count'] for row in cur.fetchall()}
+    return _count_occurrences(counts, start, end)
+
+
+def _add_months(year, month, delta):
+    """(год, месяц), сдвинутые на delta месяцев"""
+    index = year * 12 + month - 1 + delta
+    return index // 12, index % 12 + 1
+
+
+class MonthCountsCache:
+    """Количество незавершённых задач по дням, разложенное по месяцам:
+    (год, месяц) -> {date: count}.
+
+    Запись задачи сбрасывает только месяцы её старого и нового дедлайна.
+    """
+
+    def __init__(self, max_months=36):
+        self.max_months = max_months
+        self._months = OrderedDict()
+        self._generation = 0  # растёт при каждом сбросе
+        self._lock = threading.Lock()
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, year, month):
+        """Счётчики месяца или None, если месяца нет в кэше"""
+        with self._lock:
+            counts = self._months.get((year, month))
+            if counts is not None:
+                self._months.move_to_end((year, month))
+            return counts
+
+    def missing(self, months):
+        with self._lock:
+            return [key for key in months if key not in self._months]
+
+    def put(self, months, generation):
+        """months: {(год, месяц): {date: count}}"""
+        with self._lock:
+            # пока шёл запрос, задачи успели измениться - результат уже устарел
+            if generation != self._generation:
+                return
+            for key, counts in months.items():
+                self._months[key] = counts
+                self._months.move_to_end(key)
+            while len(self._months) > self.max_months:
+                self._months.popitem(last=False)
+
+    def invalidate_days(self, *days):
+        with self._lock:
+            self._generation += 1
+            for day in days:
+                self._months.pop((day.year, day.month), None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._months.clear()
+
+
+_month_counts = MonthCountsCache()
+
+# сколько месяцев по обе стороны от показанного догружать заранее
+MONTH_PREFETCH_RADIUS = 2
+
+
+def load_month_counts(first, last):
+    """Загружает в кэш месяцы с first по last включительно (пары (год, месяц))
+    одним запросом и возвращает их {(год, месяц): {date: count}}"""
+    generation = _month_counts.generation()
+    start, _ = month_window(*first)
+    _, end = month_window(*last)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_prepared(cur, "month_task_counts", (start, end))
+            rows = cur.fetchall()
+
+    months = {}
+    key = first
+    while key <= last:
+        months[key] = {}
+        key = _add_months(*key, 1)
+    for row in rows:
+        day = row['task_date']
+        months[(day.year, day.month)][day] = row['task_count']
+    for occurrence in expand_occurrences(start, end):
+        day = occurrence['due_date'].date()
+        counts = months[(day.year, day.month)]
+        counts[day] = counts.get(day, 0) + 1
+    _month_counts.put(months, generation)
+    return months
+
+
+def get_month_counts(year, month):
+    """{date: count} месяца из кэша; при промахе месяц загружается вместе с соседними"""
+    counts = _month_counts.get(year, month)
+    if counts is None:
+        months = load_month_counts(_add_months(year, month, -1), _add_months(year, month, 1))
+        counts = months[(year, month)]
+    return counts
+
+
+def peek_month_counts(year, month):
+    """Счётчики месяца, только если они уже в кэше (без запроса к базе)"""
+    return _month_counts.get(year, month)
+
+
+def prefetch_month_counts(year, month, radius=MONTH_PREFETCH_RADIUS):
+    """Догружает одним запросом недостающие месяцы в пределах radius от (year, month)"""
+    around = [_add_months(year, month, delta) for delta in range(-radius, radius + 1)]
+    missing = _month_counts.missing(around)
+    if missing:
+        load_month_counts(missing[0], missing[-1])
+
+
+# вместо дня в invalidate_month_counts: сбросить все месяцы (изменился шаблон повторений)
+ALL_MONTHS = "all"
+
+
+def invalidate_month_counts(*days):
+    """Сбрасывает закэшированные месяцы, в которые попадают дни days (None пропускаются)"""
+    days = [day for day in days if day is not None]
+    if ALL_MONTHS in days:
+        _month_counts.clear()
+    else:
+        _month_counts.invalidate_days(*days)
+    pending = getattr(_local, "pending_month_days", None)
+    if pending is not None and getattr(_local, "conn", None) is not None:
+        pending.update(days)
+
+
+register_prepared("day_events", """
+    SELECT t.*, s.name as subject_name 
+    FROM tasks t 
+    LEFT JOIN subjects s ON t.subject_id = s.id 
+    WHERE t.due_date >= $1 AND t.due_date < $2
+    AND t.status != 'completed'
+    AND t.recurrence IS NULL
+    ORDER BY 
+        CASE 
+            WHEN t.type = 'exam' THEN 1
+            ELSE 2 
+        END,
+        t.due_date ASC
+""", ("timestamp", "timestamp"))
+
+
+def get_events_for_date(day):
+    """Незавершённые задачи и экзамены на дату (экзамены первыми)"""
+    start, end = day_window(day)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_prepared(cur, "day_events", (start, end))
+            events = [dict(row) for row in cur.fetchall()]
+    events.extend(expand_occurrences(start, end))
+    # экзамены первыми, дальше по времени (как в запросе)
+    events.sort(key=lambda task: (0 if task.get('type') == 'exam' else 1, task['due_date']))
+    return events
+
+
+register_prepared("today_tasks", """
+    SELECT t.*, s.name as subject_name 
+    FROM tasks t 
+    LEFT JOIN subjects s ON t.subject_id = s.id 
+    WHERE (t.due_date IS NULL OR t.due_date >= $1)
+    AND t.status = 'active'
+    AND (t.type IS NULL OR t.type != 'exam')
+    AND t.recurrence IS NULL
+    ORDER BY 
+        CASE 
+            WHEN t.due_date IS NULL THEN 2
+            WHEN t.due_date < $2 THEN 1  -- Сегодняшние задачи в первую очередь
+            ELSE 3 
+        END,
+        t.due_date ASC,
+        t.created_at DESC
+""", ("timestamp", "timestamp"))
+
+
+def get_today_tasks(today):
+    """Активные задачи (не экзамены): на сегодня, с дедлайном в будущем и без даты"""
+    start, end = day_window(today)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_prepared(cur, "today_tasks", (start, end))
+            tasks = [dict(row) for row in cur.fetchall()]
+    return _merge_today_tasks(tasks, start, end)
+
+
+def _merge_today_tasks(tasks, start, end):
+    """Добавляет к задачам секции «Сегодня» ближайшее повторение каждого шаблона
+    и сортирует как запрос today_tasks"""
+    tasks = tasks + next_occurrences(start, _is_regular_template)
+    tasks.sort(key=lambda task: task.get('created_at') or datetime.min, reverse=True)
+    tasks.sort(key=lambda task: (
+        2 if task['due_date'] is None else 1 if task['due_date'] < end else 3,
+        task['due_date'] or datetime.max,
+    ))
+    return tasks
+
+
+register_prepared("upcoming_deadlines", """
+    SELECT t.*, s.name as subject_name 
+    FROM tasks t 
+    LEFT JOIN subjects s ON t.subject_id = s.id 
+    WHERE (
+        (t.due_date >= $1 AND t.due_date < $2)
+        OR 
+        (t.due_date IS NULL AND t.created_at >= NOW() - INTERVAL '3 days')
+    )
+    AND t.status = 'active'
+    AND (t.type IS NULL OR t.type != 'exam')
+    AND t.recurrence IS NULL
+    ORDER BY 
+        CASE WHEN t.due_date IS NULL THEN 1 ELSE 0 END,
+        t.due_date ASC 
+    LIMIT $3
+""", ("timestamp", "timestamp", "integer"))
+
+
+def get_upcoming_deadlines(today, days=7, limit=10):
+    """Дедлайны на ближайшие дни и недавние задачи без даты (не экзамены)"""
+    start, end = date_window(today, today + timedelta(days=days))
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_prepared(cur, "upcoming_deadlines", (start, end, limit))
+            tasks = [dict(row) for row in cur.fetchall()]
+    return _merge_upcoming_deadlines(tasks, start, end, limit)
+
+
+def _merge_upcoming_deadlines(tasks, start, end, limit):
+    """Добавляет повторения из [start, end) к дедлайнам и заново применяет порядок и limit"""
+    tasks = tasks + expand_occurrences(start, end, _is_regular_template)
+    tasks.sort(key=lambda task: (task['due_date'] is None, task['due_date'] or datetime.max))
+    return tasks[:limit]
+
+
+register_prepared("next_exam", """
+    SELECT t.*, s.name as subject_name 
+    FROM tasks t 
+    LEFT JOIN subjects s ON t.subject_id = s.id 
+    WHERE t.type = 'exam' 
+    AND t.due_date >= $1 
+    AND t.status != 'completed'
+    AND t.recurrence IS NULL
+    ORDER BY t.due_date ASC 
+    LIMIT 1
+""", ("timestamp",))
+
+
+def get_next_exam(today):
+    """Ближайший незавершённый экзамен начиная с сегодняшнего дня (или None)"""
+    start, _ = day_window(today)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_prepared(cur, "next_exam", (start,))
+            exam = cur.fetchone()
+    return _merge_next_exam(dict(exam) if exam else None, start)
+
+
+def _merge_next_exam(exam, start):
+    """Ближайший из экзамена exam и повторений экзаменов-шаблонов"""
+    candidates = next_occurrences(start, _is_exam_template)
+    if exam is not None:
+        candidates.append(exam)
+    return min(candidates, key=lambda task: task['due_date'], default=None)
+
+
+# снимок главного экрана живёт недолго: «недавние задачи без даты» зависят от NOW()
+DASHBOARD_CACHE_TTL = 30
+
+# Все секции главного экрана одним запросом. Строки задач собираются в JSON
+# в том же порядке, что и в отдельных запросах выше (поле ord).
+register_prepared("dashboard_snapshot", """
+    SELECT
+        (SELECT COALESCE(json_agg(q ORDER BY q.ord), '[]'::json) FROM (
+            SELECT t.*, s.name as subject_name,
+                   row_number() OVER (ORDER BY
+                       CASE
+                           WHEN t.due_date IS NULL THEN 2
+                           WHEN t.due_date < $2 THEN 1
+                           ELSE 3
+                       END,
+                       t.due_date ASC,
+                       t.created_at DESC) as ord
+            FROM tasks t
+            LEFT JOIN subjects s ON t.subject_id = s.id
+            WHERE (t.due_date IS NULL OR t.due_date >= $1)
+            AND t.status = 'active'
+            AND (t.type IS NULL OR t.type != 'exam')
+            AND t.recurrence IS NULL
+        ) q) as today_tasks,
+        (SELECT COALESCE(json_agg(q ORDER BY q.ord), '[]'::json) FROM (
+            SELECT t.*, s.name as subject_name,
+                   row_number() OVER (ORDER BY
+                       CASE WHEN t.due_date IS NULL THEN 1 ELSE 0 END,
+                       t.due_date ASC) as ord
+            FROM tasks t
+            LEFT JOIN subjects s ON t.subject_id = s.id
+            WHERE (
+                (t.due_date >= $1 AND t.due_date < $3)
+                OR
+                (t.due_date IS NULL AND t.created_at >= NOW() - INTERVAL '3 days')
+            )
+            AND t.status = 'active'
+            AND (t.type IS NULL OR t.type != 'exam')
+            AND t.recurrence IS NULL
+            ORDER BY ord
+            LIMIT $4
+        ) q) as upcoming_deadlines,
+        (SELECT row_to_json(q) FROM (
+            SELECT t.*, s.name as subject_name
+            FROM tasks t
+            LEFT JOIN subjects s ON t.subject_id = s.id
+            WHERE t.type = 'exam'
+            AND t.due_date >= $1
+            AND t.status != 'completed'
+            AND t.recurrence IS NULL
+            ORDER BY t.due_date ASC
+            LIMIT 1
+        ) q) as next_exam,
+        (SELECT COALESCE(json_object_agg(q.task_date, q.task_count), '{}'::json) FROM (
+            SELECT due_date::date as task_date, COUNT(*) as task_count
+            FROM tasks
+            WHERE due_date >= $5 AND due_date < $6
+            AND status != 'completed'
+            AND recurrence IS NULL
+            GROUP BY due_date::date
+        ) q) as month_tasks
+""", ("timestamp", "timestamp", "timestamp", "integer", "timestamp", "timestamp"))
+
+
+def _parse_json_timestamp(value):
+    """datetime из метки времени в JSON Postgres.
+
+    Postgres отбрасывает нули в конце долей секунды, а fromisoformat до Python 3.11
+    принимает только 3 или 6 знаков - дополняем доли до микросекунд.
+    """
+    head, dot, fraction = value.partition('.')
+    if dot:
+        value = f"{head}.{fraction[:6].ljust(6, '0')}"
+    return datetime.fromisoformat(value)
+
+
+def _task_from_json(task):
+    """Строка задачи из JSON-агрегата -> как из обычного запроса (даты - datetime)"""
+    task.pop('ord', None)
+    for field in ('due_date', 'created_at', 'occurrence_date'):
+        if isinstance(task.get(field), str):
+            task[field] = _parse_json_timestamp(task[field])
+    return task
+
+
+@cached("tasks", "subjects", ttl=DASHBOARD_CACHE_TTL)
+def get_dashboard_snapshot(today, days=7, limit=10):
+    """Данные главного экрана за один запрос.
+
+    Возвращает словарь с ключами today_tasks, upcoming_deadlines, next_exam
+    (как get_today_tasks, get_upcoming_deadlines, get_next_exam) и month_tasks -
+    {date: count} за месяц, в который попадает today.
+    """
+    day_start, day_end = day_window(today)
+    _, deadlines_end = date_window(today, today + timedelta(days=days))
+    month_start, month_end = month_window(today.year, today.month)
+    generation = _month_counts.generation()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_prepared(cur, "dashboard_snapshot", (
+                day_start, day_end, deadlines_end, limit, month_start, month_end))
+            row = cur.fetchone()
+    month_tasks = {date.fromisoformat(day): count for day, count in row['month_tasks'].items()}
+    # повторяющиеся задачи раскладываются в памяти, только на окна главного экрана
+    _count_occurrences(month_tasks, month_start, month_end)
+    # календарь главного экрана потом листается из кэша месяцев
+    _month_counts.put({(today.year, today.month): month_tasks}, generation)
+    next_exam = _task_from_json(row['next_exam']) if row['next_exam'] else None
+    return {
+        'today_tasks': _merge_today_tasks(
+            [_task_from_json(task) for task in row['today_tasks']], day_start, day_end),
+        'upcoming_deadlines': _merge_upcoming_deadlines(
+            [_task_from_json(task) for task in row['upcoming_deadlines']], day_start, deadlines_end, limit),
+        'next_exam': _merge_next_exam(next_exam, day_start),
+        'month_tasks': month_tasks,
+    }
+
 # ----------------------------
 # SCHEDULE FUNCTIONS
 # ----------------------------
 
+class ScheduleConflictError(ValueError):
+    """Пара пересекается с другими парами того же дня.
+
+    conflicts - список пересекающихся записей расписания (или, для пакета,
+    результат ScheduleIndex.validate).
+    """
+
+    def __init__(self, conflicts, message=None):
+        self.conflicts = conflicts
+        if message is None:
+            message = "Пара пересекается с: " + ", ".join(conflict_text(entry) for entry in conflicts)
+        super().__init__(message)
+
+
+# пересечение полуинтервалов [начало, конец), типов недель и дат действия - те же
+# выражения, что в ограничении schedule_no_overlap, поэтому поиск идёт по его GiST-индексу
+_SCHEDULE_OVERLAP_SQL = """
+    SELECT s.*, sub.name as subject_name
+    FROM schedule s
+    LEFT JOIN subjects sub ON s.subject_id = sub.id
+    WHERE s.day_of_week = %s
+    AND tsrange(DATE '2000-01-01' + s.start_time, DATE '2000-01-01' + s.end_time)
+        && tsrange(DATE '2000-01-01' + %s::time, DATE '2000-01-01' + %s::time)
+    AND int4range(CASE WHEN s.week_type = 'even' THEN 2 ELSE 1 END,
+                  CASE WHEN s.week_type = 'odd' THEN 2 ELSE 3 END)
+        && int4range(CASE WHEN %s::varchar = 'even' THEN 2 ELSE 1 END,
+                     CASE WHEN %s::varchar = 'odd' THEN 2 ELSE 3 END)
+    AND daterange(s.valid_from, s.valid_until, '[]') && daterange(%s::date, %s::date, '[]')
+    AND s.id IS DISTINCT FROM %s
+    ORDER BY s.start_time
+"""
+
+
+def _schedule_conflicts(cur, day_of_week, start_time, end_time, exclude_id=None,
+                        week_type=None, valid_from=None, valid_until=None):
+    cur.execute(_SCHEDULE_OVERLAP_SQL, (day_of_week, start_time, end_time, week_type, week_type,
+                                        valid_from, valid_until, exclude_id))
+    return cur.fetchall()
+
+
+def _check_time_order(start_time, end_time):
+    if as_time(start_time) >= as_time(end_time):
+        raise ValueError("Время начала должно быть раньше времени окончания")
+
+
+def _check_validity(week_type, valid_from, valid_until):
+    """Проверяет тип недели и даты действия пары; возвращает их в виде для записи в базу"""
+    week_type = week_type or None
+    if week_type not in (None,) + WEEK_TYPES:
+        raise ValueError(f"Неизвестный тип недели: {week_type}")
+    valid_from, valid_until = as_date(valid_from), as_date(valid_until)
+    if valid_from is not None and valid_until is not None and valid_from > valid_until:
+        raise ValueError("Дата начала действия пары позже даты окончания")
+    return week_type, valid_from, valid_until
+
+
+def find_schedule_conflicts(day_of_week, start_time, end_time, exclude_id=None,
+                            week_type=None, valid_from=None, valid_until=None):
+    """Пары дня day_of_week, пересекающие [start_time, end_time) в те же недели и даты"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            return _schedule_conflicts(cur, day_of_week, start_time, end_time, exclude_id,
+                                       *_check_validity(week_type, valid_from, valid_until))
+
+
+def _write_schedule_entry(cur, sql, params, day_of_week, start_time, end_time, exclude_id=None,
+                          validity=(None, None, None)):
+    """Проверяет пересечения и выполняет запись; гонку с другим клиентом ловит ограничение в базе.
+
+    validity - (тип недели, действует с, действует по) записываемой пары.
+    """
+    conflicts = _schedule_conflicts(cur, day_of_week, start_time, end_time, exclude_id, *validity)
+    if conflicts:
+        raise ScheduleConflictError(conflicts)
+    cur.execute("SAVEPOINT schedule_write")
+    try:
+        cur.execute(sql, params)
+    except psycopg2.errors.ExclusionViolation:
+        cur.execute("ROLLBACK TO SAVEPOINT schedule_write")
+        raise ScheduleConflictError(
+            _schedule_conflicts(cur, day_of_week, start_time, end_time, exclude_id, *validity))
+    cur.execute("RELEASE SAVEPOINT schedule_write")
+
+
+def validate_schedule_entries(entries):
+    """Проверяет пакет новых пар (импорт расписания) против таблицы и друг друга.
+
+    Таблица читается один раз, каждая пара проверяется по индексу интервалов.
+    Возвращает список конфликтов ScheduleIndex.validate (пустой - всё в порядке).
+    """
+    return ScheduleIndex(get_schedule_with_subjects()).validate(entries)
+
+
+def import_schedule_entries(entries):
+    """Сохраняет пакет пар одной транзакцией; при пересечениях ничего не пишет
+    и поднимает ScheduleConflictError со списком конфликтов"""
+    with session():
+        conflicts = validate_schedule_entries(entries)
+        if conflicts:
+            raise ScheduleConflictError(conflicts, f"Пересекающихся пар в пакете: {len(conflicts)}")
+        ids = [add_schedule_entry(entry.get('subject_id'), entry['day_of_week'],
+                                  entry['start_time'], entry['end_time'], entry.get('week_type'),
+                                  entry.get('valid_from'), entry.get('valid_until'))
+               for entry in entries]
+    return ids
+
+# расписание меняется редко: запись сбрасывается по изменению таблиц (своему или
+# по уведомлению другого клиента), а время жизни - лишь страховка
+SCHEDULE_CACHE_TTL = 3600
+
+
+@cached("schedule", "subjects", "teachers", ttl=SCHEDULE_CACHE_TTL)
 def get_schedule_with_subjects():
     """Получает расписание с информацией о предметах"""
     with get_connection() as conn:
@@ -524,33 +2559,41 @@ def get_schedule_with_subjects():
             """)
             return cur.fetchall()
 
-def get_schedule_by_day(day_of_week):
-    """Получает расписание для конкретного дня"""
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT s.*, sub.name as subject_name, sub.teacher_id, sub.classroom, sub.color,
-                       t.full_name as teacher_name
-                FROM schedule s 
-                LEFT JOIN subjects sub ON s.subject_id = sub.id 
-                LEFT JOIN teachers t ON sub.teacher_id = t.id
-                WHERE s.day_of_week = %s
-                ORDER BY s.start_time
-            """, (day_of_week,))
-            return cur.fetchall()
+def get_schedule_by_day(day_of_week, week_type=None):
+    """Получает расписание для конкретного дня недели (по индексу загруженного расписания).
 
-def add_schedule_entry(subject_id, day_of_week, start_time, end_time):
-    """Добавляет запись в расписание"""
+    week_type ("odd"/"even") - только пары, которые идут в такие недели.
+    """
+    return _schedule_weeks.index(get_schedule_with_subjects()).by_day(day_of_week, week_type)
+
+def get_schedule_for_date(day):
+    """Пары, которые идут в дату day: с учётом типа недели и дат действия"""
+    return _schedule_weeks.index(get_schedule_with_subjects()).on_date(day)
+
+def add_schedule_entry(subject_id, day_of_week, start_time, end_time, week_type=None,
+                       valid_from=None, valid_until=None):
+    """Добавляет запись в расписание; пересечение с парами того же дня - ScheduleConflictError.
+
+    week_type - "odd"/"even" для пар через неделю; valid_from/valid_until - даты семестра.
+    """
+    _check_time_order(start_time, end_time)
+    validity = _check_validity(week_type, valid_from, valid_until)
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO schedule (subject_id, day_of_week, start_time, end_time)
-                VALUES (%s, %s, %s, %s) RETURNING id
-            """, (subject_id, day_of_week, start_time, end_time))
-            return cur.fetchone()['id']
-
-def update_schedule_entry(entry_id, subject_id=None, day_of_week=None, start_time=None, end_time=None):
-    """Обновляет запись в расписании"""
+            _write_schedule_entry(cur, """
+                INSERT INTO schedule (subject_id, day_of_week, start_time, end_time,
+                                      week_type, valid_from, valid_until)
+                VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
+            """, (subject_id, day_of_week, start_time, end_time) + validity,
+                day_of_week, start_time, end_time, validity=validity)
+            entry_id = cur.fetchone()['id']
+    mark_changed("schedule")
+    return entry_id
+
+def update_schedule_entry(entry_id, subject_id=None, day_of_week=None, start_time=None, end_time=None,
+                          week_type=None, valid_from=None, valid_until=None):
+    """Обновляет запись в расписании. Пустая строка в week_type/valid_from/valid_until
+    убирает ограничение (пара каждую неделю / без даты начала или конца)"""
     with get_connection() as conn:
         with conn.cursor() as cur:
             updates = []
@@ -568,17 +2611,48 @@ def update_schedule_entry(entry_id, subject_id=None, day_of_week=None, start_tim
             if end_time is not None:
                 updates.append("end_time = %s")
                 params.append(end_time)
+            if week_type is not None:
+                updates.append("week_type = %s")
+                params.append(week_type or None)
+            if valid_from is not None:
+                updates.append("valid_from = %s")
+                params.append(as_date(valid_from))
+            if valid_until is not None:
+                updates.append("valid_until = %s")
+                params.append(as_date(valid_until))
 
             if updates:
                 params.append(entry_id)
                 query = f"UPDATE schedule SET {', '.join(updates)} WHERE id = %s"
-                cur.execute(query, params)
+                # итоговые день, время и период пары: новые значения поверх текущих
+                cur.execute("""
+                    SELECT day_of_week, start_time, end_time, week_type, valid_from, valid_until
+                    FROM schedule WHERE id = %s FOR UPDATE
+                """, (entry_id,))
+                current = cur.fetchone()
+                day = start = end = None
+                if current is not None:
+                    day = day_of_week if day_of_week is not None else current['day_of_week']
+                    start = start_time if start_time is not None else current['start_time']
+                    end = end_time if end_time is not None else current['end_time']
+                    validity = _check_validity(
+                        week_type if week_type is not None else current['week_type'],
+                        valid_from if valid_from is not None else current['valid_from'],
+                        valid_until if valid_until is not None else current['valid_until'])
+                if start is None or end is None:
+                    cur.execute(query, params)
+                else:
+                    _check_time_order(start, end)
+                    _write_schedule_entry(cur, query, params, day, start, end, exclude_id=entry_id,
+                                          validity=validity)
+    mark_changed("schedule")
 
 def delete_schedule_entry(entry_id):
     """Удаляет запись из расписания"""
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM schedule WHERE id = %s", (entry_id,))
+    mark_changed("schedule")
 
 def get_schedule_entry(entry_id):
     """Получает конкретную запись расписания"""
@@ -592,6 +2666,130 @@ def get_schedule_entry(entry_id):
             """, (entry_id,))
             return cur.fetchone()
 
+# ----------------------------
+# РАСПИСАНИЕ В КАЛЕНДАРЕ
+# ----------------------------
+# Пары из недельного расписания раскладываются по конкретным датам в памяти:
+# расписание читается одним запросом (и живёт в кэше), а разложенные недели
+# хранятся по ключу ISO-недели (год, номер). Пока список пар в кэше тот же
+# самый объект, недели берутся готовыми; новый список (запись в расписание,
+# истечение кэша) - и недели раскладываются заново. Пары на дату берутся из
+# индекса по типу недели (WeekTypeIndex) с проверкой дат действия.
+
+# сколько разложенных недель держать (около года просмотра календаря)
+SCHEDULE_WEEKS_CACHE_SIZE = 60
+
+
+def _class_event(entry, day):
+    """Пара расписания entry в дату day - в виде события календаря"""
+    start = datetime.combine(day, as_time(entry['start_time']))
+    end = datetime.combine(day, as_time(entry['end_time'])) if entry.get('end_time') is not None else None
+    return {
+        'type': 'class',
+        'schedule_id': entry['id'],
+        'title': entry.get('subject_name') or 'Пара',
+        'subject_id': entry.get('subject_id'),
+        'subject_name': entry.get('subject_name'),
+        'classroom': entry.get('classroom'),
+        'teacher_name': entry.get('teacher_name'),
+        'color': entry.get('color'),
+        'due_date': start,
+        'end_date': end,
+    }
+
+
+class ScheduleWeeks:
+    """Пары расписания, разложенные по датам ISO-недель: (год, неделя) -> {дата: [пары]}"""
+
+    def __init__(self, max_weeks=SCHEDULE_WEEKS_CACHE_SIZE):
+        self.max_weeks = max_weeks
+        self._entries = None  # список пар, из которого разложены недели
+        self._index = WeekTypeIndex()
+        self._weeks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _reset(self, entries):
+        if entries is not self._entries:
+            self._index = WeekTypeIndex(entries)
+            self._entries = entries
+            self._weeks.clear()
+
+    def index(self, entries):
+        """Индекс пар по типу и дню недели для списка entries"""
+        with self._lock:
+            self._reset(entries)
+            return self._index
+
+    def week(self, entries, iso_year, iso_week):
+        """Пары недели по датам; раскладывается один раз на неделю и список пар"""
+        with self._lock:
+            self._reset(entries)
+            key = (iso_year, iso_week)
+            week = self._weeks.get(key)
+            if week is not None:
+                self._weeks.move_to_end(key)
+                return week
+            week = {}
+            for weekday in range(7):
+                day = date.fromisocalendar(iso_year, iso_week, weekday + 1)
+                classes = self._index.on_date(day)
+                if classes:
+                    week[day] = [_class_event(entry, day) for entry in classes]
+            self._weeks[key] = week
+            while len(self._weeks) > self.max_weeks:
+                self._weeks.popitem(last=False)
+            return week
+
+    def clear(self):
+        with self._lock:
+            self._entries = None
+            self._weeks.clear()
+
+
+_schedule_weeks = ScheduleWeeks()
+
+
+def _classes_for_range(entries, first_day, last_day):
+    result = {}
+    monday = first_day - timedelta(days=first_day.weekday())
+    while monday <= last_day:
+        iso_year, iso_week, _ = monday.isocalendar()
+        for day, classes in _schedule_weeks.week(entries, iso_year, iso_week).items():
+            if first_day <= day <= last_day and classes:
+                result[day] = classes
+        monday += timedelta(days=7)
+    return result
+
+
+def _month_range(year, month):
+    next_year, next_month = _add_months(year, month, 1)
+    return date(year, month, 1), date(next_year, next_month, 1) - timedelta(days=1)
+
+
+def get_classes_for_range(first_day, last_day):
+    """Пары расписания по датам с first_day по last_day включительно: {дата: [пары по времени]}"""
+    return _classes_for_range(get_schedule_with_subjects(), first_day, last_day)
+
+
+def get_classes_for_date(day):
+    """Пары расписания в день day, по времени начала"""
+    return get_classes_for_range(day, day).get(day, [])
+
+
+def get_class_counts(year, month):
+    """Число пар по дням месяца: {date: n}"""
+    first_day, last_day = _month_range(year, month)
+    return {day: len(classes) for day, classes in get_classes_for_range(first_day, last_day).items()}
+
+
+def peek_class_counts(year, month):
+    """Число пар по дням месяца без обращения к базе; None, если расписание ещё не загружено"""
+    found, entries = get_schedule_with_subjects.peek()
+    if not found:
+        return None
+    first_day, last_day = _month_range(year, month)
+    return {day: len(classes) for day, classes in _classes_for_range(entries, first_day, last_day).items()}
+
 
 # В database.py добавим следующие функции:
 
@@ -606,6 +2804,7 @@ def get_overdue_tasks():
                 AND status != 'done'
                 AND is_automatic_debt = FALSE
                 AND (type IS NULL OR type != 'exam')
+                AND recurrence IS NULL
                 ORDER BY due_date
             """)
             return cur.fetchall()
@@ -636,20 +2835,79 @@ def move_task_to_debts(task_id):
                 UPDATE tasks SET is_automatic_debt = TRUE WHERE id = %s
             """, (task_id,))
 
-            return True
+    mark_changed("topics", "tasks")
+    return True
+
+
+# ключ advisory-блокировки: не даёт двум клиентам одновременно переносить одни и те же задачи
+OVERDUE_SWEEP_LOCK_ID = 727001
+
+
+def _lower_overdue_watermark(cur, task_id):
+    """Сдвигает отметку переноса назад, если задача с прошедшим дедлайном
+    появилась или изменилась уже после последнего прохода"""
+    cur.execute("""
+        UPDATE sweep_state s SET watermark = t.due_date
+        FROM tasks t
+        WHERE s.name = 'overdue' AND t.id = %s AND t.due_date < s.watermark
+    """, (task_id,))
 
 
 def check_and_move_overdue_tasks():
-    """Проверяет и перемещает все просроченные задачи в задолженности"""
-    overdue_tasks = get_overdue_tasks()
-    moved_count = 0
+    """Переносит все просроченные задачи в задолженности одним запросом.
+
+    Рассматриваются только задачи, чей дедлайн прошёл после предыдущего
+    прохода (отметка хранится в sweep_state). Возвращает число перенесённых задач.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (OVERDUE_SWEEP_LOCK_ID,))
+            if not cur.fetchone()['locked']:
+                # перенос уже выполняет другой клиент
+                return 0
 
-    for task in overdue_tasks:
-        if move_task_to_debts(task['id']):
-            moved_count += 1
-            print(f"Перемещена просроченная задача: {task['title']}")
+            cur.execute("""
+                WITH overdue AS (
+                    SELECT id, title, type, subject_id, due_date
+                    FROM tasks
+                    WHERE due_date < NOW()
+                    AND due_date >= COALESCE(
+                        (SELECT watermark FROM sweep_state WHERE name = 'overdue'),
+                        '-infinity'::timestamp
+                    )
+                    AND status != 'completed'
+                    AND status != 'done'
+                    AND is_automatic_debt = FALSE
+                    AND (type IS NULL OR type != 'exam')
+                    AND recurrence IS NULL
+                    FOR UPDATE
+                ),
+                debts AS (
+                    INSERT INTO topics (name, subject_id, type)
+                    SELECT 'Просрочено: ' || title, subject_id, type
+                    FROM overdue
+                    RETURNING id
+                ),
+                moved AS (
+                    UPDATE tasks t SET is_automatic_debt = TRUE
+                    FROM overdue o
+                    WHERE t.id = o.id
+                    RETURNING t.id
+                ),
+                mark AS (
+                    INSERT INTO sweep_state (name, watermark) VALUES ('overdue', NOW())
+                    ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark
+                )
+                SELECT id, title FROM overdue ORDER BY due_date
+            """)
+            moved_tasks = cur.fetchall()
 
-    return moved_count
+    if moved_tasks:
+        mark_changed("topics", "tasks")
+    for task in moved_tasks:
+        print(f"Перемещена просроченная задача: {task['title']}")
+
+    return len(moved_tasks)
 
 
 def get_automatic_debts_count():
@@ -662,14 +2920,31 @@ def get_automatic_debts_count():
             """)
             return cur.fetchone()['count']
 
-# ----------------------------
-# ИНИЦИАЛИЗАЦИЯ БАЗЫ ДАННЫХ
-# ----------------------------
 
-# Вызовите эту функцию после init_db()
-try:
-    init_db()
-    add_missing_columns()
-    print("DB: схема инициализирована")
-except Exception as e:
-    print("DB: не удалось инициализировать схему:", e)
\ No newline at end of file
+# функции, которые не ходят в базу сами или являются инфраструктурой модуля
+_NOT_INSTRUMENTED = {
+    "get_pool", "get_pool_stats", "close_pool", "get_connection", "session",
+    "set_ui_caller", "caller", "current_caller", "get_db_metrics", "get_slowest_functions",
+    "dump_db_metrics", "reset_db_metrics",
+    "cached", "invalidate_cache", "clear_cache", "get_cache_stats",
+    "start_change_listener", "stop_change_listener", "mark_changed", "get_table_versions",
+    "register_prepared", "execute_prepared",
+    "date_window", "day_window", "week_window", "month_window",
+    "peek_month_counts", "invalidate_month_counts", "peek_class_counts",
+    # генераторы: замер покрыл бы только создание итератора
+    "iter_tasks", "iter_exams", "iter_topics",
+}
+
+
+def _instrument_module():
+    """Оборачивает в замеры все публичные функции модуля, обращающиеся к базе"""
+    module_globals = globals()
+    for name, value in list(module_globals.items()):
+        if (name.startswith("_") or name in _NOT_INSTRUMENTED
+                or not inspect.isfunction(value) or value.__module__ != __name__):
+            continue
+        module_globals[name] = _instrumented(value)
+
+
+if DB_METRICS_ENABLED:
+    _instrument_module()
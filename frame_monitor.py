@@ -0,0 +1,265 @@
+import functools
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# ----------------------------
+# МОНИТОР КАДРОВ (ПОДВИСАНИЯ UI)
+# ----------------------------
+# Включается переменной окружения STUDY_TRACKER_FRAME_MONITOR=1. Каждый кадр Kivy
+# Clock вызывает наш обработчик; время между вызовами - длительность кадра. Кадр
+# дольше JANK_THRESHOLD_MS считается подвисанием и приписывается операциям
+# (входу на экран, построению списка, созданию диалога), выполнявшимся в этом
+# кадре. Фоновый поток в это время снимает стек UI-потока, и для самых долгих
+# кадров сохраняются самые частые стеки.
+#
+# Монитору не нужно окно: в headless-прогоне (Clock.tick() в цикле) он так же
+# собирает числа, а get_frame_report()/dump_frame_report() отдают их в виде словаря/JSON.
+
+ENABLED = os.environ.get("STUDY_TRACKER_FRAME_MONITOR") == "1"
+
+# STUDY_TRACKER_FRAME_MONITOR_FILE=путь - при остановке выгрузить отчёт в JSON
+REPORT_FILE = os.environ.get("STUDY_TRACKER_FRAME_MONITOR_FILE")
+
+# кадр дольше этого (мс) считается подвисанием
+JANK_THRESHOLD_MS = 50
+# сколько самых долгих кадров хранить
+WORST_FRAMES = 20
+# длительности последних кадров для перцентилей
+RECENT_FRAMES = 1200
+# как часто снимать стек UI-потока (сек) и сколько снимков держать на кадр
+SAMPLE_INTERVAL = 0.005
+MAX_SAMPLES_PER_FRAME = 200
+# глубина сохраняемого стека и число разных стеков на один кадр
+STACK_DEPTH = 12
+STACKS_PER_FRAME = 3
+
+# функции, в которых UI-поток просто ждёт следующего кадра - такие снимки не нужны
+_IDLE_FUNCTIONS = {"sleep", "usleep", "idle", "_sleep", "wait"}
+
+
+class FrameMonitor:
+    """Длительности кадров, подвисания с операциями-виновниками и снимками стека"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._main_ident = threading.main_thread().ident
+        self._event = None
+        self._sampler = None
+        self._running = False
+        self._depth = 0  # вложенность текущих операций UI-потока
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.frames = 0
+            self.janks = 0
+            self.recent = deque(maxlen=RECENT_FRAMES)
+            self.worst = []  # куча (длительность, номер, запись) - наверху самый короткий из худших
+            self.by_operation = {}  # операция -> {"frames": n, "total_ms": ..., "max_ms": ...}
+            self._frame_ops = []  # операции текущего кадра: (имя, мс, глубина)
+            self._samples = []  # снимки стека текущего кадра
+            self._last_tick = None
+
+    # --- жизненный цикл ---
+
+    def start(self):
+        """Подписывается на кадры Clock и запускает снятие стеков"""
+        if self._running:
+            return
+        from kivy.clock import Clock
+        self._running = True
+        self._last_tick = None
+        self._event = Clock.schedule_interval(self._tick, 0)
+        self._sampler = threading.Thread(target=self._sample_loop, name="frame-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._running = False
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    # --- операции ---
+
+    def begin(self):
+        self._depth += 1
+
+    def end(self, name, started):
+        self._depth -= 1
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._frame_ops.append((name, elapsed, self._depth))
+
+    # --- кадры ---
+
+    def _tick(self, dt):
+        now = time.perf_counter()
+        with self._lock:
+            last, self._last_tick = self._last_tick, now
+            ops, self._frame_ops = self._frame_ops, []
+            samples, self._samples = self._samples, []
+        if last is None:
+            return
+        self.record_frame((now - last) * 1000, ops, samples)
+
+    def record_frame(self, duration, ops=(), samples=()):
+        """Учитывает кадр длительностью duration мс с операциями ops [(имя, мс, глубина)]"""
+        with self._lock:
+            self.frames += 1
+            self.recent.append(duration)
+            if duration < JANK_THRESHOLD_MS:
+                return
+            self.janks += 1
+
+            # виновники - операции верхнего уровня, самые долгие первыми
+            culprits = sorted((op for op in ops if op[2] == 0), key=lambda op: op[1], reverse=True)
+            for name, elapsed, _ in culprits:
+                stats = self.by_operation.get(name)
+                if stats is None:
+                    stats = self.by_operation[name] = {"frames": 0, "total_ms": 0.0, "max_ms": 0.0}
+                stats["frames"] += 1
+                stats["total_ms"] += elapsed
+                stats["max_ms"] = max(stats["max_ms"], elapsed)
+
+            if len(self.worst) >= WORST_FRAMES and duration <= self.worst[0][0]:
+                return
+            entry = {
+                "at": time.strftime("%H:%M:%S"),
+                "duration_ms": round(duration, 1),
+                "operation": culprits[0][0] if culprits else None,
+                "operations": [
+                    {"name": name, "ms": round(elapsed, 1), "depth": depth} for name, elapsed, depth in ops
+                ],
+                "stacks": [
+                    {"samples": count, "stack": list(stack)}
+                    for stack, count in Counter(samples).most_common(STACKS_PER_FRAME)
+                ],
+            }
+            item = (duration, self.janks, entry)
+            if len(self.worst) >= WORST_FRAMES:
+                heapq.heapreplace(self.worst, item)
+            else:
+                heapq.heappush(self.worst, item)
+
+    def _sample_loop(self):
+        while self._running:
+            time.sleep(SAMPLE_INTERVAL)
+            frame = sys._current_frames().get(self._main_ident)
+            if frame is None or frame.f_code.co_name in _IDLE_FUNCTIONS:
+                continue
+            stack = []
+            while frame is not None and len(stack) < STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                frame = frame.f_back
+            with self._lock:
+                if len(self._samples) < MAX_SAMPLES_PER_FRAME:
+                    self._samples.append(tuple(stack))
+
+    # --- отчёт ---
+
+    def report(self):
+        with self._lock:
+            recent = sorted(self.recent)
+            worst = [entry for _, _, entry in sorted(self.worst, key=lambda item: item[0], reverse=True)]
+            operations = {
+                name: dict(stats, total_ms=round(stats["total_ms"], 1), max_ms=round(stats["max_ms"], 1))
+                for name, stats in self.by_operation.items()
+            }
+            frames, janks = self.frames, self.janks
+
+        def percentile(q):
+            if not recent:
+                return 0.0
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))], 1)
+
+        return {
+            "frames": frames,
+            "janks": janks,
+            "jank_threshold_ms": JANK_THRESHOLD_MS,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(recent[-1], 1) if recent else 0.0,
+            "operations": dict(sorted(operations.items(), key=lambda item: item[1]["total_ms"], reverse=True)),
+            "worst_frames": worst,
+        }
+
+
+_monitor = FrameMonitor()
+
+
+@contextmanager
+def operation(name):
+    """Помечает блок как операцию name: долгий кадр, в котором он выполнялся, будет приписан ему"""
+    if not ENABLED or threading.get_ident() != _monitor._main_ident:
+        yield
+        return
+    started = time.perf_counter()
+    _monitor.begin()
+    try:
+        yield
+    finally:
+        _monitor.end(name, started)
+
+
+def track(func):
+    """Декоратор: вызов функции - операция монитора кадров (имя - Класс.метод).
+
+    Без STUDY_TRACKER_FRAME_MONITOR=1 функция возвращается как есть.
+    """
+    if not ENABLED:
+        return func
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with operation(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def start_frame_monitor():
+    """Запускает монитор, если он включён; возвращает True, если запущен"""
+    if ENABLED:
+        _monitor.start()
+    return ENABLED
+
+
+def stop_frame_monitor():
+    """Останавливает монитор, печатает сводку и (если задан файл) выгружает отчёт"""
+    if not ENABLED:
+        return
+    _monitor.stop()
+    report = _monitor.report()
+    print(f"Кадры: {report['frames']}, подвисаний (>{JANK_THRESHOLD_MS} мс): {report['janks']}, "
+          f"p95 {report['p95_ms']} мс, макс. {report['max_ms']} мс")
+    for name, stats in list(report["operations"].items())[:5]:
+        print(f"  {name}: {stats['frames']} долгих кадров, макс. {stats['max_ms']} мс")
+    if REPORT_FILE:
+        dump_frame_report(REPORT_FILE)
+
+
+def get_frame_report():
+    """Сводка по кадрам: перцентили, подвисания по операциям и самые долгие кадры со стеками"""
+    return _monitor.report()
+
+
+def dump_frame_report(path=None):
+    """Возвращает отчёт в виде JSON; если указан path - ещё и записывает в файл"""
+    data = json.dumps(get_frame_report(), ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+    return data
+
+
+def reset_frame_monitor():
+    _monitor.reset()
@@ -0,0 +1,124 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from kivy.clock import Clock
+
+from frame_monitor import operation
+
+# ----------------------------
+# ФОНОВАЯ ЗАГРУЗКА ДАННЫХ ЭКРАНОВ
+# ----------------------------
+# Запросы к базе выполняются в пуле потоков, а результат передаётся обратно в
+# UI-поток через Clock.schedule_once: виджеты и Kivy-свойства трогаются только
+# там. Каждая загрузка помечается токеном; результат загрузки, которую успели
+# отменить или заменить новой, просто отбрасывается.
+
+# потоков меньше, чем соединений в пуле БД: запросам из UI-потока всегда хватит соединения
+LOADER_WORKERS = 3
+
+# замеры запросов приписываются экрану, запустившему загрузку (если модуль БД доступен)
+try:
+    from database import caller as db_caller
+except Exception:
+    db_caller = None
+
+_executor = ThreadPoolExecutor(max_workers=LOADER_WORKERS, thread_name_prefix="screen-loader")
+
+# пока идёт стартовая работа (миграции схемы), загрузки экранов ждут её окончания
+_startup_done = threading.Event()
+_startup_done.set()
+
+
+def run_at_startup(work, apply=None):
+    """Выполняет стартовую работу в фоне; apply(результат) вызывается в UI-потоке.
+
+    Загрузки экранов, запущенные раньше, чем она завершится, ждут её.
+    """
+    _startup_done.clear()
+
+    def job():
+        try:
+            return work()
+        finally:
+            _startup_done.set()
+
+    future = _executor.submit(job)
+
+    def done(f):
+        try:
+            result = f.result()
+        except Exception as e:
+            print(f"Ошибка стартовой загрузки: {e}")
+            return
+        if apply is not None:
+            Clock.schedule_once(lambda dt: apply(result))
+
+    future.add_done_callback(done)
+
+
+def _after_startup(fetch, name=None):
+    _startup_done.wait()
+    with db_caller(name) if db_caller is not None and name else nullcontext():
+        return fetch()
+
+
+class ScreenLoader:
+    """Фоновые загрузки одного экрана, по одной на ключ"""
+
+    def __init__(self, name):
+        self.name = name
+        self._tokens = {}  # ключ -> токен актуальной загрузки
+        self._futures = {}
+
+    def submit(self, fetch, apply, key="data", on_error=None):
+        """Выполняет fetch() в фоне и вызывает apply(результат) в UI-потоке.
+
+        Новая загрузка с тем же ключом отменяет предыдущую.
+        """
+        self.cancel(key)
+        token = object()
+        self._tokens[key] = token
+        future = _executor.submit(_after_startup, fetch, self.name)
+        self._futures[key] = future
+
+        def done(f):
+            if f.cancelled():
+                return
+            try:
+                result, error = f.result(), None
+            except Exception as e:
+                result, error = None, e
+            Clock.schedule_once(lambda dt: self._deliver(key, token, result, error, apply, on_error))
+
+        future.add_done_callback(done)
+
+    def _deliver(self, key, token, result, error, apply, on_error):
+        if self._tokens.get(key) is not token:
+            return  # загрузку отменили или заменили - результат устарел
+        del self._tokens[key]
+        self._futures.pop(key, None)
+        with operation(f"{self.name}/{key}"):
+            if error is None:
+                apply(result)
+            elif on_error is not None:
+                on_error(error)
+            else:
+                print(f"Ошибка фоновой загрузки ({self.name}/{key}): {error}")
+
+    def pending(self, key="data"):
+        return key in self._tokens
+
+    def cancel(self, key=None):
+        """Отменяет загрузку по ключу (или все загрузки экрана)"""
+        keys = [key] if key is not None else list(self._tokens)
+        for k in keys:
+            self._tokens.pop(k, None)
+            future = self._futures.pop(k, None)
+            if future is not None:
+                future.cancel()
+
+
+def shutdown_loader():
+    """Отменяет ещё не начатые загрузки при выходе из приложения"""
+    _executor.shutdown(wait=False, cancel_futures=True)
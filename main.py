@@ -1,49 +1,146 @@
+import importlib
+import os
+import time
+
+# момент старта процесса - точка отсчёта для отчёта о времени запуска
+_started = time.perf_counter()
+
 from kivymd.app import MDApp
+from kivy.clock import Clock
 from kivy.lang import Builder
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.screenmanager import ScreenManager
 
-from screens.home_screen import HomeScreen
-from screens.schedule_screen import ScheduleScreen
-from screens.tasks_screen import TasksScreen
-from screens.debts_screen import DebtsScreen
-from screens.subjects_screen import SubjectsScreen
-from screens.exams_screen import ExamsScreen
+from frame_monitor import operation, start_frame_monitor, stop_frame_monitor
+
+
+# экраны: имя -> (kv-шаблон, модуль, класс). kv и модуль загружаются при первом
+# переходе на экран; остальные экраны догружаются по одному после первого кадра.
+SCREENS = {
+    "home": ("kv/home_screen.kv", "screens.home_screen", "HomeScreen"),
+    "schedule": ("kv/schedule_screen.kv", "screens.schedule_screen", "ScheduleScreen"),
+    "tasks": ("kv/tasks_screen.kv", "screens.tasks_screen", "TasksScreen"),
+    "debts": ("kv/debts_screen.kv", "screens.debts_screen", "DebtsScreen"),
+    "subjects": ("kv/subjects_screen.kv", "screens.subjects_screen", "SubjectsScreen"),
+    "exams": ("kv/exams_screen.kv", "screens.exams_screen", "ExamsScreen"),
+    "debug": ("kv/debug_screen.kv", "screens.debug_screen", "DebugScreen"),
+}
+
+# скрытые экраны: без кнопки в навигации и без догрузки в фоне
+HIDDEN_SCREENS = {"debug"}
+
+# клавиша открытия экрана отладки (F12)
+DEBUG_SCREEN_KEY = 293
+
+# STUDY_TRACKER_DB_METRICS_FILE=путь - при выходе выгрузить замеры запросов к базе в JSON
+# (сами замеры включаются STUDY_TRACKER_DB_METRICS=1)
+DB_METRICS_FILE = os.environ.get("STUDY_TRACKER_DB_METRICS_FILE")
+
+# STUDY_TRACKER_EAGER_SCREENS=1 - создать все экраны сразу, как раньше (для сравнения времени запуска)
+EAGER_SCREENS = os.environ.get("STUDY_TRACKER_EAGER_SCREENS") == "1"
+
+# пауза между догрузкой экранов в фоне, чтобы не съедать кадры подряд
+WARMUP_INTERVAL = 0.1
 
 
 class Root(BoxLayout):
     pass
 
 
+class LazyScreenManager(ScreenManager):
+    """Экранный менеджер, создающий экраны из SCREENS по требованию"""
+
+    def ensure_screen(self, name):
+        if self.has_screen(name):
+            return
+        started = time.perf_counter()
+        kv_file, module_name, class_name = SCREENS[name]
+        with operation(f"create_screen/{name}"):
+            Builder.load_file(kv_file)
+            screen_class = getattr(importlib.import_module(module_name), class_name)
+            self.add_widget(screen_class(name=name))
+        print(f"Экран {name} создан за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    def show(self, name):
+        with operation(f"switch_screen/{name}"):
+            self.ensure_screen(name)
+            self.current = name
+
+    def toggle_debug(self):
+        """Открывает экран отладки или возвращается с него на прежний экран"""
+        if self.current == "debug":
+            self.get_screen("debug").go_back()
+            return
+        previous = self.current
+        self.ensure_screen("debug")
+        self.get_screen("debug").return_to = previous
+        self.current = "debug"
+
+    def warm_up(self, *args):
+        """Создаёт следующий ещё не загруженный экран и планирует следующий шаг"""
+        for name in SCREENS:
+            if name not in HIDDEN_SCREENS and not self.has_screen(name):
+                self.ensure_screen(name)
+                Clock.schedule_once(self.warm_up, WARMUP_INTERVAL)
+                return
+
+
 class StudyTrackerApp(MDApp):
+    settings = None
+
     def build(self):
-        # попытка подключиться к базе данных при старте
+        build_started = time.perf_counter()
+
+        # STUDY_TRACKER_FRAME_MONITOR=1 - замер длительности кадров и подвисаний UI
+        if start_frame_monitor():
+            print("Монитор кадров включён")
+
+        # база данных: миграции и настройки - в фоне, первый кадр их не ждёт
         try:
             import database as db
-            try:
-                settings = db.get_settings()
-                print("DB: настройки загружены:", settings)
-            except Exception as e:
-                print("DB: не удалось получить настройки:", e)
+            from loader import run_at_startup
+
+            def prepare_db():
+                try:
+                    # применяем недостающие миграции схемы (если схема актуальна - один запрос)
+                    db.migrate()
+                except Exception as e:
+                    print("DB: не удалось применить миграции:", e)
+                # фоновая подписка на изменения таблиц (в т.ч. от других клиентов)
+                db.start_change_listener()
+                return db.get_settings()
+
+            run_at_startup(prepare_db, self.on_settings_loaded)
+
+            # напоминания: одна куча и один таймер до ближайшего (первое окно грузится после миграций)
+            from reminders import get_scheduler
+            scheduler = get_scheduler()
+            scheduler.bind(self.on_reminder)
+            scheduler.start()
         except Exception as e:
             print("DB: модуль database не доступен или ошибка импорта:", e)
 
-        # kv-шаблоны экранов
-        Builder.load_file("kv/home_screen.kv")
-        Builder.load_file("kv/schedule_screen.kv")
-        Builder.load_file("kv/tasks_screen.kv")
-        Builder.load_file("kv/debts_screen.kv")
-        Builder.load_file("kv/subjects_screen.kv")
-        Builder.load_file("kv/exams_screen.kv")
-
-        # экранный менеджер
-        sm = ScreenManager()
-        sm.add_widget(HomeScreen(name="home"))
-        sm.add_widget(ScheduleScreen(name="schedule"))
-        sm.add_widget(TasksScreen(name="tasks"))
-        sm.add_widget(DebtsScreen(name="debts"))
-        sm.add_widget(SubjectsScreen(name="subjects"))
-        sm.add_widget(ExamsScreen(name="exams"))
+        # kv-шаблоны общих виджетов; шаблоны экранов грузятся вместе с экранами
+        Builder.load_file("kv/card_list.kv")
+        Builder.load_file("kv/skeleton.kv")
+        Builder.load_file("kv/calendar_grid.kv")
+
+        # экранный менеджер: сразу создаётся только стартовый экран
+        sm = LazyScreenManager()
+        for name in (SCREENS if EAGER_SCREENS else ["home"]):
+            sm.ensure_screen(name)
+
+        # замеры запросов к базе приписываются открытому экрану
+        try:
+            import database as db
+            sm.bind(current=lambda instance, name: db.set_ui_caller(name))
+            db.set_ui_caller(sm.current)
+        except Exception:
+            pass
+
+        # F12 - скрытый экран отладки
+        from kivy.core.window import Window
+        Window.bind(on_keyboard=lambda window, key, *args: self.on_keyboard(sm, key))
 
         # корневой layout
         root = BoxLayout(orientation="vertical")
@@ -56,7 +153,7 @@ class StudyTrackerApp(MDApp):
 
         def make_btn(title, screen_name):
             b = Button(text=title)
-            b.bind(on_release=lambda *_: setattr(sm, "current", screen_name))
+            b.bind(on_release=lambda *_: sm.show(screen_name))
             return b
 
         nav.add_widget(make_btn("Главная", "home"))
@@ -67,8 +164,60 @@ class StudyTrackerApp(MDApp):
         nav.add_widget(make_btn("Экзамены", "exams"))
 
         root.add_widget(nav)
+
+        self.build_time = time.perf_counter() - build_started
+        Clock.schedule_once(lambda dt: self.on_first_frame(sm), 0)
         return root
 
+    def on_keyboard(self, sm, key):
+        if key == DEBUG_SCREEN_KEY:
+            sm.toggle_debug()
+            return True
+        return False
+
+    def on_first_frame(self, sm):
+        """Первый кадр отрисован: печатаем отчёт о запуске и догружаем остальные экраны"""
+        total = time.perf_counter() - _started
+        mode = "все экраны сразу" if EAGER_SCREENS else "ленивые экраны"
+        print(f"Запуск ({mode}): build {self.build_time * 1000:.0f} мс, "
+              f"первый кадр через {total * 1000:.0f} мс от старта процесса")
+        Clock.schedule_once(sm.warm_up, WARMUP_INTERVAL)
+
+    def on_settings_loaded(self, settings):
+        self.settings = settings
+        print("DB: настройки загружены:", settings)
+
+    def on_reminder(self, reminder):
+        from widgets.dialogs import show_message
+        title = reminder.get("title") or "Задача"
+        when = reminder["reminder_time"].strftime("%d.%m.%Y %H:%M")
+        show_message("Напоминание", f"{title}\n{when}")
+
+    def on_resume(self):
+        # пока приложение было свёрнуто, напоминания могли поменяться на другом клиенте
+        try:
+            from reminders import get_scheduler
+            get_scheduler().refresh()
+        except Exception as e:
+            print("Не удалось обновить напоминания:", e)
+        return True
+
+    def on_stop(self):
+        stop_frame_monitor()
+        # закрываем соединения пула при выходе
+        try:
+            import database as db
+            from loader import shutdown_loader
+            from reminders import get_scheduler
+            get_scheduler().stop()
+            shutdown_loader()
+            if DB_METRICS_FILE:
+                db.dump_db_metrics(DB_METRICS_FILE)
+            db.stop_change_listener()
+            db.close_pool()
+        except Exception as e:
+            print("DB: не удалось закрыть пул соединений:", e)
+
 
 if __name__ == "__main__":
     StudyTrackerApp().run()
@@ -0,0 +1,236 @@
+import heapq
+from datetime import datetime, timedelta
+
+from kivy.clock import Clock
+
+import database as db
+from loader import ScreenLoader
+
+# ----------------------------
+# ПЛАНИРОВЩИК НАПОМИНАНИЙ
+# ----------------------------
+# Ближайшие не сработавшие напоминания лежат в куче по (время, id). Взведён
+# ровно один таймер Clock - на время верхушки кучи или на конец загруженного
+# окна, если оно наступит раньше. В простое планировщик ничего не делает и
+# базу не опрашивает. Окна грузятся по очереди (REMINDER_WINDOW вперёд, не
+# больше REMINDER_BATCH строк за раз); новые и удалённые напоминания
+# попадают в кучу сразу, без перезагрузки.
+
+# на сколько вперёд загружать напоминания за раз
+REMINDER_WINDOW = timedelta(hours=12)
+# сколько напоминаний загружать за один запрос
+REMINDER_BATCH = 500
+# первое окно захватывает пропущенные напоминания только за этот срок: о том,
+# что прошло, пока приложение было закрыто, напоминать поздно
+REMINDER_GRACE = timedelta(hours=1)
+# напоминание, до которого осталось меньше этого (сек), срабатывает сразу
+FIRE_TOLERANCE = 0.5
+
+
+class ReminderScheduler:
+    """Куча ближайших напоминаний и один таймер до следующего из них"""
+
+    def __init__(self):
+        self.loader = ScreenLoader("reminders")
+        self._heap = []  # (reminder_time, id)
+        self._pending = {}  # id -> напоминание; удалённые из словаря в куче пропускаются
+        # всё, что <= этой пары (время, id), уже загружено; None - первое окно ещё грузится
+        self._loaded_until = None
+        self._event = None
+        self._versions = None  # версия таблицы reminders после последней загрузки/записи
+        self._firing = set()  # сработали, но в базе ещё не отмечены - повторно не загружать
+        self._listeners = []
+        self.running = False
+
+    # --- жизненный цикл ---
+
+    def start(self):
+        """Загружает первое окно и взводит таймер"""
+        self.running = True
+        self.refresh()
+
+    def stop(self):
+        self.running = False
+        self.loader.cancel()
+        self._cancel_timer()
+
+    def refresh(self):
+        """Забывает загруженное и грузит окно заново (например, после изменений с другого клиента)"""
+        self.loader.cancel("window")
+        # таймер старого окна не должен сработать, пока новое не загружено
+        self._cancel_timer()
+        self._heap = []
+        self._pending = {}
+        self._loaded_until = None
+        self._load_next_window()
+
+    def bind(self, callback):
+        """callback(reminder) вызывается в UI-потоке, когда напоминание сработало"""
+        self._listeners.append(callback)
+
+    # --- изменения ---
+
+    def add(self, task_id, reminder_time, title=None):
+        """Создаёт напоминание в базе и сразу ставит его в очередь"""
+        reminder_id = db.add_reminder(task_id, reminder_time)
+        self._versions = db.get_table_versions("reminders")
+        self.schedule({"id": reminder_id, "task_id": task_id,
+                       "reminder_time": reminder_time, "title": title})
+        return reminder_id
+
+    def remove(self, reminder_id):
+        """Удаляет напоминание из базы и из очереди"""
+        db.delete_reminder(reminder_id)
+        self._versions = db.get_table_versions("reminders")
+        self.unschedule(reminder_id)
+
+    def schedule(self, reminder):
+        """Ставит в очередь уже сохранённое напоминание (или переносит его на новое время)"""
+        key = (reminder["reminder_time"], reminder["id"])
+        if self._loaded_until is not None and key > self._loaded_until:
+            # дальше загруженного окна: попадёт в кучу с загрузкой своего окна
+            self._pending.pop(reminder["id"], None)
+            self._rearm()
+            return
+        self._pending[reminder["id"]] = reminder
+        heapq.heappush(self._heap, key)
+        self._rearm()
+
+    def unschedule(self, reminder_id):
+        # запись в куче останется и будет пропущена, когда окажется наверху
+        if self._pending.pop(reminder_id, None) is not None:
+            self._rearm()
+
+    def pending_count(self):
+        return len(self._pending)
+
+    # --- таймер ---
+
+    def _top(self):
+        """Верхушка кучи без удалённых и перенесённых записей"""
+        while self._heap:
+            reminder_time, reminder_id = self._heap[0]
+            reminder = self._pending.get(reminder_id)
+            if reminder is not None and reminder["reminder_time"] == reminder_time:
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def _cancel_timer(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def _rearm(self):
+        """Взводит единственный таймер на ближайшее событие: напоминание или конец окна"""
+        self._cancel_timer()
+        if not self.running or self._loaded_until is None:
+            return
+        target = self._loaded_until[0]
+        top = self._top()
+        if top is not None:
+            target = min(target, top[0])
+        delay = max(0.0, (target - datetime.now()).total_seconds())
+        self._event = Clock.schedule_once(self._wake, delay)
+
+    def _wake(self, dt):
+        self._event = None
+        if self._loaded_until is None:
+            # окно ещё грузится: таймер взведёт _apply_window
+            return
+        versions = db.get_table_versions("reminders")
+        if versions is not None and self._versions is not None and versions != self._versions:
+            # таблицу изменил другой клиент - куча могла устареть
+            self.refresh()
+            return
+
+        now = datetime.now() + timedelta(seconds=FIRE_TOLERANCE)
+        fired = []
+        while True:
+            top = self._top()
+            if top is None or top[0] > now:
+                break
+            heapq.heappop(self._heap)
+            fired.append(self._pending.pop(top[1]))
+        if fired:
+            self._fire(fired)
+
+        if self._loaded_until[0] <= now:
+            self._load_next_window()
+        else:
+            self._rearm()
+
+    def _fire(self, reminders):
+        for reminder in reminders:
+            print(f"Напоминание: {reminder.get('title') or 'задача'} ({reminder['reminder_time']})")
+            for callback in self._listeners:
+                try:
+                    callback(reminder)
+                except Exception as e:
+                    print(f"Ошибка обработчика напоминания: {e}")
+        ids = [reminder["id"] for reminder in reminders]
+        self._firing.update(ids)
+
+        def mark_fired():
+            db.mark_reminders_fired(ids)
+            return db.get_table_versions("reminders")
+
+        def done(versions):
+            self._firing.difference_update(ids)
+            self._versions = versions
+
+        def failed(error):
+            self._firing.difference_update(ids)
+            print(f"Не удалось отметить напоминания: {error}")
+
+        # у каждой пачки свой ключ: новая пачка не должна отменять отметку предыдущей
+        self.loader.submit(mark_fired, done, key=("fired", ids[0]), on_error=failed)
+
+    # --- загрузка окон ---
+
+    def _load_next_window(self):
+        now = datetime.now()
+        after = self._loaded_until
+        if after is None:
+            after = (now - REMINDER_GRACE, 0)
+        until = max(now, after[0]) + REMINDER_WINDOW
+
+        def fetch():
+            return db.get_pending_reminders(after, until, REMINDER_BATCH), db.get_table_versions("reminders")
+
+        self.loader.submit(fetch, lambda data: self._apply_window(data, until), key="window",
+                           on_error=self._on_load_error)
+
+    def _apply_window(self, data, until):
+        rows, versions = data
+        self._versions = versions
+        for row in rows:
+            if row["id"] in self._firing:
+                continue
+            self._pending[row["id"]] = row
+            heapq.heappush(self._heap, (row["reminder_time"], row["id"]))
+        if len(rows) >= REMINDER_BATCH:
+            # окно не поместилось: следующая загрузка продолжит с последней строки
+            self._loaded_until = (rows[-1]["reminder_time"], rows[-1]["id"])
+        else:
+            # всё до until загружено; следующее окно - когда время дойдёт до until
+            self._loaded_until = (until, 0)
+        self._rearm()
+
+    def _on_load_error(self, error):
+        print(f"Ошибка загрузки напоминаний: {error}")
+        # повторим позже, не мешая UI
+        self._cancel_timer()
+        if self.running:
+            self._event = Clock.schedule_once(lambda dt: self._load_next_window(), 60)
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """Общий планировщик напоминаний приложения"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReminderScheduler()
+    return _scheduler
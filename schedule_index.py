@@ -0,0 +1,214 @@
+import bisect
+from datetime import date, datetime, time, timedelta
+
+# ----------------------------
+# ИНДЕКС ИНТЕРВАЛОВ РАСПИСАНИЯ
+# ----------------------------
+# Пары одного дня хранятся отсортированными по началу. Пока пары дня не
+# пересекаются (это же гарантирует ограничение в базе), их концы тоже
+# отсортированы, и все пары, пересекающие [начало, конец), - это непрерывный
+# участок списка, который находится двумя бинарными поисками. В дне со старыми
+# пересекающимися парами (до ограничения) проверка идёт перебором этого дня.
+#
+# Пара может стоять только по нечётным или только по чётным неделям (week_type)
+# и действовать только между датами valid_from и valid_until (семестр). Пары
+# разных типов недель друг другу не мешают, поэтому у каждого дня свои списки
+# («дорожки») для каждого типа недели; пары одной дорожки с непересекающимися
+# датами отсеиваются уже после поиска по времени.
+
+# учебный год начинается 1 сентября: неделя, на которую оно приходится, - первая
+# (нечётная), дальше недели чередуются без сброса на весенний семестр
+ACADEMIC_YEAR_START = (9, 1)
+WEEK_TYPES = ("odd", "even")
+WEEK_TYPE_NAMES = {None: "каждую неделю", "odd": "нечётная неделя", "even": "чётная неделя"}
+
+
+def as_time(value):
+    """datetime.time из time, datetime или строки "ЧЧ:ММ"/"ЧЧ:ММ:СС" """
+    if isinstance(value, time):
+        return value
+    if isinstance(value, datetime):
+        return value.time()
+    text = str(value).strip()
+    return datetime.strptime(text, "%H:%M:%S" if text.count(":") == 2 else "%H:%M").time()
+
+
+def as_date(value):
+    """date из date, datetime или строки "ДД.ММ.ГГГГ"/"ГГГГ-ММ-ДД"; пустое значение - None"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    return datetime.strptime(text, "%d.%m.%Y" if "." in text else "%Y-%m-%d").date()
+
+
+def academic_week(day):
+    """Номер учебной недели даты (1 - неделя, на которую приходится 1 сентября)"""
+    day = as_date(day)
+    year = day.year
+    start = date(year, *ACADEMIC_YEAR_START)
+    start -= timedelta(days=start.weekday())
+    if day < start:
+        start = date(year - 1, *ACADEMIC_YEAR_START)
+        start -= timedelta(days=start.weekday())
+    return (day - start).days // 7 + 1
+
+
+def week_type(day):
+    """Тип недели даты: "odd" (нечётная) или "even" (чётная)"""
+    return "odd" if academic_week(day) % 2 else "even"
+
+
+def active_on(entry, day):
+    """Действует ли пара в дату day по своим датам (день недели и тип недели не проверяются)"""
+    valid_from, valid_until = as_date(entry.get("valid_from")), as_date(entry.get("valid_until"))
+    return (valid_from is None or valid_from <= day) and (valid_until is None or day <= valid_until)
+
+
+def _dates_overlap(entry, valid_from, valid_until):
+    entry_from, entry_until = as_date(entry.get("valid_from")), as_date(entry.get("valid_until"))
+    return ((valid_until is None or entry_from is None or entry_from <= valid_until)
+            and (valid_from is None or entry_until is None or valid_from <= entry_until))
+
+
+def conflict_text(entry):
+    """Пара в виде "Предмет ЧЧ:ММ–ЧЧ:ММ" для сообщений о пересечении"""
+    name = entry.get("subject_name") or "Без предмета"
+    text = f"{name} {as_time(entry['start_time']):%H:%M}–{as_time(entry['end_time']):%H:%M}"
+    if entry.get("week_type"):
+        text += f" ({WEEK_TYPE_NAMES[entry['week_type']]})"
+    return text
+
+
+class DaySlots:
+    """Пары одного дня недели, отсортированные по началу"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.entries = []
+        self.overlapping = False  # в дне уже есть пересекающиеся пары
+
+    def add(self, entry):
+        start, end = as_time(entry["start_time"]), as_time(entry["end_time"])
+        i = bisect.bisect_right(self.starts, start)
+        if (i > 0 and self.ends[i - 1] > start) or (i < len(self.starts) and self.starts[i] < end):
+            self.overlapping = True
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.entries.insert(i, entry)
+
+    def remove(self, entry_id):
+        for i, entry in enumerate(self.entries):
+            if entry.get("id") == entry_id:
+                del self.starts[i], self.ends[i], self.entries[i]
+                return entry
+        return None
+
+    def conflicts(self, start, end, exclude_id=None):
+        """Пары, пересекающие [start, end) (касание концами - не пересечение)"""
+        hi = bisect.bisect_left(self.starts, end)  # у пар правее начало >= end
+        if self.overlapping:
+            candidates = [i for i in range(hi) if self.ends[i] > start]
+        else:
+            # концы отсортированы: у пар левее lo конец <= start
+            lo = bisect.bisect_right(self.ends, start, 0, hi)
+            candidates = range(lo, hi)
+        return [self.entries[i] for i in candidates if exclude_id is None or self.entries[i].get("id") != exclude_id]
+
+
+class ScheduleIndex:
+    """Индекс пар расписания по дням и типам недель для быстрой проверки пересечений"""
+
+    def __init__(self, entries=()):
+        self.days = {}  # (день недели, тип недели или None) -> DaySlots
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        if entry.get("start_time") is None or entry.get("end_time") is None:
+            return
+        lane = (entry["day_of_week"], entry.get("week_type") or None)
+        self.days.setdefault(lane, DaySlots()).add(entry)
+
+    def remove(self, entry_id):
+        for slots in self.days.values():
+            if slots.remove(entry_id) is not None:
+                return
+
+    def conflicts(self, day_of_week, start_time, end_time, exclude_id=None,
+                  week_type=None, valid_from=None, valid_until=None):
+        """Пары дня day_of_week, пересекающие [start_time, end_time) в те же недели и даты"""
+        week_type = week_type or None
+        lanes = (None,) + WEEK_TYPES if week_type is None else (None, week_type)
+        valid_from, valid_until = as_date(valid_from), as_date(valid_until)
+        start, end = as_time(start_time), as_time(end_time)
+        found = []
+        for lane in lanes:
+            slots = self.days.get((day_of_week, lane))
+            if slots is not None:
+                found.extend(entry for entry in slots.conflicts(start, end, exclude_id)
+                             if _dates_overlap(entry, valid_from, valid_until))
+        found.sort(key=lambda entry: as_time(entry["start_time"]))
+        return found
+
+    def validate(self, entries):
+        """Проверяет пакет новых пар (например, импорт расписания) против индекса и друг друга.
+
+        Возвращает список конфликтов {"entry": новая пара, "conflicts": [пересекающиеся пары]};
+        пустой список - пакет можно сохранять.
+        """
+        result = []
+        batch = ScheduleIndex()
+        for entry in entries:
+            start, end = as_time(entry["start_time"]), as_time(entry["end_time"])
+            if start >= end:
+                result.append({"entry": entry, "conflicts": [], "reason": "начало не раньше конца"})
+                continue
+            valid_from, valid_until = as_date(entry.get("valid_from")), as_date(entry.get("valid_until"))
+            if valid_from is not None and valid_until is not None and valid_from > valid_until:
+                result.append({"entry": entry, "conflicts": [], "reason": "начало действия позже конца"})
+                continue
+            lane = (entry.get("week_type"), valid_from, valid_until)
+            found = (self.conflicts(entry["day_of_week"], start, end, entry.get("id"), *lane)
+                     + batch.conflicts(entry["day_of_week"], start, end, None, *lane))
+            if found:
+                result.append({"entry": entry, "conflicts": found, "reason": "пересечение"})
+            batch.add(entry)
+        return result
+
+
+class WeekTypeIndex:
+    """Пары по (тип недели, день недели), отсортированные по началу.
+
+    Что стоит в расписании на дату - один поиск в словаре и проверка дат
+    нескольких пар этого дня, без перебора всего расписания.
+    """
+
+    def __init__(self, entries=()):
+        self.slots = {(kind, day): [] for kind in WEEK_TYPES for day in range(7)}
+        self.days = {day: [] for day in range(7)}  # все пары дня недели, любой тип недели
+        for entry in entries:
+            day = entry.get("day_of_week")
+            if entry.get("start_time") is None or day not in self.days:
+                continue
+            self.days[day].append(entry)
+            for kind in WEEK_TYPES:
+                if entry.get("week_type") in (None, "", kind):
+                    self.slots[(kind, day)].append(entry)
+        for entries_list in list(self.slots.values()) + list(self.days.values()):
+            entries_list.sort(key=lambda entry: as_time(entry["start_time"]))
+
+    def by_day(self, day_of_week, week_type=None):
+        """Пары дня недели; week_type ("odd"/"even") - только пары, идущие в такие недели"""
+        if week_type:
+            return list(self.slots.get((week_type, day_of_week), ()))
+        return list(self.days.get(day_of_week, ()))
+
+    def on_date(self, day):
+        """Пары, которые идут в дату day"""
+        day = as_date(day)
+        return [entry for entry in self.slots[(week_type(day), day.weekday())] if active_on(entry, day)]
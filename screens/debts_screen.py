@@ -1,26 +1,72 @@
 from kivy.uix.screenmanager import Screen
 from kivy.properties import BooleanProperty, StringProperty
-from kivymd.uix.label import MDLabel
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.button import MDRaisedButton
-from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.card import MDCard
-from kivymd.uix.menu import MDDropdownMenu
 from kivy.metrics import dp
-from database import get_topics, add_topic, delete_topic, update_topic, get_subjects
+from widgets.card_list import ListCard
+from widgets.dialogs import show_message, confirm
+from widgets.subject_menu import SubjectMenu
+from loader import ScreenLoader
+from database import get_topics_page, get_topic, add_topic, delete_topic, update_topic, get_subjects, session, get_table_versions
+from frame_monitor import track
+
+
+class DebtCard(ListCard):
+    """Карточка задолженности в списке CardList"""
+    title = StringProperty("")
+    type_text = StringProperty("")
+    subject_text = StringProperty("")
+    automatic = BooleanProperty(False)
 
 
 class DebtsScreen(Screen):
     editing_topic_id = None
     has_debts = BooleanProperty(False)
+    form_visible = BooleanProperty(True)  # форма добавления развернута
+    loading = BooleanProperty(False)  # идёт фоновая загрузка списка
     selected_subject = StringProperty("")  # Для хранения выбранного предмета
     selected_subject_id = StringProperty("")  # Для хранения ID предмета
-
+    loaded_versions = None  # версии таблиц при прошлой загрузке списка
+    next_cursor = None  # курсор следующей страницы списка
+    topics_by_id = {}  # загруженные задолженности по id
+    subject_names = {}  # имена предметов для карточек
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loader = ScreenLoader("debts")
+        # меню предметов: пункты перестраиваются только при изменении предметов
+        self.subject_menu = SubjectMenu(self.select_subject)
+
+    @track
     def on_pre_enter(self):
-        """Загрузка списка задолженностей при открытии экрана"""
+        """Загрузка списка задолженностей при открытии экрана (в фоне)"""
         self.cancel_edit()
-        self.load_topics()
         self.update_subject_button_text()
+        versions = get_table_versions("topics", "subjects")
+        if versions is not None and versions == self.loaded_versions:
+            return
+        self.loading = True
+        self.loader.submit(self.fetch_topics, lambda data: self.apply_topics(data, versions),
+                           on_error=self.on_load_error)
+
+    def on_leave(self):
+        # результаты загрузок, не успевших завершиться, экрану больше не нужны
+        self.loader.cancel()
+        self.loading = False
+
+    def fetch_topics(self):
+        """Фоновая часть загрузки: предметы для карточек и первая страница задолженностей"""
+        with session():
+            return self.get_available_subjects(), get_topics_page()
+
+    def apply_topics(self, data, versions):
+        subjects, (topics, next_cursor) = data
+        self.show_topics(subjects, topics, next_cursor)
+        self.loaded_versions = versions
+        self.loading = False
+
+    def on_load_error(self, error):
+        self.loading = False
+        print(f"Ошибка при загрузке задолженностей: {error}")
+        self.show_error(f"Ошибка загрузки: {error}")
 
     def update_subject_button_text(self):
         """Обновляет текст кнопки выбора предмета"""
@@ -40,30 +86,11 @@ class DebtsScreen(Screen):
             return []
 
     def open_subject_dropdown(self):
-        """Открывает выпадающий список предметов"""
-        subjects = self.get_available_subjects()
-
-        menu_items = [
-            {
-                "text": subject["name"],
-                "viewclass": "OneLineListItem",
-                "on_release": lambda x=subject: self.select_subject(x),
-            } for subject in subjects
-        ]
-
-        menu_items.append({
-            "text": "Без предмета",
-            "viewclass": "OneLineListItem",
-            "on_release": lambda x=None: self.select_subject(None),
-        })
-
-        self.subject_menu = MDDropdownMenu(
-            caller=self.ids.subject_dropdown_btn,
-            items=menu_items,
-            width_mult=4,
-            max_height=dp(200)
-        )
-        self.subject_menu.open()
+        """Открывает выпадающий список предметов (пункты готовы заранее)"""
+        if not self.subject_menu.ready:
+            # список ещё не загружался - строим меню по (кэшированным) предметам
+            self.subject_menu.set_subjects(self.get_available_subjects())
+        self.subject_menu.open(self.ids.subject_dropdown_btn)
 
     def select_subject(self, subject):
         """Выбирает предмет из списка"""
@@ -76,182 +103,99 @@ class DebtsScreen(Screen):
 
         self.update_subject_button_text()
 
-        if hasattr(self, 'subject_menu'):
-            self.subject_menu.dismiss()
+        self.subject_menu.dismiss()
 
+    @track
     def load_topics(self):
-        """Загружает список задолженностей"""
-        if hasattr(self, 'ids') and 'list_container' in self.ids:
-            self.ids.list_container.clear_widgets()
-            topics = get_topics()
-
-            # Обновляем свойство has_debts
-            self.has_debts = len(topics) > 0
+        """Загружает первую страницу задолженностей"""
+        self.show_topics(self.get_available_subjects(), *get_topics_page())
+
+    @track
+    def show_topics(self, subjects, topics, next_cursor):
+        """Заменяет список первой страницей задолженностей"""
+        if hasattr(self, 'ids') and 'card_list' in self.ids:
+            self.subject_names = {s['id']: s.get('name', 'неизвестно') for s in subjects}
+            self.subject_menu.set_subjects(subjects)
+            self.topics_by_id = {}
+            self.next_cursor = next_cursor
+            self.ids.card_list.set_rows([])
+            self.add_topics_to_list(topics)
 
             print(f"=== ОТЛАДКА DebtsScreen ===")
             print(f"Загружено задолженностей: {len(topics)}")
             print(f"has_debts: {self.has_debts}")
 
-            if not topics:
-                # Если задолженностей нет - показываем сообщение
-                self.show_empty_message()
-            else:
-                # Если есть задолженности - показываем их
-                for topic in topics:
-                    self.add_topic_to_list(topic)
-
-    def show_empty_message(self):
-        """Показывает сообщение когда задолженностей нет"""
-        empty_card = MDCard(
-            orientation="vertical",
-            padding=dp(20),
-            size_hint_y=None,
-            height=dp(120),
-            elevation=2,
-            md_bg_color=(0.95, 0.95, 0.95, 1)
-        )
-
-        content = MDBoxLayout(orientation="vertical", spacing=dp(10))
-
-        content.add_widget(MDLabel(
-            text="Пока нет задолженностей",
-            theme_text_color="Secondary",
-            font_style="H6",
-            halign="center",
-            size_hint_y=None,
-            height=dp(30)
-        ))
-
-        content.add_widget(MDLabel(
-            text="Добавьте первую задолженность используя форму выше",
-            theme_text_color="Secondary",
-            halign="center",
-            size_hint_y=None,
-            height=dp(25)
-        ))
-
-        empty_card.add_widget(content)
-        self.ids.list_container.add_widget(empty_card)
-
-    def add_topic_to_list(self, topic_data):
-        """Добавляет одну задолженность в список с кнопками редактирования и удаления"""
-        topic_id = topic_data['id']
-        name = topic_data.get('name', 'Без названия')
-        work_type = topic_data.get('type', 'не указан')
-        subject_id = topic_data.get('subject_id')
-
-        # Получаем название предмета
-        subject_name = "не указан"
-        if subject_id:
-            subjects = get_subjects()
-            for subject in subjects:
-                if subject['id'] == subject_id:
-                    subject_name = subject.get('name', 'неизвестно')
-                    break
-
-        # Определяем высоту карточки в зависимости от типа
-        card_height = dp(180 if name.startswith('Просрочено:') else 160)
-
-        # Создаем карточку задолженности
-        card = MDCard(
-            orientation="vertical",
-            padding=dp(20),
-            size_hint_y=None,
-            height=card_height,
-            elevation=3
-        )
-
-        # Основной контент
-        content = MDBoxLayout(orientation="vertical", spacing=dp(8))
-
-        # Название задолженности
-        name_label = MDLabel(
-            text=f"{name}",
-            theme_text_color="Custom",
-            text_color=(0.4, 0.2, 0.6, 1),
-            font_style="H6",
-            size_hint_y=None,
-            height=dp(30),
-            bold=True
-        )
-
-        # Тип работы
-        type_label = MDLabel(
-            text=f"Тип: {work_type}",
-            theme_text_color="Custom",
-            text_color=(0.3, 0.3, 0.4, 1),
-            size_hint_y=None,
-            height=dp(25)
-        )
+    def load_more_topics(self):
+        """Догружает следующую страницу задолженностей (в фоне)"""
+        if not self.next_cursor or self.loader.pending("more"):
+            return
 
-        # Предмет
-        subject_label = MDLabel(
-            text=f"Предмет: {subject_name}",
-            theme_text_color="Custom",
-            text_color=(0.3, 0.3, 0.4, 1),
-            size_hint_y=None,
-            height=dp(25)
-        )
+        def apply(page):
+            topics, self.next_cursor = page
+            self.add_topics_to_list(topics)
 
-        content.add_widget(name_label)
-        content.add_widget(type_label)
-        content.add_widget(subject_label)
-
-        # Если это автоматически созданная задолженность, добавляем пометку
-        if name.startswith('Просрочено:'):
-            auto_label = MDLabel(
-                text="Автоматически создана из просроченной задачи",
-                theme_text_color="Custom",
-                text_color=(0.8, 0.4, 0.1, 1),  # Оранжевый цвет
-                font_style="Caption",
-                size_hint_y=None,
-                height=dp(12)
-            )
-            content.add_widget(auto_label)
-
-        # Кнопки действий
-        buttons_layout = MDBoxLayout(
-            orientation="horizontal",
-            size_hint_y=None,
-            height=dp(50),
-            spacing=dp(10)
-        )
+        self.loader.submit(lambda cursor=self.next_cursor: get_topics_page(cursor=cursor), apply, key="more")
 
-        edit_btn = MDRaisedButton(
-            text="Редактировать",
-            size_hint_x=0.5,
-            on_release=lambda x, topic_id=topic_id: self.edit_topic(topic_id)
-        )
-        edit_btn.md_bg_color = (0.5, 0.3, 0.7, 1)  # Фиолетовый
-        edit_btn.theme_text_color = "Custom"
-        edit_btn.text_color = (1, 1, 1, 1)
-
-        delete_btn = MDRaisedButton(
-            text="Удалить",
-            size_hint_x=0.5,
-            on_release=lambda x, topic_id=topic_id: self.delete_topic_dialog(topic_id, name)
-        )
-        delete_btn.md_bg_color = (0.8, 0.2, 0.2, 1)  # Красный для удаления
-        delete_btn.theme_text_color = "Custom"
-        delete_btn.text_color = (1, 1, 1, 1)
+    def on_list_scroll(self, scroll_view):
+        """При прокрутке к концу списка подгружаем следующую страницу"""
+        if self.next_cursor and scroll_view.scroll_y <= 0.05:
+            self.load_more_topics()
 
-        buttons_layout.add_widget(edit_btn)
-        buttons_layout.add_widget(delete_btn)
+    def topic_to_row(self, topic_data):
+        """Превращает строку задолженности из базы в словарь данных для карточки DebtCard"""
+        name = topic_data.get('name') or 'Без названия'
+        subject_id = topic_data.get('subject_id')
 
-        card.add_widget(content)
-        card.add_widget(buttons_layout)
-        self.ids.list_container.add_widget(card)
+        # Название предмета
+        subject_name = "не указан"
+        if subject_id:
+            subject_name = self.subject_names.get(subject_id, 'неизвестно')
+
+        # Автоматически созданные задолженности получают пометку и карточку повыше
+        automatic = name.startswith('Просрочено:')
+        return {
+            'row_id': topic_data['id'],
+            'sort_key': topic_data.get('name'),
+            'height': dp(180 if automatic else 160),
+            'title': name,
+            'type_text': topic_data.get('type') or 'не указан',
+            'subject_text': subject_name,
+            'automatic': automatic,
+        }
+
+    def add_topics_to_list(self, topics):
+        """Добавляет задолженности в конец списка (данные CardList, а не виджеты)"""
+        for topic in topics:
+            self.topics_by_id[topic['id']] = topic
+        self.ids.card_list.append_rows(self.topic_to_row(topic) for topic in topics)
+        self.has_debts = bool(self.ids.card_list.data)
+
+    def refresh_topic_row(self, topic_id, versions_before):
+        """Точечно обновляет карточку задолженности после добавления, изменения или удаления.
+
+        Если список устарел ещё до изменения, он перезагружается целиком.
+        """
+        # незавершённые фоновые загрузки принесли бы данные до изменения
+        self.loader.cancel()
+        self.loading = False
+        if versions_before is None or versions_before != self.loaded_versions:
+            with session():
+                self.load_topics()
+        else:
+            topic = get_topic(topic_id)
+            if topic is None:
+                self.topics_by_id.pop(topic_id, None)
+                self.ids.card_list.remove_row(topic_id)
+            else:
+                self.topics_by_id[topic_id] = topic
+                self.ids.card_list.upsert_row(self.topic_to_row(topic), has_more=bool(self.next_cursor))
+            self.has_debts = bool(self.ids.card_list.data)
+        self.loaded_versions = get_table_versions("topics", "subjects")
 
     def edit_topic(self, topic_id):
         """Редактирование задолженности"""
-        # Находим тему в базе
-        topics = get_topics()
-        topic_to_edit = None
-
-        for topic in topics:
-            if topic['id'] == topic_id:
-                topic_to_edit = topic
-                break
+        # Находим тему среди загруженных
+        topic_to_edit = self.topics_by_id.get(topic_id)
 
         if not topic_to_edit:
             self.show_error("Задолженность не найдена")
@@ -279,42 +223,25 @@ class DebtsScreen(Screen):
         # Устанавливаем режим редактирования
         self.editing_topic_id = topic_id
         self.ids.add_button.text = "Сохранить изменения"
+        self.form_visible = True
 
         self.show_success("Режим редактирования. Измените данные и нажмите 'Сохранить изменения'")
 
     def delete_topic_dialog(self, topic_id, topic_name):
         """Диалог подтверждения удаления"""
-        self.dialog = MDDialog(
-            title="Удаление задолженности",
-            text=f"Вы уверены, что хотите удалить задолженность:\n\"{topic_name}\"?",
-            buttons=[
-                MDRaisedButton(
-                    text="Отмена",
-                    on_release=lambda x: self.dialog.dismiss()
-                ),
-                MDRaisedButton(
-                    text="Удалить",
-                    on_release=lambda x: self.delete_topic(topic_id)
-                )
-            ]
+        self.dialog = confirm(
+            "Удаление задолженности",
+            f"Вы уверены, что хотите удалить задолженность:\n\"{topic_name}\"?",
+            lambda: self.delete_topic(topic_id)
         )
-        # Устанавливаем цвета для кнопок диалога
-        self.dialog.buttons[0].md_bg_color = (0.8, 0.7, 0.9, 1)  # Светло-фиолетовый
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (0.4, 0.2, 0.6, 1)
-
-        self.dialog.buttons[1].md_bg_color = (0.8, 0.2, 0.2, 1)  # Красный
-        self.dialog.buttons[1].theme_text_color = "Custom"
-        self.dialog.buttons[1].text_color = (1, 1, 1, 1)
-
-        self.dialog.open()
 
     def delete_topic(self, topic_id):
         """Удаляет задолженность"""
         try:
+            versions_before = get_table_versions("topics", "subjects")
             delete_topic(topic_id)
             self.dialog.dismiss()
-            self.load_topics()
+            self.refresh_topic_row(topic_id, versions_before)
             self.show_success("Задолженность удалена")
         except Exception as e:
             self.show_error(f"Ошибка при удалении: {e}")
@@ -338,6 +265,8 @@ class DebtsScreen(Screen):
             self.show_error("Введите название задолженности")
             return
 
+        versions_before = get_table_versions("topics", "subjects")
+        changed_id = None
         if self.editing_topic_id:
             # Режим редактирования
             try:
@@ -347,13 +276,14 @@ class DebtsScreen(Screen):
                     work_type=work_type if work_type else 'не указан',
                     subject_id=self.selected_subject_id if self.selected_subject_id else None
                 )
+                changed_id = self.editing_topic_id
                 self.show_success("Задолженность обновлена")
             except Exception as e:
                 self.show_error(f"Ошибка при обновлении: {e}")
         else:
             # Режим добавления
             try:
-                add_topic(
+                changed_id = add_topic(
                     name=name,
                     work_type=work_type if work_type else 'не указан',
                     subject_id=self.selected_subject_id if self.selected_subject_id else None
@@ -362,42 +292,15 @@ class DebtsScreen(Screen):
             except Exception as e:
                 self.show_error(f"Ошибка при добавлении: {e}")
 
-        # Обновляем список и сбрасываем форму
-        self.load_topics()
+        # Обновляем в списке только изменённую задолженность и сбрасываем форму
+        if changed_id is not None:
+            self.refresh_topic_row(changed_id, versions_before)
         self.cancel_edit()
 
     def show_error(self, message):
         """Показывает сообщение об ошибке"""
-        self.dialog = MDDialog(
-            title="Ошибка",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        # Фиолетовая кнопка для диалога
-        self.dialog.buttons[0].md_bg_color = (0.5, 0.3, 0.7, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
+        show_message("Ошибка", message)
 
     def show_success(self, message):
         """Показывает сообщение об успехе"""
-        self.dialog = MDDialog(
-            title="Успешно",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        # Фиолетовая кнопка для диалога
-        self.dialog.buttons[0].md_bg_color = (0.5, 0.3, 0.7, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
\ No newline at end of file
+        show_message("Успешно", message)
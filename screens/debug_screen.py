@@ -0,0 +1,79 @@
+from kivy.uix.screenmanager import Screen
+from kivy.properties import StringProperty
+from widgets.dialogs import show_message
+from database import DB_METRICS_ENABLED, get_db_metrics, dump_db_metrics, reset_db_metrics
+
+# файл, в который кнопка "Сохранить JSON" выгружает замеры
+METRICS_FILE = "db_metrics.json"
+
+# сколько самых медленных функций показывать
+SLOWEST_LIMIT = 15
+
+
+class DebugScreen(Screen):
+    """Скрытый экран отладки (F12): замеры запросов к базе"""
+    report = StringProperty("")
+    return_to = StringProperty("home")  # экран, с которого пришли
+
+    def on_pre_enter(self):
+        self.refresh()
+
+    def refresh(self):
+        """Перестраивает отчёт по текущим замерам"""
+        metrics = get_db_metrics()
+        lines = [f"Замеры с {metrics['since']}", ""]
+        if not DB_METRICS_ENABLED:
+            lines += ["Замеры выключены: запустите приложение с STUDY_TRACKER_DB_METRICS=1", ""]
+
+        connects = metrics["get_connection"]
+        lines.append(f"Получение соединения: {connects['count']} раз, "
+                     f"среднее {connects['avg_ms']:.1f} мс, p95 {connects['p95_ms']:.0f} мс, "
+                     f"макс. {connects['max_ms']:.1f} мс")
+        pool = metrics["pool"]
+        if pool:
+            lines.append(f"Пул: открыто {pool['connects']}, попаданий {pool['hits']}, "
+                         f"ожиданий {pool['waits']}, занято {pool['in_use']}, свободно {pool['idle']}")
+        lines.append("")
+
+        lines.append("Самые медленные функции (p95 / среднее / макс., мс):")
+        functions = sorted(metrics["functions"].items(),
+                           key=lambda item: item[1]["total"]["p95_ms"], reverse=True)
+        if not functions:
+            lines.append("  вызовов пока не было")
+        for name, stats in functions[:SLOWEST_LIMIT]:
+            total = stats["total"]
+            lines.append(
+                f"  {name}: {total['p95_ms']:.0f} / {total['avg_ms']:.1f} / {total['max_ms']:.1f}"
+                f"  вызовов {stats['calls']}, строк {stats['rows']}, "
+                f"подключение {stats['connect']['avg_ms']:.1f}, запросы {stats['execute']['avg_ms']:.1f}"
+                + (f", ошибок {stats['errors']}" if stats["errors"] else "")
+            )
+        lines.append("")
+
+        lines.append("Вызовы по экранам:")
+        for name, screen in sorted(metrics["screens"].items(),
+                                   key=lambda item: item[1]["total_calls"], reverse=True):
+            per_entry = screen["calls_per_entry"]
+            header = f"  {name}: входов {screen['entries']}, вызовов {screen['total_calls']}"
+            if per_entry is not None:
+                header += f" ({per_entry} на вход)"
+            lines.append(header)
+            for function, count in sorted(screen["calls"].items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"      {function}: {count}")
+
+        self.report = "\n".join(lines)
+
+    def reset(self):
+        reset_db_metrics()
+        self.refresh()
+
+    def save_json(self):
+        try:
+            dump_db_metrics(METRICS_FILE)
+            show_message("Успешно", f"Замеры сохранены в {METRICS_FILE}")
+        except Exception as e:
+            print(f"Ошибка при сохранении замеров: {e}")
+            show_message("Ошибка", f"Не удалось сохранить замеры: {e}")
+
+    def go_back(self):
+        self.manager.show(self.return_to)
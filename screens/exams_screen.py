@@ -1,83 +1,95 @@
 from kivy.uix.screenmanager import Screen
-from kivy.properties import BooleanProperty
-from kivymd.uix.label import MDLabel
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.button import MDRaisedButton
-from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.card import MDCard
+from kivy.properties import BooleanProperty, StringProperty
 from kivy.metrics import dp
-from database import add_exam, get_exams_only, delete_task, update_task
+from widgets.card_list import ListCard
+from widgets.dialogs import show_message, confirm
+from loader import ScreenLoader
+from database import add_exam, get_exams_page, get_task, delete_task, update_task, get_table_versions
+from frame_monitor import track
+
+
+class ExamCard(ListCard):
+    """Карточка экзамена в списке CardList"""
+    title = StringProperty("")
+    date_text = StringProperty("")
+    note = StringProperty("")
 
 
 class ExamsScreen(Screen):
     editing_exam_id = None
     has_exams = BooleanProperty(False)  # Добавляем свойство
+    form_visible = BooleanProperty(True)  # форма добавления развернута
+    loading = BooleanProperty(False)  # идёт фоновая загрузка списка
+    loaded_versions = None  # версии таблиц при прошлой загрузке списка
+    next_cursor = None  # курсор следующей страницы списка
+    exams_by_id = {}  # загруженные экзамены по id
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loader = ScreenLoader("exams")
 
+    @track
     def on_pre_enter(self):
-        """Загрузка списка экзаменов при открытии экрана"""
+        """Загрузка списка экзаменов при открытии экрана (в фоне)"""
         self.cancel_edit()
-        self.load_exams()
-
+        versions = get_table_versions("tasks")
+        if versions is not None and versions == self.loaded_versions:
+            return
+        self.loading = True
+        self.loader.submit(get_exams_page, lambda page: self.apply_exams(page, versions),
+                           on_error=self.on_load_error)
+
+    def on_leave(self):
+        # результаты загрузок, не успевших завершиться, экрану больше не нужны
+        self.loader.cancel()
+        self.loading = False
+
+    def apply_exams(self, page, versions):
+        self.show_exams(*page)
+        self.loaded_versions = versions
+        self.loading = False
+
+    def on_load_error(self, error):
+        self.loading = False
+        print(f"Ошибка при загрузке экзаменов: {error}")
+        self.show_error(f"Ошибка загрузки: {error}")
+
+    @track
     def load_exams(self):
-        """Загружает список экзаменов"""
-        self.ids.list_container.clear_widgets()
-        exams = get_exams_only()
+        """Загружает первую страницу экзаменов"""
+        self.show_exams(*get_exams_page())
 
-        # Обновляем свойство has_exams
-        self.has_exams = len(exams) > 0
+    @track
+    def show_exams(self, exams, next_cursor):
+        """Заменяет список первой страницей экзаменов"""
+        self.exams_by_id = {}
+        self.next_cursor = next_cursor
+        self.ids.card_list.set_rows([])
+        self.add_exams_to_list(exams)
 
         print(f"=== ОТЛАДКА ExamsScreen ===")
         print(f"Загружено экзаменов: {len(exams)}")
         print(f"has_exams: {self.has_exams}")
 
-        if not exams:
-            # Если экзаменов нет - показываем сообщение
-            self.show_empty_message()
-        else:
-            # Если есть экзамены - показываем их
-            for exam in exams:
-                self.add_exam_to_list(exam)
-
-    def show_empty_message(self):
-        """Показывает сообщение когда экзаменов нет"""
-        empty_card = MDCard(
-            orientation="vertical",
-            padding=dp(20),
-            size_hint_y=None,
-            height=dp(120),
-            elevation=2,
-            md_bg_color=(0.95, 0.95, 0.95, 1)
-        )
+    def load_more_exams(self):
+        """Догружает следующую страницу экзаменов (в фоне)"""
+        if not self.next_cursor or self.loader.pending("more"):
+            return
 
-        content = MDBoxLayout(orientation="vertical", spacing=dp(10))
-
-        content.add_widget(MDLabel(
-            text="Пока нет экзаменов",
-            theme_text_color="Secondary",
-            font_style="H6",
-            halign="center",
-            size_hint_y=None,
-            height=dp(30)
-        ))
-
-        content.add_widget(MDLabel(
-            text="Добавьте первый экзамен используя форму выше",
-            theme_text_color="Secondary",
-            halign="center",
-            size_hint_y=None,
-            height=dp(25)
-        ))
-
-        empty_card.add_widget(content)
-        self.ids.list_container.add_widget(empty_card)
-
-    def add_exam_to_list(self, exam_data):
-        """Добавляет один экзамен в список с кнопками редактирования и удаления"""
-        exam_id = exam_data['id']
-        title = exam_data.get('title', 'Без названия')
-        due_date = exam_data.get('due_date')
-        description = exam_data.get('description', '')
+        def apply(page):
+            exams, self.next_cursor = page
+            self.add_exams_to_list(exams)
+
+        self.loader.submit(lambda cursor=self.next_cursor: get_exams_page(cursor), apply, key="more")
+
+    def on_list_scroll(self, scroll_view):
+        """При прокрутке к концу списка подгружаем следующую страницу"""
+        if self.next_cursor and scroll_view.scroll_y <= 0.05:
+            self.load_more_exams()
 
+    def exam_to_row(self, exam_data):
+        """Превращает строку экзамена из базы в словарь данных для карточки ExamCard"""
+        due_date = exam_data.get('due_date')
         if due_date:
             if isinstance(due_date, str):
                 date_str = due_date
@@ -86,95 +98,47 @@ class ExamsScreen(Screen):
         else:
             date_str = "Дата не указана"
 
-        # Создаем карточку экзамена
-        card = MDCard(
-            orientation="vertical",
-            padding=dp(20),
-            size_hint_y=None,
-            height=dp(165),
-            elevation=3
-        )
-
-        # Основной контент
-        content = MDBoxLayout(orientation="vertical", spacing=dp(8))
-
-        # Заголовок
-        title_label = MDLabel(
-            text=f"{title}",
-            theme_text_color="Custom",
-            text_color=(0.8, 0.2, 0.2, 1),  # Красный для экзаменов
-            font_style="H6",
-            size_hint_y=None,
-            height=dp(30),
-            bold=True
-        )
-
-        # Дата
-        date_label = MDLabel(
-            text=f"{date_str}",
-            theme_text_color="Custom",
-            text_color=(0.3, 0.3, 0.4, 1),
-            size_hint_y=None,
-            height=dp(25)
-        )
-
-        content.add_widget(title_label)
-        content.add_widget(date_label)
-
-        # Заметки (если есть)
-        if description:
-            note_label = MDLabel(
-                text=f"{description}",
-                theme_text_color="Custom",
-                text_color=(0.3, 0.3, 0.4, 1),
-                size_hint_y=None,
-                height=dp(25)
-            )
-            content.add_widget(note_label)
-
-        # Кнопки действий
-        buttons_layout = MDBoxLayout(
-            orientation="horizontal",
-            size_hint_y=None,
-            height=dp(50),
-            spacing=dp(10)
-        )
-
-        edit_btn = MDRaisedButton(
-            text="Редактировать",
-            size_hint_x=0.5,
-            on_release=lambda x, exam_id=exam_id: self.edit_exam(exam_id)
-        )
-        edit_btn.md_bg_color = (0.5, 0.3, 0.7, 1)
-        edit_btn.theme_text_color = "Custom"
-        edit_btn.text_color = (1, 1, 1, 1)
-
-        delete_btn = MDRaisedButton(
-            text="Удалить",
-            size_hint_x=0.5,
-            on_release=lambda x, exam_id=exam_id: self.delete_exam_dialog(exam_id, title)
-        )
-        delete_btn.md_bg_color = (0.8, 0.2, 0.2, 1)
-        delete_btn.theme_text_color = "Custom"
-        delete_btn.text_color = (1, 1, 1, 1)
-
-        buttons_layout.add_widget(edit_btn)
-        buttons_layout.add_widget(delete_btn)
-
-        card.add_widget(content)
-        card.add_widget(buttons_layout)
-        self.ids.list_container.add_widget(card)
+        return {
+            'row_id': exam_data['id'],
+            'sort_key': exam_data.get('due_date'),
+            'height': dp(165),
+            'title': exam_data.get('title') or 'Без названия',
+            'date_text': date_str,
+            'note': exam_data.get('description') or '',
+        }
+
+    def add_exams_to_list(self, exams):
+        """Добавляет экзамены в конец списка (данные CardList, а не виджеты)"""
+        for exam in exams:
+            self.exams_by_id[exam['id']] = exam
+        self.ids.card_list.append_rows(self.exam_to_row(exam) for exam in exams)
+        self.has_exams = bool(self.ids.card_list.data)
+
+    def refresh_exam_row(self, exam_id, versions_before):
+        """Точечно обновляет карточку экзамена после добавления, изменения или удаления.
+
+        Если список устарел ещё до изменения, он перезагружается целиком.
+        """
+        # незавершённые фоновые загрузки принесли бы данные до изменения
+        self.loader.cancel()
+        self.loading = False
+        if versions_before is None or versions_before != self.loaded_versions:
+            self.load_exams()
+        else:
+            exam = get_task(exam_id)
+            if exam is None or exam.get('type') != 'exam':
+                self.exams_by_id.pop(exam_id, None)
+                self.ids.card_list.remove_row(exam_id)
+            else:
+                self.exams_by_id[exam_id] = exam
+                self.ids.card_list.upsert_row(self.exam_to_row(exam), has_more=bool(self.next_cursor))
+            self.has_exams = bool(self.ids.card_list.data)
+        self.loaded_versions = get_table_versions("tasks")
 
     def edit_exam(self, exam_id):
         """Редактирование экзамена"""
-        # Находим экзамен в базе
-        exams = get_exams_only()
-        exam_to_edit = None
-
-        for exam in exams:
-            if exam['id'] == exam_id:
-                exam_to_edit = exam
-                break
+        # Находим экзамен среди загруженных
+        exam_to_edit = self.exams_by_id.get(exam_id)
 
         if not exam_to_edit:
             self.show_error("Экзамен не найден")
@@ -196,42 +160,34 @@ class ExamsScreen(Screen):
         # Устанавливаем режим редактирования
         self.editing_exam_id = exam_id
         self.ids.add_button.text = "Сохранить изменения"
+        self.form_visible = True
 
         self.show_success("Режим редактирования. Измените данные и нажмите 'Сохранить изменения'")
 
+    def open_for_edit(self, exam_id):
+        """Редактирование экзамена, которого может не быть среди загруженных (переход с главного экрана)"""
+        exam = get_task(exam_id)
+        if exam is None:
+            self.show_error("Экзамен не найден")
+            return
+        self.exams_by_id[exam_id] = exam
+        self.edit_exam(exam_id)
+
     def delete_exam_dialog(self, exam_id, exam_title):
         """Диалог подтверждения удаления"""
-        self.dialog = MDDialog(
-            title="Удаление экзамена",
-            text=f"Вы уверены, что хотите удалить экзамен:\n\"{exam_title}\"?",
-            buttons=[
-                MDRaisedButton(
-                    text="Отмена",
-                    on_release=lambda x: self.dialog.dismiss()
-                ),
-                MDRaisedButton(
-                    text="Удалить",
-                    on_release=lambda x: self.delete_exam(exam_id)
-                )
-            ]
+        self.dialog = confirm(
+            "Удаление экзамена",
+            f"Вы уверены, что хотите удалить экзамен:\n\"{exam_title}\"?",
+            lambda: self.delete_exam(exam_id)
         )
-        # Устанавливаем цвета для кнопок диалога
-        self.dialog.buttons[0].md_bg_color = (0.8, 0.7, 0.9, 1)  # Светло-фиолетовый
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (0.4, 0.2, 0.6, 1)
-
-        self.dialog.buttons[1].md_bg_color = (0.8, 0.2, 0.2, 1)  # Красный
-        self.dialog.buttons[1].theme_text_color = "Custom"
-        self.dialog.buttons[1].text_color = (1, 1, 1, 1)
-
-        self.dialog.open()
 
     def delete_exam(self, exam_id):
         """Удаляет экзамен"""
         try:
+            versions_before = get_table_versions("tasks")
             delete_task(exam_id)
             self.dialog.dismiss()
-            self.load_exams()
+            self.refresh_exam_row(exam_id, versions_before)
             self.show_success("Экзамен удален")
         except Exception as e:
             self.show_error(f"Ошибка при удалении: {e}")
@@ -254,6 +210,8 @@ class ExamsScreen(Screen):
             self.show_error("Заполните название и дату экзамена")
             return
 
+        versions_before = get_table_versions("tasks")
+        changed_id = None
         if self.editing_exam_id:
             # Режим редактирования
             try:
@@ -263,50 +221,24 @@ class ExamsScreen(Screen):
                     description=note,
                     due_date=dt
                 )
+                changed_id = self.editing_exam_id
                 self.show_success("Экзамен обновлен")
             except Exception as e:
                 self.show_error(f"Ошибка при обновлении: {e}")
         else:
             # Режим добавления
-            add_exam(title, note, None, None, dt)
+            changed_id = add_exam(title, note, None, None, dt)
             self.show_success("Экзамен добавлен")
 
-        # Обновляем список и сбрасываем форму
-        self.load_exams()
+        # Обновляем в списке только изменённый экзамен и сбрасываем форму
+        if changed_id is not None:
+            self.refresh_exam_row(changed_id, versions_before)
         self.cancel_edit()
 
     def show_error(self, message):
         """Показывает сообщение об ошибке"""
-        self.dialog = MDDialog(
-            title="Ошибка",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        # Фиолетовая кнопка для диалога
-        self.dialog.buttons[0].md_bg_color = (0.5, 0.3, 0.7, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
+        show_message("Ошибка", message)
 
     def show_success(self, message):
         """Показывает сообщение об успехе"""
-        self.dialog = MDDialog(
-            title="Успешно",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        # Фиолетовая кнопка для диалога
-        self.dialog.buttons[0].md_bg_color = (0.5, 0.3, 0.7, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
\ No newline at end of file
+        show_message("Успешно", message)
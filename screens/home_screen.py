@@ -6,26 +6,14 @@ from kivymd.uix.card import MDCard
 from kivymd.uix.list import OneLineListItem, OneLineAvatarListItem, IconLeftWidget
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.button import MDFlatButton
-from datetime import datetime, timedelta
-from database import get_connection
+from datetime import datetime
+import database as db
 from kivy.metrics import dp
-
-
-
-class CalendarDayButton(MDFlatButton):
-    """Кнопка дня в календаре"""
-
-    def __init__(self, day, has_events=False, **kwargs):
-        super().__init__(**kwargs)
-        self.day = day
-        self.has_events = has_events
-        self.text = str(day)
-        self.size_hint = (1, 1)
-        self.font_size = '14sp'
-
-        # Подсветка дней с событиями
-        if has_events:
-            self.md_bg_color = (0.2, 0.6, 0.8, 0.3)
+from loader import ScreenLoader
+from widgets.skeleton import SkeletonLine
+from widgets.dialogs import show_message, task_actions
+from widgets.calendar_grid import CalendarGrid  # сетка календаря в home_screen.kv
+from frame_monitor import track
 
 
 class HomeScreen(Screen):
@@ -37,12 +25,85 @@ class HomeScreen(Screen):
     # Свойства для календаря со значениями по умолчанию
     current_month = NumericProperty(datetime.now().month)
     current_year = NumericProperty(datetime.now().year)
-    calendar_days = ListProperty([])
 
+    # версии таблиц и дата, с которыми экран был загружен в прошлый раз
+    loaded_state = None
+    # диалог событий дня: создаётся при первом показе и переиспользуется
+    day_events_dialog = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loader = ScreenLoader("home")
+
+    @track
     def on_pre_enter(self):
-        self.init_calendar()
-        self.load_all_sections()
-        self.debug_check_all_tasks()
+        # данные и дата не менялись с прошлого входа - экран уже актуален
+        state = (db.get_table_versions("tasks", "subjects", "schedule"), datetime.now().date())
+        if state[0] is not None and state == self.loaded_state:
+            return
+        self.load_dashboard(state)
+
+    def load_dashboard(self, state):
+        """Загружает все секции главного экрана одним снимком в фоне"""
+        now = datetime.now()
+        self.current_month = now.month
+        self.current_year = now.year
+        self.show_loading()
+        self.loader.submit(lambda year=now.year, month=now.month: self.fetch_all(year, month),
+                           lambda data: self.apply_all(data, state), on_error=self.on_load_error)
+
+    def on_leave(self):
+        # результаты загрузок, не успевших завершиться, экрану больше не нужны
+        self.loader.cancel()
+
+    def fetch_all(self, year, month):
+        """Фоновая часть загрузки: все секции главного экрана одним запросом"""
+        today = datetime.now().date()
+        snapshot = db.get_dashboard_snapshot(today)
+        print(f"Загружено задач на сегодня: {len(snapshot['today_tasks'])}, "
+              f"дедлайнов: {len(snapshot['upcoming_deadlines'])}")
+        data = {
+            'today_tasks': snapshot['today_tasks'],
+            'upcoming_deadlines': snapshot['upcoming_deadlines'],
+            'next_exam': [snapshot['next_exam']] if snapshot['next_exam'] else [],
+        }
+        if (year, month) == (today.year, today.month):
+            data['month_tasks'] = snapshot['month_tasks']
+        else:
+            data['month_tasks'] = self.get_tasks_for_month(year, month)
+        # пары месяца - из расписания, загруженного одним запросом на всю сессию
+        data['month_classes'] = self.get_classes_for_month(year, month)
+        return data
+
+    @track
+    def apply_all(self, data, state):
+        """UI-часть загрузки: отрисовывает календарь и секции"""
+        self.show_calendar(data['month_tasks'], data.get('month_classes', {}))
+        # соседние месяцы - заранее, чтобы листание календаря не ждало базы
+        year, month = self.current_year, self.current_month
+        self.loader.submit(lambda: self.fetch_calendar(year, month), lambda result: None, key="calendar")
+        self.today_tasks = data['today_tasks']
+        self.show_today_tasks()
+        self.upcoming_deadlines = data['upcoming_deadlines']
+        self.show_upcoming_deadlines()
+        self.next_exam = data['next_exam']
+        self.show_next_exam()
+        self.loaded_state = state
+
+    def on_load_error(self, error):
+        """Снимок не загрузился - вместо заглушек показываем пустые секции"""
+        print(f"Ошибка загрузки главного экрана: {error}")
+        self.apply_all({'month_tasks': {}, 'today_tasks': [], 'upcoming_deadlines': [], 'next_exam': []},
+                       None)
+
+    def show_loading(self):
+        """Заглушки в секциях, пока идёт загрузка"""
+        for name in ('today_container', 'deadlines_container'):
+            if name in self.ids:
+                container = self.ids[name]
+                container.clear_widgets()
+                for _ in range(3):
+                    container.add_widget(SkeletonLine())
 
     def get_event_type_text(self, event_type):
         """Получить читаемое название типа события"""
@@ -51,6 +112,7 @@ class HomeScreen(Screen):
             'homework': 'Домашняя работа',
             'lecture': 'Лекция',
             'practice': 'Практика',
+            'class': 'Пара',
             'other': 'Задача'
         }
         return type_map.get(event_type, 'Событие')
@@ -60,43 +122,30 @@ class HomeScreen(Screen):
         try:
             print(f"🔍 Ищем события для даты: {date}")
 
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        SELECT t.*, s.name as subject_name 
-                        FROM tasks t 
-                        LEFT JOIN subjects s ON t.subject_id = s.id 
-                        WHERE t.due_date::date = %s 
-                        AND t.status != 'completed'
-                        ORDER BY 
-                            CASE 
-                                WHEN t.type = 'exam' THEN 1
-                                ELSE 2 
-                            END,
-                            t.due_date ASC
-                    """, (date,))
-                    events = cur.fetchall()
-
-                    print(f"📅 Найдено событий: {len(events)}")
-                    for event in events:
-                        print(f"   - {event['title']} ({event.get('type', 'no type')})")
-
-                    return [dict(event) for event in events]
+            events = db.get_events_for_date(date)
+            # пары расписания - после экзаменов, перед остальными задачами
+            classes = db.get_classes_for_date(date)
+            exams = [event for event in events if event.get('type') == 'exam']
+            events = exams + classes + [event for event in events if event.get('type') != 'exam']
+
+            print(f"📅 Найдено событий: {len(events)}")
+            for event in events:
+                print(f"   - {event['title']} ({event.get('type', 'no type')})")
+
+            return events
         except Exception as e:
             print(f"❌ Ошибка загрузки событий для даты {date}: {e}")
             return []
 
-    def on_day_selected(self, day_info):
+    def on_day_selected(self, selected_date):
         """Обработка выбора дня в календаре"""
-        if day_info['month'] == 'current':
-            selected_date = day_info['date']
-            print(f"🎯 Выбран день: {selected_date}")
+        print(f"🎯 Выбран день: {selected_date}")
 
-            # Получаем события для выбранной даты
-            events = self.get_events_for_date(selected_date)
+        # Получаем события для выбранной даты
+        events = self.get_events_for_date(selected_date)
 
-            # Показываем диалог с событиями
-            self.show_day_events_dialog(selected_date, events)
+        # Показываем диалог с событиями
+        self.show_day_events_dialog(selected_date, events)
 
     # Вместо импорта MDDivider, добавьте этот метод в класс HomeScreen:
     def create_divider(self):
@@ -116,13 +165,41 @@ class HomeScreen(Screen):
 
         return divider
 
+    @track
     def show_day_events_dialog(self, date, events):
-        """Показать красивый диалог с событиями дня"""
-        print(f"🔄 Создаем диалог для {date}, событий: {len(events)}")
+        """Показать красивый диалог с событиями дня.
 
-        # Закрываем предыдущий диалог, если он есть
-        if hasattr(self, 'day_events_dialog') and self.day_events_dialog:
-            self.day_events_dialog.dismiss()
+        Диалог создаётся при первом показе, дальше в нём меняются дата и список событий.
+        """
+        print(f"🔄 Диалог для {date}, событий: {len(events)}")
+
+        if self.day_events_dialog is None:
+            self.day_events_dialog = self.build_day_events_dialog()
+
+        self.day_date_label.text = date.strftime('%d.%m.%Y')
+        self.day_events_box.clear_widgets()
+
+        if not events:
+            # Сообщение когда событий нет
+            self.day_empty_message.height = dp(80)
+            self.day_empty_message.opacity = 1
+            self.day_events_content.height = dp(150)  # Фиксированная высота для пустого состояния
+        else:
+            self.day_empty_message.height = 0
+            self.day_empty_message.opacity = 0
+            # Список событий с иконками
+            for event in events:
+                self.day_events_box.add_widget(self.create_event_list_item(event))
+
+            self.day_events_content.height = dp(80 + len(events) * 70)  # Высота зависит от количества событий
+
+        self.day_events_dialog.height = self.day_events_content.height + dp(100)  # Добавляем место для кнопок
+        self.day_events_dialog.open()
+
+    @track
+    def build_day_events_dialog(self):
+        """Создаёт диалог событий дня (один раз на экран)"""
+        from kivymd.uix.label import MDIcon
 
         # Создаем красивый контент для диалога
         content = MDBoxLayout(
@@ -142,7 +219,6 @@ class HomeScreen(Screen):
         )
 
         # Иконка календаря
-        from kivymd.uix.label import MDIcon
         header_layout.add_widget(MDIcon(
             icon="calendar",
             size_hint_x=None,
@@ -165,14 +241,14 @@ class HomeScreen(Screen):
             size_hint_y=None,
             height=dp(25)
         ))
-        header_text.add_widget(MDLabel(
-            text=date.strftime('%d.%m.%Y'),
+        self.day_date_label = MDLabel(
             font_style="Subtitle1",
             theme_text_color="Custom",
             text_color=(0.6, 0.6, 0.7, 1),
             size_hint_y=None,
             height=dp(20)
-        ))
+        )
+        header_text.add_widget(self.day_date_label)
 
         header_layout.add_widget(header_text)
         header_layout.add_widget(MDLabel(size_hint_x=0.2))
@@ -181,49 +257,47 @@ class HomeScreen(Screen):
         # Разделитель
         content.add_widget(self.create_simple_divider())
 
-        if not events:
-            # Сообщение когда событий нет
-            empty_message = MDBoxLayout(
-                orientation="vertical",
-                size_hint_y=None,
-                height=dp(80),
-                spacing=dp(10)
-            )
-
-            empty_message.add_widget(MDIcon(
-                icon="calendar-remove",
-                size_hint_y=None,
-                height=dp(40),
-                theme_text_color="Custom",
-                text_color=(0.7, 0.7, 0.8, 1)
-            ))
-
-            empty_message.add_widget(MDLabel(
-                text="Событий нет",
-                font_style="Subtitle1",
-                theme_text_color="Custom",
-                text_color=(0.6, 0.6, 0.7, 1),
-                halign="center",
-                size_hint_y=None,
-                height=dp(25)
-            ))
-
-            content.add_widget(empty_message)
-            content.height = dp(150)  # Фиксированная высота для пустого состояния
-        else:
-            # Список событий с иконками
-            for event in events:
-                event_item = self.create_event_list_item(event)
-                content.add_widget(event_item)
+        # Сообщение «Событий нет» - скрывается, когда события есть
+        self.day_empty_message = MDBoxLayout(
+            orientation="vertical",
+            size_hint_y=None,
+            height=dp(80),
+            spacing=dp(10)
+        )
+
+        self.day_empty_message.add_widget(MDIcon(
+            icon="calendar-remove",
+            size_hint_y=None,
+            height=dp(40),
+            theme_text_color="Custom",
+            text_color=(0.7, 0.7, 0.8, 1)
+        ))
+
+        self.day_empty_message.add_widget(MDLabel(
+            text="Событий нет",
+            font_style="Subtitle1",
+            theme_text_color="Custom",
+            text_color=(0.6, 0.6, 0.7, 1),
+            halign="center",
+            size_hint_y=None,
+            height=dp(25)
+        ))
+        content.add_widget(self.day_empty_message)
 
-            content.height = dp(80 + len(events) * 70)  # Высота зависит от количества событий
+        # Список событий дня
+        self.day_events_box = MDBoxLayout(
+            orientation="vertical",
+            spacing=dp(15),
+            adaptive_height=True
+        )
+        content.add_widget(self.day_events_box)
+        self.day_events_content = content
 
         # Создаем красивый диалог
-        self.day_events_dialog = MDDialog(
+        return MDDialog(
             type="custom",
             content_cls=content,
             size_hint=(0.85, None),
-            height=content.height + dp(100),  # Добавляем место для кнопок
             md_bg_color=(0.98, 0.98, 1, 1),
             radius=[25, 25, 25, 25],
             elevation=8,
@@ -236,9 +310,6 @@ class HomeScreen(Screen):
             ],
         )
 
-        print("✅ Красивый диалог создан, открываем...")
-        self.day_events_dialog.open()
-
     def create_simple_divider(self):
         """Создает простой разделитель"""
         from kivy.uix.widget import Widget
@@ -306,6 +377,13 @@ class HomeScreen(Screen):
             subject_name = 'Без предмета'
 
         secondary_text = f"{subject_name} | {self.get_event_type_text(event.get('type'))}"
+        if event.get('type') == 'class':
+            # пара расписания: время и аудитория
+            secondary_text = f"{event['due_date']:%H:%M}"
+            if event.get('end_date'):
+                secondary_text += f"–{event['end_date']:%H:%M}"
+            if event.get('classroom'):
+                secondary_text += f" | ауд. {event['classroom']}"
         text_layout.add_widget(MDLabel(
             text=secondary_text,
             font_style="Caption",
@@ -329,6 +407,7 @@ class HomeScreen(Screen):
             'homework': 'book-open-page-variant',
             'lecture': 'presentation',
             'practice': 'code-tags',
+            'class': 'google-classroom',
             'other': 'calendar-check'
         }
         return icons.get(event_type, 'calendar-check')
@@ -340,6 +419,7 @@ class HomeScreen(Screen):
             'homework': (0.2, 0.6, 0.8, 1),
             'lecture': (0.3, 0.7, 0.3, 1),
             'practice': (0.9, 0.6, 0.1, 1),
+            'class': (0.3, 0.6, 0.5, 1),
             'other': (0.5, 0.3, 0.7, 1)
         }
         return colors.get(event_type, (0.5, 0.3, 0.7, 1))
@@ -359,135 +439,51 @@ class HomeScreen(Screen):
         self.update_calendar()
 
     def update_calendar(self):
-        """Обновление отображения календаря"""
-        # Получаем задачи для определения дней с событиями
-        month_tasks = self.get_tasks_for_month(self.current_year, self.current_month)
+        """Обновление отображения календаря.
+
+        Месяц из кэша показывается сразу; недостающие месяцы (показанный и
+        соседние) догружаются в фоне одним запросом.
+        """
+        year, month = self.current_year, self.current_month
+        month_tasks = db.peek_month_counts(year, month)
+        month_classes = db.peek_class_counts(year, month)
+        if month_tasks is not None:
+            self.show_calendar(month_tasks, month_classes or {})
+        if month_tasks is not None and month_classes is not None:
+            apply = lambda result: None
+        else:
+            apply = lambda result: self.show_calendar(*result)
+        self.loader.submit(lambda: self.fetch_calendar(year, month), apply, key="calendar")
 
-        # Создаем календарь
-        self.generate_calendar_days(self.current_year, self.current_month, month_tasks)
+    def fetch_calendar(self, year, month):
+        """Фоновая часть: догружает в кэш месяц с соседними и возвращает (задачи, пары) по дням"""
+        try:
+            db.prefetch_month_counts(year, month)
+        except Exception as e:
+            print(f"Ошибка предзагрузки календаря: {e}")
+        return self.get_tasks_for_month(year, month), self.get_classes_for_month(year, month)
 
-        # Обновляем UI календаря
-        self.update_calendar_ui()
+    @track
+    def show_calendar(self, month_tasks, month_classes=None):
+        """Отрисовка календаря текущего месяца: ячейки сетки только перепривязываются"""
+        if 'calendar_grid' in self.ids:
+            self.ids.calendar_grid.show_month(self.current_year, self.current_month, month_tasks, month_classes)
 
     def get_tasks_for_month(self, year, month):
         """Получаем задачи для указанного месяца"""
         try:
-            start_date = datetime(year, month, 1).date()
-            if month == 12:
-                end_date = datetime(year + 1, 1, 1).date()
-            else:
-                end_date = datetime(year, month + 1, 1).date()
-
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        SELECT due_date::date as task_date, COUNT(*) as task_count
-                        FROM tasks 
-                        WHERE due_date::date BETWEEN %s AND %s 
-                        AND status != 'completed'
-                        GROUP BY due_date::date
-                    """, (start_date, end_date))
-                    tasks = cur.fetchall()
-                    return {task['task_date']: task['task_count'] for task in tasks}
+            return db.get_month_counts(year, month)
         except Exception as e:
             print(f"Ошибка загрузки задач для календаря: {e}")
             return {}
 
-    def generate_calendar_days(self, year, month, month_tasks):
-        """Генерация дней календаря"""
-        # Первый день месяца
-        first_day = datetime(year, month, 1)
-        # Последний день месяца
-        if month == 12:
-            last_day = datetime(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            last_day = datetime(year, month + 1, 1) - timedelta(days=1)
-
-        # Дни предыдущего месяца
-        days_before = first_day.weekday()
-        prev_month = month - 1 if month > 1 else 12
-        prev_year = year if month > 1 else year - 1
-
-        if prev_month == 12:
-            prev_last_day = datetime(prev_year, prev_month, 31)
-        else:
-            prev_last_day = datetime(prev_year, prev_month + 1, 1) - timedelta(days=1)
-
-        calendar_days = []
-
-        # Добавляем дни предыдущего месяца
-        for day in range(prev_last_day.day - days_before + 1, prev_last_day.day + 1):
-            calendar_days.append({
-                'day': day,
-                'month': 'prev',
-                'has_events': False
-            })
-
-        # Добавляем дни текущего месяца
-        today = datetime.now().date()
-        for day in range(1, last_day.day + 1):
-            current_date = datetime(year, month, day).date()
-            has_events = current_date in month_tasks
-            is_today = current_date == today
-
-            calendar_days.append({
-                'day': day,
-                'month': 'current',
-                'has_events': has_events,
-                'is_today': is_today,
-                'date': current_date
-            })
-
-        # Добавляем дни следующего месяца
-        days_after = 42 - len(calendar_days)  # 6 недель по 7 дней
-        for day in range(1, days_after + 1):
-            calendar_days.append({
-                'day': day,
-                'month': 'next',
-                'has_events': False
-            })
-
-        self.calendar_days = calendar_days
-
-    def update_calendar_ui(self):
-        """Обновление UI календаря"""
-        if not hasattr(self, 'ids') or 'calendar_grid' not in self.ids:
-            return
-
-        container = self.ids.calendar_grid
-        container.clear_widgets()
-
-        # Добавляем заголовки дней недели
-        week_days = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
-        for day in week_days:
-            container.add_widget(MDLabel(
-                text=day,
-                halign='center',
-                font_style='Caption',
-                size_hint_y=None,
-                height=30
-            ))
-
-        # Добавляем дни календаря
-        for day_info in self.calendar_days:
-            if day_info['month'] == 'current':
-                btn = CalendarDayButton(
-                    day=day_info['day'],
-                    has_events=day_info['has_events'],
-                    on_release=lambda x, d=day_info: self.on_day_selected(d)
-                )
-                # Подсветка сегодняшнего дня
-                if day_info.get('is_today', False):
-                    btn.md_bg_color = (0.2, 0.8, 0.2, 0.3)
-            else:
-                btn = MDLabel(
-                    text=str(day_info['day']),
-                    halign='center',
-                    theme_text_color='Secondary',
-                    size_hint_y=None,
-                    height=40
-                )
-            container.add_widget(btn)
+    def get_classes_for_month(self, year, month):
+        """Число пар расписания по дням месяца"""
+        try:
+            return db.get_class_counts(year, month)
+        except Exception as e:
+            print(f"Ошибка загрузки расписания для календаря: {e}")
+            return {}
 
     def show_day_tasks(self, date):
         """Показать задачи на выбранный день"""
@@ -511,56 +507,8 @@ class HomeScreen(Screen):
             self.current_month += 1
         self.update_calendar()
 
-    def load_all_sections(self):
-        """Загружаем все секции главного экрана"""
-        self.load_today_tasks()
-        self.load_upcoming_deadlines()
-        self.load_next_exam()
-
-
-    def load_today_tasks(self):
-        """Задачи на сегодня/ближайшие 24 часа И активные задачи без дат (БЕЗ экзаменов)"""
-        self.today_tasks = []
-        today = datetime.now().date()
-
-        try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    # Задачи на сегодня ИЛИ активные задачи без дат ИЛИ задачи с дедлайном в будущем
-                    cur.execute("""
-                        SELECT t.*, s.name as subject_name 
-                        FROM tasks t 
-                        LEFT JOIN subjects s ON t.subject_id = s.id 
-                        WHERE (
-                            (t.due_date::date = %s)  -- Задачи с датой на сегодня
-                            OR 
-                            (t.due_date IS NULL AND t.status = 'active')  -- Активные задачи без даты
-                            OR
-                            (t.due_date::date > %s AND t.status = 'active')  -- Задачи с дедлайном в будущем
-                        )
-                        AND t.status = 'active'
-                        AND (t.type IS NULL OR t.type != 'exam')
-                        ORDER BY 
-                            CASE 
-                                WHEN t.due_date IS NULL THEN 2
-                                WHEN t.due_date::date = %s THEN 1  -- Сегодняшние задачи в первую очередь
-                                ELSE 3 
-                            END,
-                            t.due_date ASC,
-                            t.created_at DESC;
-                    """, (today, today, today))
-                    tasks = cur.fetchall()
-                    self.today_tasks = [dict(task) for task in tasks]
-
-                    # Отладочная информация
-                    print(f"Загружено задач на сегодня: {len(self.today_tasks)}")
-                    for task in self.today_tasks:
-                        print(f"Задача: {task['title']}, дата: {task.get('due_date')}, статус: {task.get('status')}")
-
-        except Exception as e:
-            print(f"Ошибка загрузки задач на сегодня: {e}")
-            self.today_tasks = []
-
+    def show_today_tasks(self):
+        """Отрисовка секции задач на сегодня"""
         # Обновляем UI
         if hasattr(self, 'ids') and 'today_container' in self.ids:
             container = self.ids.today_container
@@ -627,41 +575,9 @@ class HomeScreen(Screen):
                     item.add_widget(icon)
                     container.add_widget(item)
 
-    def load_upcoming_deadlines(self):
-        """Ближайшие дедлайны (7 дней) И недавно добавленные задачи"""
-        self.upcoming_deadlines = []
+    def show_upcoming_deadlines(self):
+        """Отрисовка секции ближайших дедлайнов"""
         today = datetime.now().date()
-        seven_days_later = today + timedelta(days=7)
-
-        try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    # Дедлайны на 7 дней вперед ИЛИ недавние задачи без дат
-                    cur.execute("""
-                        SELECT t.*, s.name as subject_name 
-                        FROM tasks t 
-                        LEFT JOIN subjects s ON t.subject_id = s.id 
-                        WHERE (
-                            (t.due_date::date BETWEEN %s AND %s)  -- Задачи с датой в ближайшие 7 дней
-                            OR 
-                            (t.due_date IS NULL AND t.created_at >= NOW() - INTERVAL '3 days')  -- Недавние задачи без дат
-                        )
-                        AND t.status = 'active'
-                        AND (t.type IS NULL OR t.type != 'exam')
-                        ORDER BY 
-                            CASE WHEN t.due_date IS NULL THEN 1 ELSE 0 END,
-                            t.due_date ASC 
-                        LIMIT 10;  -- Увеличим лимит
-                    """, (today, seven_days_later))
-                    tasks = cur.fetchall()
-                    self.upcoming_deadlines = [dict(task) for task in tasks]
-
-                    # Отладочная информация
-                    print(f"Загружено ближайших дедлайнов: {len(self.upcoming_deadlines)}")
-
-        except Exception as e:
-            print(f"Ошибка загрузки дедлайнов: {e}")
-            self.upcoming_deadlines = []
 
         # Обновляем UI
         if hasattr(self, 'ids') and 'deadlines_container' in self.ids:
@@ -725,32 +641,10 @@ class HomeScreen(Screen):
                     )
                     container.add_widget(item)
 
-    def load_next_exam(self):
-        """Следующий экзамен"""
-        self.next_exam = []
+    def show_next_exam(self):
+        """Отрисовка карточки ближайшего экзамена"""
         today = datetime.now().date()
 
-        try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        SELECT t.*, s.name as subject_name 
-                        FROM tasks t 
-                        LEFT JOIN subjects s ON t.subject_id = s.id 
-                        WHERE t.type = 'exam' 
-                        AND t.due_date::date >= %s 
-                        AND t.status != 'completed'
-                        ORDER BY t.due_date ASC 
-                        LIMIT 1;
-                    """, (today,))
-                    exam = cur.fetchone()
-
-                    if exam:
-                        self.next_exam = [dict(exam)]
-        except Exception as e:
-            print(f"Ошибка загрузки экзаменов: {e}")
-            self.next_exam = []
-
         # Обновляем UI
         if hasattr(self, 'ids') and 'exam_container' in self.ids:
             container = self.ids.exam_container
@@ -837,38 +731,56 @@ class HomeScreen(Screen):
         return icons.get(task_type, 'format-list-checks')
 
     def view_task_details(self, task):
-        """Просмотр деталей задачи"""
-        print(f"Просмотр задачи: {task['title']}")
+        """Действия с задачей: выполнить или открыть в форме редактирования"""
+        if task.get('type') == 'class':
+            # пары меняются на экране расписания
+            return
+        if self.day_events_dialog is not None:
+            self.day_events_dialog.dismiss()
 
-    def refresh_data(self):
-        """Обновление всех данных"""
-        self.load_all_sections()
-        self.update_calendar()
+        due_date = task.get('due_date')
+        text = f"Срок: {due_date.strftime('%d.%m.%Y %H:%M')}" if isinstance(due_date, datetime) else "Без срока"
+        if task.get('is_occurrence'):
+            text += "\nПовторяющаяся задача: изменится только это повторение"
+        task_actions(task['title'], text, lambda: self.edit_task(task), lambda: self.complete_task(task))
 
-    def debug_check_all_tasks(self):
-        """Отладочная функция: проверяет все задачи в базе"""
+    def complete_task(self, task):
+        """Отмечает задачу выполненной; у повторения - только его дату"""
         try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        SELECT id, title, type, due_date, status, created_at 
-                        FROM tasks 
-                        ORDER BY created_at DESC
-                    """)
-                    all_tasks = cur.fetchall()
-
-                    print("=== ВСЕ ЗАДАЧИ В БАЗЕ ===")
-                    for task in all_tasks:
-                        print(f"ID: {task['id']}, Название: {task['title']}, Тип: {task.get('type', 'не указан')}, "
-                              f"Дата: {task.get('due_date')}, Статус: {task.get('status')}, "
-                              f"Создана: {task.get('created_at')}")
-                    print("=========================")
-
+            if task.get('is_occurrence'):
+                db.complete_occurrence(task['recurrence_parent_id'], task['occurrence_date'])
+            else:
+                db.update_task(task['id'], status='completed')
         except Exception as e:
-            print(f"Ошибка при проверке задач: {e}")
+            print(f"Ошибка при выполнении задачи: {e}")
+            show_message("Ошибка", f"Не удалось отметить задачу: {e}")
+            return
+        self.refresh_data()
+
+    def edit_task(self, task):
+        """Открывает задачу в форме экрана задач (экзамен - экрана экзаменов).
+
+        Форма работает со строками tasks, поэтому повторение сначала становится
+        отдельной задачей; остальные повторения шаблона не меняются.
+        """
+        task_id = task['id']
+        if task.get('is_occurrence'):
+            try:
+                task_id = db.materialize_occurrence(task['recurrence_parent_id'], task['occurrence_date'])
+            except Exception as e:
+                print(f"Ошибка при создании повторения: {e}")
+                show_message("Ошибка", f"Не удалось открыть повторение: {e}")
+                return
+            if task_id is None:
+                show_message("Ошибка", "Повторяющаяся задача уже удалена")
+                return
 
+        screen_name = 'exams' if task.get('type') == 'exam' else 'tasks'
+        self.manager.show(screen_name)
+        self.manager.get_screen(screen_name).open_for_edit(task_id)
 
-    def on_pre_enter(self):
-        self.init_calendar()
-        self.load_all_sections()
-        self.debug_check_all_tasks()
\ No newline at end of file
+    def refresh_data(self):
+        """Обновление всех данных: кэш задач сбрасывается, снимок загружается заново"""
+        db.invalidate_cache("tasks", "subjects", "schedule")
+        db.invalidate_month_counts(db.ALL_MONTHS)
+        self.load_dashboard((db.get_table_versions("tasks", "subjects", "schedule"), datetime.now().date()))
@@ -7,12 +7,18 @@ from kivymd.uix.card import MDCard
 from kivymd.uix.list import OneLineListItem
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.textfield import MDTextField
-from kivymd.uix.menu import MDDropdownMenu
-from datetime import datetime
+from datetime import datetime, timedelta
 from database import get_subjects, get_schedule_with_subjects, add_schedule_entry, \
-    update_schedule_entry, delete_schedule_entry
+    update_schedule_entry, delete_schedule_entry, session, get_table_versions, get_teachers, ScheduleConflictError
+from schedule_index import ScheduleIndex, WeekTypeIndex, WEEK_TYPE_NAMES, academic_week, week_type, \
+    as_date, as_time, conflict_text
 from kivy.metrics import dp
 from kivy.uix.modalview import ModalView
+from loader import ScreenLoader
+from widgets.skeleton import SkeletonCard
+from widgets.dialogs import show_message, confirm
+from widgets.subject_menu import SubjectMenu
+from frame_monitor import track
 
 
 class CustomTimePicker(ModalView):
@@ -251,16 +257,66 @@ class ScheduleScreen(Screen):
         super().__init__(**kwargs)
         self.current_view = "week"
         self.selected_day = None
-        self.subjects_menu = None
+        # меню предметов: пункты перестраиваются только при изменении предметов
+        self.subjects_menu = SubjectMenu(self.select_subject, item_text=self.subject_item_text, empty_text=None)
+        self.teacher_names = {}  # id преподавателя -> имя
+        self.entry_dialog = None  # диалог добавления/редактирования пары
         self.selected_subject = None
         self.dialog = None
-
+        self.loaded_versions = None  # версии таблиц при прошлой загрузке
+        self.schedule_index = ScheduleIndex()  # пары по дням для проверки пересечений
+        self.week_index = WeekTypeIndex()  # пары по типу и дню недели для показа недели
+        today = datetime.now().date()
+        self.week_start = today - timedelta(days=today.weekday())  # понедельник показанной недели
+        self.entry_week_type = None  # тип недели в диалоге пары
+        self.week_type_buttons = {}
+        self.loader = ScreenLoader("schedule")
+
+    @track
     def on_pre_enter(self):
-        """Загружаем данные при входе на экран"""
-        self.load_subjects()
-        self.load_schedule()
+        """Загружаем данные при входе на экран (запросы - в фоне)"""
+        versions = get_table_versions("schedule", "subjects", "teachers")
+        if versions is not None and versions == self.loaded_versions:
+            return
+
+        self.show_loading()
+        self.loader.submit(self.fetch_schedule, lambda data: self.apply_schedule(data, versions),
+                           on_error=self.on_load_error)
+
+    def on_leave(self):
+        # результаты загрузок, не успевших завершиться, экрану больше не нужны
+        self.loader.cancel()
+
+    def fetch_schedule(self):
+        """Фоновая часть загрузки: предметы и записи расписания"""
+        with session():
+            subjects = get_subjects()
+            # имена преподавателей для меню предметов - одним запросом
+            teachers = get_teachers()
+            entries = get_schedule_with_subjects()
+        return subjects, teachers, entries
+
+    @track
+    def apply_schedule(self, data, versions):
+        self.subjects, teachers, self.schedule_entries = data
+        self.teacher_names = {t['id']: t['full_name'] for t in teachers}
+        self.index_schedule()
+        print(f"📚 Загружено предметов: {len(self.subjects)}")
+        print(f"📅 Загружено записей расписания: {len(self.schedule_entries)}")
         self.setup_subjects_menu()
         self.update_display()
+        self.loaded_versions = versions
+
+    def on_load_error(self, error):
+        print(f"❌ Ошибка загрузки расписания: {error}")
+        self.update_display()
+
+    def show_loading(self):
+        """Заглушки вместо расписания, пока идёт загрузка"""
+        container = self.ids.schedule_container
+        container.clear_widgets()
+        for _ in range(3):
+            container.add_widget(SkeletonCard())
 
     def load_subjects(self):
         """Загружаем предметы из базы данных"""
@@ -272,74 +328,52 @@ class ScheduleScreen(Screen):
             self.subjects = []
 
     def setup_subjects_menu(self):
-        """Создаем меню выбора предметов"""
+        """Обновляет меню выбора предметов (перестраивается, только если предметы изменились)"""
         if not self.subjects:
             print("⚠️ Нет предметов для создания меню")
             return
+        self.subjects_menu.set_subjects(self.subjects)
 
-        menu_items = []
-        for subject in self.subjects:
-            # Получаем информацию о преподавателе
-            teacher_name = self.get_teacher_name(subject.get('teacher_id'))
-            classroom = subject.get('classroom', '')
-
-            item_text = f"{subject['name']}"
-            if teacher_name or classroom:
-                item_text += f" ({teacher_name}"
-                if classroom:
-                    item_text += f", ауд. {classroom}"
-                item_text += ")"
-
-            # Создаем кастомный элемент меню
-            menu_item = {
-                "viewclass": "OneLineListItem",
-                "text": item_text,
-                "on_release": self.create_subject_handler(subject)
-            }
-            menu_items.append(menu_item)
+    def subject_item_text(self, subject):
+        """Текст пункта меню: предмет, преподаватель и аудитория"""
+        teacher_name = self.get_teacher_name(subject.get('teacher_id'))
+        classroom = subject.get('classroom', '')
 
-        self.subjects_menu = MDDropdownMenu(
-            items=menu_items,
-            width_mult=4,
-        )
-        print(f"✅ Меню предметов создано с {len(menu_items)} элементами")
-
-    def create_subject_handler(self, subject):
-        """Создает обработчик для выбора предмета"""
-
-        def handler():
-            self.select_subject(subject)
+        item_text = f"{subject['name']}"
+        if teacher_name or classroom:
+            item_text += f" ({teacher_name}"
+            if classroom:
+                item_text += f", ауд. {classroom}"
+            item_text += ")"
+        return item_text
 
-        return handler
 
     def get_teacher_name(self, teacher_id):
-        """Получаем имя преподавателя по ID"""
+        """Получаем имя преподавателя по ID (из загруженного вместе с предметами списка)"""
         if not teacher_id:
             return ""
-        try:
-            from database import get_teacher_name
-            return get_teacher_name(teacher_id)
-        except:
-            return ""
+        return self.teacher_names.get(teacher_id, "")
 
     def select_subject(self, subject):
         """Выбор предмета из меню"""
         print(f"🎯 Выбран предмет: {subject['name']}")
         self.selected_subject = subject
         if hasattr(self, 'subject_field'):
-            teacher_name = self.get_teacher_name(subject.get('teacher_id'))
-            classroom = subject.get('classroom', '')
+            self.subject_field.text = self.subject_display_text(subject)
 
-            display_text = f"{subject['name']}"
-            if teacher_name:
-                display_text += f" - {teacher_name}"
-            if classroom:
-                display_text += f" (ауд. {classroom})"
+        self.subjects_menu.dismiss()
 
-            self.subject_field.text = display_text
+    def subject_display_text(self, subject):
+        """Текст поля выбранного предмета"""
+        teacher_name = self.get_teacher_name(subject.get('teacher_id'))
+        classroom = subject.get('classroom', '')
 
-        if self.subjects_menu:
-            self.subjects_menu.dismiss()
+        display_text = f"{subject['name']}"
+        if teacher_name:
+            display_text += f" - {teacher_name}"
+        if classroom:
+            display_text += f" (ауд. {classroom})"
+        return display_text
 
     def load_schedule(self):
         """Загружаем расписание из базы"""
@@ -349,6 +383,17 @@ class ScheduleScreen(Screen):
         except Exception as e:
             print(f"❌ Ошибка загрузки расписания: {e}")
             self.schedule_entries = []
+        self.index_schedule()
+
+    def index_schedule(self):
+        """Строит индексы загруженных пар: для проверки пересечений и для показа недели"""
+        self.schedule_index = ScheduleIndex(self.schedule_entries)
+        self.week_index = WeekTypeIndex(self.schedule_entries)
+
+    def change_week(self, weeks):
+        """Листает показанную неделю на weeks вперёд или назад"""
+        self.week_start += timedelta(weeks=weeks)
+        self.update_display()
 
     def switch_view(self, view_type):
         """Переключение между видом недели и дня"""
@@ -363,22 +408,40 @@ class ScheduleScreen(Screen):
         # Показываем только вид недели
         self.show_week_view()
 
+    @track
     def show_week_view(self):
         """Показывает вид недели"""
         container = self.ids.schedule_container
 
-        # Заголовок недели
-        title_label = MDLabel(
-            text="Расписание на неделю",
+        # Заголовок недели: даты, номер и тип учебной недели, листание
+        week_end = self.week_start + timedelta(days=6)
+        title_layout = MDBoxLayout(
+            orientation="horizontal",
+            size_hint_y=None,
+            height=dp(60)
+        )
+        title_layout.add_widget(MDIconButton(
+            icon="chevron-left",
+            theme_text_color="Custom",
+            text_color=(0.5, 0.3, 0.7, 1),
+            on_release=lambda x: self.change_week(-1)
+        ))
+        title_layout.add_widget(MDLabel(
+            text=f"{self.week_start:%d.%m} – {week_end:%d.%m.%Y}\n"
+                 f"{academic_week(self.week_start)}-я неделя, {WEEK_TYPE_NAMES[week_type(self.week_start)]}",
             halign="center",
-            font_style="H5",
+            font_style="H6",
             theme_text_color="Custom",
             text_color=(0.4, 0.2, 0.6, 1),
-            size_hint_y=None,
-            height=dp(50),
             bold=True
-        )
-        container.add_widget(title_label)
+        ))
+        title_layout.add_widget(MDIconButton(
+            icon="chevron-right",
+            theme_text_color="Custom",
+            text_color=(0.5, 0.3, 0.7, 1),
+            on_release=lambda x: self.change_week(1)
+        ))
+        container.add_widget(title_layout)
 
         # Дни недели
         days_of_week = [
@@ -392,8 +455,9 @@ class ScheduleScreen(Screen):
         ]
 
         for day_name, day_index in days_of_week:
-            day_entries = [entry for entry in self.schedule_entries
-                           if entry.get('day_of_week') == day_index]
+            # пары этой даты - из индекса по типу недели, без перебора всего расписания
+            day_date = self.week_start + timedelta(days=day_index)
+            day_entries = self.week_index.on_date(day_date)
 
             card = MDCard(
                 orientation="vertical",
@@ -412,7 +476,7 @@ class ScheduleScreen(Screen):
             )
 
             day_label = MDLabel(
-                text=day_name,
+                text=f"{day_name}, {day_date:%d.%m}",
                 theme_text_color="Custom",
                 text_color=(0.4, 0.2, 0.6, 1),
                 font_style="H6",
@@ -440,6 +504,9 @@ class ScheduleScreen(Screen):
                     pair_text = f"{start_time}-{end_time} - {entry.get('subject_name', 'Без названия')}"
                     if entry.get('classroom'):
                         pair_text += f" ({entry.get('classroom')})"
+                    period_text = self.entry_period_text(entry)
+                    if period_text:
+                        pair_text += f" [{period_text}]"
 
                     pair_layout = MDBoxLayout(
                         orientation="horizontal",
@@ -487,6 +554,17 @@ class ScheduleScreen(Screen):
 
             container.add_widget(card)
 
+    def entry_period_text(self, entry):
+        """Когда идёт пара: тип недели и даты действия (пусто - каждую неделю без ограничений)"""
+        parts = []
+        if entry.get('week_type'):
+            parts.append(WEEK_TYPE_NAMES[entry['week_type']])
+        if entry.get('valid_from'):
+            parts.append(f"с {as_date(entry['valid_from']):%d.%m.%Y}")
+        if entry.get('valid_until'):
+            parts.append(f"по {as_date(entry['valid_until']):%d.%m.%Y}")
+        return ", ".join(parts)
+
     def add_schedule_entry(self, day_of_week):
         """Добавление новой пары в расписание"""
         print(f"➕ Добавление пары для дня: {day_of_week}")
@@ -509,16 +587,54 @@ class ScheduleScreen(Screen):
             is_edit=True
         )
 
+    @track
     def show_schedule_dialog(self, day_of_week, entry=None, is_edit=False):
-        """Показывает диалог добавления/редактирования пары"""
+        """Показывает диалог добавления/редактирования пары.
+
+        Диалог создаётся при первом показе, дальше только заполняются его поля.
+        """
         print(f"🔄 Открытие диалога для дня {day_of_week}, редактирование: {is_edit}")
 
+        if self.entry_dialog is None:
+            self.entry_dialog = self.build_schedule_dialog()
+
+        # для кнопки сохранения
+        self.entry_day = day_of_week
+        self.entry_editing = entry if is_edit else None
+
+        self.subject_field.text = self.subject_display_text(self.selected_subject) if self.selected_subject else ""
+
+        # Заполняем время и период если редактируем
+        self.start_time_field.text = ""
+        self.end_time_field.text = ""
+        self.valid_from_field.text = ""
+        self.valid_until_field.text = ""
+        self.select_week_type(None)
+        self.show_conflicts([])
+        if is_edit and entry:
+            if entry.get('start_time'):
+                self.start_time_field.text = entry['start_time'].strftime('%H:%M')
+            if entry.get('end_time'):
+                self.end_time_field.text = entry['end_time'].strftime('%H:%M')
+            if entry.get('valid_from'):
+                self.valid_from_field.text = as_date(entry['valid_from']).strftime('%d.%m.%Y')
+            if entry.get('valid_until'):
+                self.valid_until_field.text = as_date(entry['valid_until']).strftime('%d.%m.%Y')
+            self.select_week_type(entry.get('week_type'))
+
+        self.entry_dialog.title = "Редактировать пару" if is_edit else "Добавить пару"
+        self.entry_dialog.buttons[1].text = "Сохранить" if is_edit else "Добавить"
+        self.entry_dialog.open()
+
+    @track
+    def build_schedule_dialog(self):
+        """Создаёт диалог пары (один раз на экран)"""
         # Создаем контент диалога
         content = MDBoxLayout(
             orientation="vertical",
             spacing=dp(15),
             size_hint_y=None,
-            height=dp(350)
+            height=dp(480)
         )
 
         # Поле выбора предмета - делаем readonly и добавляем кнопку выбора
@@ -574,53 +690,93 @@ class ScheduleScreen(Screen):
         )
         self.end_time_field.bind(focus=self.show_time_picker_end)
 
-        # Заполняем время если редактируем
-        if is_edit and entry:
-            if entry.get('start_time'):
-                self.start_time_field.text = entry['start_time'].strftime('%H:%M')
-            if entry.get('end_time'):
-                self.end_time_field.text = entry['end_time'].strftime('%H:%M')
-
         time_layout.add_widget(self.start_time_field)
         time_layout.add_widget(self.end_time_field)
         content.add_widget(time_layout)
 
+        # Тип недели: каждую, только нечётные или только чётные
+        week_type_layout = MDBoxLayout(
+            orientation="horizontal",
+            size_hint_y=None,
+            height=dp(50),
+            spacing=dp(8)
+        )
+        for kind, text in ((None, "Каждую"), ("odd", "Нечётные"), ("even", "Чётные")):
+            button = MDFlatButton(
+                text=text,
+                theme_text_color="Custom",
+                on_release=lambda x, kind=kind: self.select_week_type(kind)
+            )
+            self.week_type_buttons[kind] = button
+            week_type_layout.add_widget(button)
+        content.add_widget(week_type_layout)
+
+        # Даты действия пары (семестр); пустое поле - без ограничения
+        period_layout = MDBoxLayout(
+            orientation="horizontal",
+            size_hint_y=None,
+            height=dp(60)
+        )
+        self.valid_from_field = MDTextField(
+            hint_text="Действует с (ДД.ММ.ГГГГ)",
+            size_hint_x=0.5
+        )
+        self.valid_until_field = MDTextField(
+            hint_text="по (ДД.ММ.ГГГГ)",
+            size_hint_x=0.5
+        )
+        period_layout.add_widget(self.valid_from_field)
+        period_layout.add_widget(self.valid_until_field)
+        content.add_widget(period_layout)
+
+        # Пересечения с другими парами этого дня
+        self.conflict_label = MDLabel(
+            text="",
+            theme_text_color="Custom",
+            text_color=(0.8, 0.2, 0.2, 1),
+            size_hint_y=None,
+            height=dp(60)
+        )
+        content.add_widget(self.conflict_label)
+
         # Кнопки диалога
         buttons = [
             MDFlatButton(
                 text="Отмена",
                 theme_text_color="Custom",
                 text_color=(0.5, 0.3, 0.7, 1),
-                on_release=lambda x: self.dialog.dismiss()
+                on_release=lambda x: self.entry_dialog.dismiss()
             ),
             MDRaisedButton(
-                text="Сохранить" if is_edit else "Добавить",
+                text="Добавить",
                 md_bg_color=(0.5, 0.3, 0.7, 1),
                 theme_text_color="Custom",
                 text_color=(1, 1, 1, 1),
-                on_release=lambda x: self.save_schedule_entry(day_of_week, entry if is_edit else None)
+                on_release=lambda x: self.save_schedule_entry(self.entry_day, self.entry_editing)
             )
         ]
 
-        title = "Редактировать пару" if is_edit else "Добавить пару"
-
-        self.dialog = MDDialog(
-            title=title,
+        return MDDialog(
+            title="Добавить пару",
             type="custom",
             content_cls=content,
             buttons=buttons,
             size_hint=(0.8, None)
         )
-        self.dialog.open()
+
+    def select_week_type(self, kind):
+        """Выбор типа недели пары в диалоге"""
+        self.entry_week_type = kind
+        for button_kind, button in self.week_type_buttons.items():
+            selected = button_kind == kind
+            button.md_bg_color = (0.5, 0.3, 0.7, 1) if selected else (0, 0, 0, 0)
+            button.text_color = (1, 1, 1, 1) if selected else (0.5, 0.3, 0.7, 1)
 
     def show_subjects_menu_direct(self):
         """Показывает меню выбора предметов при клике на кнопку"""
         print("🎯 Открытие меню предметов")
-        if self.subjects_menu:
-            # Создаем временный виджет для привязки меню
-            temp_widget = MDLabel()
-            self.subjects_menu.caller = temp_widget
-            self.subjects_menu.open()
+        if self.subjects and self.subjects_menu.ready:
+            self.subjects_menu.open(self.subject_field)
         else:
             print("⚠️ Меню предметов не инициализировано")
             self.show_error("Сначала добавьте предметы в разделе 'Предметы'")
@@ -674,59 +830,90 @@ class ScheduleScreen(Screen):
             self.show_error("Неверный формат времени окончания. Используйте ЧЧ:ММ")
             return
 
+        if as_time(self.start_time_field.text) >= as_time(self.end_time_field.text):
+            self.show_conflicts([], "Время начала должно быть раньше времени окончания")
+            return
+
+        try:
+            valid_from = as_date(self.valid_from_field.text.strip())
+            valid_until = as_date(self.valid_until_field.text.strip())
+        except ValueError:
+            self.show_error("Неверный формат даты. Используйте ДД.ММ.ГГГГ")
+            return
+        if valid_from and valid_until and valid_from > valid_until:
+            self.show_conflicts([], "Дата начала действия позже даты окончания")
+            return
+
+        # Пересечения проверяем по индексу загруженных пар; база проверит ещё раз при записи
+        day = entry['day_of_week'] if entry else day_of_week
+        conflicts = self.schedule_index.conflicts(
+            day, self.start_time_field.text, self.end_time_field.text, entry['id'] if entry else None,
+            self.entry_week_type, valid_from, valid_until)
+        if conflicts:
+            self.show_conflicts(conflicts)
+            return
+
         try:
             if entry:  # Редактирование
                 update_schedule_entry(
                     entry_id=entry['id'],
                     subject_id=self.selected_subject['id'],
                     start_time=self.start_time_field.text,
-                    end_time=self.end_time_field.text
+                    end_time=self.end_time_field.text,
+                    # пустая строка снимает ограничение
+                    week_type=self.entry_week_type or "",
+                    valid_from=valid_from or "",
+                    valid_until=valid_until or ""
                 )
             else:  # Добавление
                 add_schedule_entry(
                     subject_id=self.selected_subject['id'],
                     day_of_week=day_of_week,
                     start_time=self.start_time_field.text,
-                    end_time=self.end_time_field.text
+                    end_time=self.end_time_field.text,
+                    week_type=self.entry_week_type,
+                    valid_from=valid_from,
+                    valid_until=valid_until
                 )
 
-            self.dialog.dismiss()
+            self.entry_dialog.dismiss()
+            self.loader.cancel()
             self.load_schedule()
             self.update_display()
             self.show_success("Пара сохранена")
 
+        except ScheduleConflictError as e:
+            # пару успели добавить с другого клиента
+            self.show_conflicts(e.conflicts)
+        except ValueError as e:
+            self.show_conflicts([], str(e))
         except Exception as e:
             print(f"❌ Ошибка сохранения пары: {e}")
             self.show_error(f"Ошибка сохранения: {e}")
 
+    def show_conflicts(self, conflicts, message=None):
+        """Подсвечивает поля времени и перечисляет пересекающиеся пары (пустой список - сброс)"""
+        if message is None and conflicts:
+            message = "Пересекается с: " + ", ".join(conflict_text(entry) for entry in conflicts)
+        highlight = bool(message)
+        self.start_time_field.error = highlight
+        self.end_time_field.error = highlight
+        self.conflict_label.text = message or ""
+
     def delete_schedule_entry(self, entry):
         """Удаляет пару из расписания"""
-        self.dialog = MDDialog(
-            title="Удаление пары",
-            text=f"Удалить пару '{entry.get('subject_name', '')}'?",
-            buttons=[
-                MDFlatButton(
-                    text="Отмена",
-                    theme_text_color="Custom",
-                    text_color=(0.5, 0.3, 0.7, 1),
-                    on_release=lambda x: self.dialog.dismiss()
-                ),
-                MDRaisedButton(
-                    text="Удалить",
-                    md_bg_color=(0.8, 0.2, 0.2, 1),
-                    theme_text_color="Custom",
-                    text_color=(1, 1, 1, 1),
-                    on_release=lambda x: self.confirm_delete_schedule_entry(entry)
-                )
-            ]
+        self.dialog = confirm(
+            "Удаление пары",
+            f"Удалить пару '{entry.get('subject_name', '')}'?",
+            lambda: self.confirm_delete_schedule_entry(entry)
         )
-        self.dialog.open()
 
     def confirm_delete_schedule_entry(self, entry):
         """Подтверждает удаление пары"""
         try:
             delete_schedule_entry(entry['id'])
             self.dialog.dismiss()
+            self.loader.cancel()
             self.load_schedule()
             self.update_display()
             self.show_success("Пара удалена")
@@ -737,30 +924,8 @@ class ScheduleScreen(Screen):
 
     def show_error(self, message):
         """Показывает сообщение об ошибке"""
-        self.dialog = MDDialog(
-            title="Ошибка",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    md_bg_color=(0.5, 0.3, 0.7, 1),
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        self.dialog.open()
+        show_message("Ошибка", message)
 
     def show_success(self, message):
         """Показывает сообщение об успехе"""
-        self.dialog = MDDialog(
-            title="Успешно",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    md_bg_color=(0.5, 0.3, 0.7, 1),
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        self.dialog.open()
\ No newline at end of file
+        show_message("Успешно", message)
@@ -1,182 +1,134 @@
 from kivy.uix.screenmanager import Screen
-from kivy.properties import BooleanProperty
-from kivymd.uix.label import MDLabel
-from kivymd.uix.button import MDRaisedButton, MDFlatButton
-from kivymd.uix.dialog import MDDialog
+from kivy.properties import BooleanProperty, StringProperty
 from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.card import MDCard
 from kivy.metrics import dp
-from database import get_subjects, add_subject, get_teachers, delete_subject, update_subject, get_subject_by_id
+from widgets.card_list import ListCard
+from widgets.dialogs import show_message, confirm
+from loader import ScreenLoader
+from database import get_subjects, add_subject, get_teachers, delete_subject, update_subject, get_subject_by_id, \
+    session, get_table_versions
+from frame_monitor import track
 
 
 class SubjectItem(MDBoxLayout):
     pass
 
 
+class SubjectCard(ListCard):
+    """Карточка предмета в списке CardList"""
+    title = StringProperty("")
+    info_text = StringProperty("")
+
+
 class SubjectsScreen(Screen):
     has_subjects = BooleanProperty(False)
+    form_visible = BooleanProperty(True)  # форма добавления развернута
+    loading = BooleanProperty(False)  # идёт фоновая загрузка списка
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.editing_subject_id = None
         self.dialog = None
+        self.loaded_versions = None  # версии таблиц при прошлой загрузке списка
+        self.teacher_names = {}  # имена преподавателей для карточек
+        self.loader = ScreenLoader("subjects")
 
+    @track
     def on_pre_enter(self):
-        """Загрузка списка предметов при открытии экрана"""
+        """Загрузка списка предметов при открытии экрана (в фоне)"""
         self.cancel_edit()
-        self.load_subjects()
+        versions = get_table_versions("subjects", "teachers")
+        if versions is not None and versions == self.loaded_versions:
+            return
+        self.loading = True
+        self.loader.submit(self.fetch_subjects, lambda data: self.apply_subjects(data, versions),
+                           on_error=self.on_load_error)
 
-    def load_subjects(self):
-        """Загружает список предметов"""
+    def on_leave(self):
+        # результаты загрузок, не успевших завершиться, экрану больше не нужны
+        self.loader.cancel()
+        self.loading = False
+
+    def fetch_subjects(self):
+        """Фоновая часть загрузки: предметы и преподаватели"""
         print("Загрузка предметов...")
-        try:
-            self.ids.list_container.clear_widgets()
-            subjects = get_subjects()
-            print(f"Получено предметов: {len(subjects)}")
+        with session():
+            return get_subjects(), get_teachers()
 
-            # Обновляем свойство has_subjects
-            self.has_subjects = len(subjects) > 0
+    def apply_subjects(self, data, versions):
+        self.show_subjects(*data)
+        self.loaded_versions = versions
+        self.loading = False
 
-            if not subjects:
-                # Если предметов нет - показываем сообщение
-                self.show_empty_message()
-            else:
-                # Если есть предметы - показываем их
-                for sub in subjects:
-                    self.add_subject_to_list(sub)
+    def on_load_error(self, error):
+        self.loading = False
+        print(f"Ошибка при загрузке предметов: {error}")
+        self.show_error(f"Ошибка загрузки: {error}")
 
+    @track
+    def load_subjects(self):
+        """Загружает список предметов"""
+        try:
+            self.show_subjects(*self.fetch_subjects())
         except Exception as e:
             print(f"Ошибка при загрузке предметов: {e}")
             self.show_error(f"Ошибка загрузки: {e}")
 
-    def show_empty_message(self):
-        """Показывает сообщение когда предметов нет"""
-        empty_card = MDCard(
-            orientation="vertical",
-            padding=dp(20),
-            size_hint_y=None,
-            height=dp(120),
-            elevation=2,
-            md_bg_color=(0.95, 0.95, 0.95, 1)
-        )
-
-        content = MDBoxLayout(orientation="vertical", spacing=dp(10))
-
-        content.add_widget(MDLabel(
-            text="Пока нет предметов",
-            theme_text_color="Secondary",
-            font_style="H6",
-            halign="center",
-            size_hint_y=None,
-            height=dp(30)
-        ))
-
-        content.add_widget(MDLabel(
-            text="Добавьте первый предмет используя форму выше",
-            theme_text_color="Secondary",
-            halign="center",
-            size_hint_y=None,
-            height=dp(25)
-        ))
-
-        empty_card.add_widget(content)
-        self.ids.list_container.add_widget(empty_card)
-
-    def add_subject_to_list(self, subject_data):
-        """Добавляет один предмет в список с кнопками редактирования и удаления"""
-        try:
-            subject_id = subject_data['id']
-            name = subject_data.get('name', 'Без названия')
-            classroom = subject_data.get('classroom', '')
-
-            # Получаем имя преподавателя
-            teacher_name = ""
-            if subject_data.get("teacher_id"):
-                teacher_name = self.get_teacher_name(subject_data["teacher_id"])
-
-            # Создаем карточку предмета
-            card = MDCard(
-                orientation="vertical",
-                padding=dp(20),
-                size_hint_y=None,
-                height=dp(140),
-                elevation=3
-            )
-
-            # Основной контент
-            content = MDBoxLayout(orientation="horizontal", spacing=dp(15))
-
-            # Текстовая информация
-            text_layout = MDBoxLayout(orientation="vertical", spacing=dp(8))
-
-            # Название предмета
-            name_label = MDLabel(
-                text=f"{name}",
-                theme_text_color="Custom",
-                text_color=(0.4, 0.2, 0.6, 1),
-                font_style="H6",
-                size_hint_y=None,
-                height=dp(30),
-                bold=True
-            )
-
-            # Дополнительная информация
-            info_text = ""
+    @track
+    def show_subjects(self, subjects, teachers):
+        """Заменяет список загруженными предметами"""
+        print(f"Получено предметов: {len(subjects)}")
+        self.teacher_names = {t['id']: t['full_name'] for t in teachers}
+        self.ids.card_list.set_rows(self.subject_to_row(sub) for sub in subjects)
+
+        # Обновляем свойство has_subjects
+        self.has_subjects = len(subjects) > 0
+
+    def subject_to_row(self, subject_data):
+        """Превращает строку предмета из базы в словарь данных для карточки SubjectCard"""
+        classroom = subject_data.get('classroom') or ''
+
+        # Имя преподавателя
+        teacher_name = ""
+        if subject_data.get("teacher_id"):
+            teacher_name = self.teacher_names.get(subject_data["teacher_id"], "")
+
+        # Дополнительная информация
+        info_text = ""
+        if teacher_name:
+            info_text += f"{teacher_name}"
+        if classroom:
             if teacher_name:
-                info_text += f"{teacher_name}"
-            if classroom:
-                if teacher_name:
-                    info_text += " • "
-                info_text += f"Ауд. {classroom}"
-
-            info_label = MDLabel(
-                text=info_text if info_text else "Нет дополнительной информации",
-                theme_text_color="Custom",
-                text_color=(0.3, 0.3, 0.4, 1),
-                size_hint_y=None,
-                height=dp(25)
-            )
-
-            text_layout.add_widget(name_label)
-            text_layout.add_widget(info_label)
-
-            content.add_widget(text_layout)
-
-            # Кнопки действий
-            buttons_layout = MDBoxLayout(
-                orientation="horizontal",
-                size_hint_y=None,
-                height=dp(50),
-                spacing=dp(10)
-            )
-
-            edit_btn = MDRaisedButton(
-                text="Редактировать",
-                size_hint_x=0.5,
-                on_release=lambda x, sid=subject_id: self.edit_subject(sid)
-            )
-            edit_btn.md_bg_color = (0.5, 0.3, 0.7, 1)  # Фиолетовый
-            edit_btn.theme_text_color = "Custom"
-            edit_btn.text_color = (1, 1, 1, 1)
-
-            delete_btn = MDRaisedButton(
-                text="Удалить",
-                size_hint_x=0.5,
-                on_release=lambda x, sid=subject_id: self.delete_subject_dialog(sid, name)
-            )
-            delete_btn.md_bg_color = (0.8, 0.2, 0.2, 1)  # Красный для удаления
-            delete_btn.theme_text_color = "Custom"
-            delete_btn.text_color = (1, 1, 1, 1)
-
-            buttons_layout.add_widget(edit_btn)
-            buttons_layout.add_widget(delete_btn)
-
-            card.add_widget(content)
-            card.add_widget(buttons_layout)
-            self.ids.list_container.add_widget(card)
-
-        except Exception as e:
-            print(f"Ошибка при добавлении предмета в список: {e}")
+                info_text += " • "
+            info_text += f"Ауд. {classroom}"
+
+        return {
+            'row_id': subject_data['id'],
+            'sort_key': subject_data.get('name'),
+            'height': dp(140),
+            'title': subject_data.get('name') or 'Без названия',
+            'info_text': info_text if info_text else "Нет дополнительной информации",
+        }
+
+    def refresh_subject_row(self, subject_id, versions_before):
+        """Точечно обновляет карточку предмета после добавления, изменения или удаления.
+
+        Если список устарел ещё до изменения, он перезагружается целиком.
+        """
+        # незавершённые фоновые загрузки принесли бы данные до изменения
+        self.loader.cancel()
+        self.loading = False
+        if versions_before is None or versions_before != self.loaded_versions:
+            with session():
+                self.load_subjects()
+        else:
+            subject = get_subject_by_id(subject_id)
+            if subject is None:
+                self.ids.card_list.remove_row(subject_id)
+            else:
+                self.ids.card_list.upsert_row(self.subject_to_row(subject))
+            self.has_subjects = bool(self.ids.card_list.data)
+        self.loaded_versions = get_table_versions("subjects", "teachers")
 
     def edit_subject(self, subject_id):
         """Редактирование предмета"""
@@ -203,6 +155,7 @@ class SubjectsScreen(Screen):
             # Устанавливаем режим редактирования
             self.editing_subject_id = subject_id
             self.ids.add_button.text = "Сохранить изменения"
+            self.form_visible = True
 
             self.show_success("Режим редактирования. Измените данные и нажмите 'Сохранить изменения'")
 
@@ -212,38 +165,21 @@ class SubjectsScreen(Screen):
 
     def delete_subject_dialog(self, subject_id, subject_name):
         """Диалог подтверждения удаления"""
-        self.dialog = MDDialog(
-            title="Удаление предмета",
-            text=f"Вы уверены, что хотите удалить предмет:\n\"{subject_name}\"?",
-            buttons=[
-                MDFlatButton(
-                    text="Отмена",
-                    on_release=lambda x: self.dialog.dismiss()
-                ),
-                MDRaisedButton(
-                    text="Удалить",
-                    on_release=lambda x, sid=subject_id: self.delete_subject(sid)
-                )
-            ]
+        self.dialog = confirm(
+            "Удаление предмета",
+            f"Вы уверены, что хотите удалить предмет:\n\"{subject_name}\"?",
+            lambda: self.delete_subject(subject_id)
         )
-        # Устанавливаем цвета для кнопок диалога
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (0.5, 0.3, 0.7, 1)
-
-        self.dialog.buttons[1].md_bg_color = (0.8, 0.2, 0.2, 1)  # Красный
-        self.dialog.buttons[1].theme_text_color = "Custom"
-        self.dialog.buttons[1].text_color = (1, 1, 1, 1)
-
-        self.dialog.open()
 
     def delete_subject(self, subject_id):
         """Удаляет предмет"""
         print(f"Удаление предмета ID: {subject_id}")
         try:
+            versions_before = get_table_versions("subjects", "teachers")
             delete_subject(subject_id)
             if self.dialog:
                 self.dialog.dismiss()
-            self.load_subjects()
+            self.refresh_subject_row(subject_id, versions_before)
             self.show_success("Предмет удален")
         except Exception as e:
             print(f"Ошибка при удалении: {e}")
@@ -268,9 +204,11 @@ class SubjectsScreen(Screen):
             return
 
         try:
+            versions_before = get_table_versions("subjects", "teachers")
             if self.editing_subject_id:
                 # Режим редактирования
                 print(f"Обновление предмета ID: {self.editing_subject_id}")
+                changed_id = self.editing_subject_id
                 update_subject(
                     subject_id=self.editing_subject_id,
                     name=name,
@@ -282,7 +220,7 @@ class SubjectsScreen(Screen):
             else:
                 # Режим добавления
                 print("Добавление нового предмета")
-                add_subject(
+                changed_id = add_subject(
                     name=name,
                     teacher_id=None,
                     classroom=classroom if classroom else None,
@@ -290,8 +228,8 @@ class SubjectsScreen(Screen):
                 )
                 self.show_success("Предмет добавлен")
 
-            # Обновляем список и сбрасываем форму
-            self.load_subjects()
+            # Обновляем в списке только изменённый предмет и сбрасываем форму
+            self.refresh_subject_row(changed_id, versions_before)
             self.cancel_edit()
 
         except Exception as e:
@@ -311,36 +249,8 @@ class SubjectsScreen(Screen):
 
     def show_error(self, message):
         """Показывает сообщение об ошибке"""
-        self.dialog = MDDialog(
-            title="Ошибка",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        # Фиолетовая кнопка для диалога
-        self.dialog.buttons[0].md_bg_color = (0.5, 0.3, 0.7, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
+        show_message("Ошибка", message)
 
     def show_success(self, message):
         """Показывает сообщение об успехе"""
-        self.dialog = MDDialog(
-            title="Успешно",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        # Фиолетовая кнопка для диалога
-        self.dialog.buttons[0].md_bg_color = (0.5, 0.3, 0.7, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
\ No newline at end of file
+        show_message("Успешно", message)
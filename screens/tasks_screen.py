@@ -2,72 +2,37 @@ from kivy.properties import BooleanProperty, StringProperty, NumericProperty
 from kivy.uix.screenmanager import Screen
 from kivymd.uix.label import MDLabel
 from kivymd.uix.dialog import MDDialog
-from kivymd.uix.button import MDRaisedButton, MDFlatButton, MDRectangleFlatButton
+from kivymd.uix.button import MDRaisedButton, MDFlatButton
 from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.card import MDCard
-from kivymd.uix.menu import MDDropdownMenu
-from kivymd.uix.gridlayout import MDGridLayout
 from kivy.metrics import dp
-from datetime import datetime, timedelta
-from database import add_task, get_regular_tasks, delete_task, update_task, get_tasks, get_subjects
-
-
-class CalendarDayButton(MDRectangleFlatButton):
-    """Кнопка дня в календаре"""
-
-    def __init__(self, day_info, on_select_callback, **kwargs):
-        super().__init__(**kwargs)
-        self.day_info = day_info
-        self.on_select_callback = on_select_callback
-        self.text = str(day_info['day'])
-        self.size_hint = (1, 1)
-        self.line_color = (0.9, 0.9, 0.9, 1)
-        self.theme_text_color = "Custom"
-
-        # Изначальное состояние
-        self.is_selected = False
-        self.update_appearance()
-
-    def update_appearance(self):
-        """Обновляет внешний вид кнопки"""
-        if self.day_info['month'] != 'current':
-            # Дни других месяцев - всегда серые
-            self.text_color = (0.7, 0.7, 0.7, 1)
-            self.md_bg_color = (0.95, 0.95, 0.95, 1)
-        elif self.is_selected:
-            # Выбранный день текущего месяца - фиолетовый
-            self.md_bg_color = (0.5, 0.3, 0.7, 1)
-            self.text_color = (1, 1, 1, 1)
-        else:
-            # Обычный день текущего месяца - белый
-            self.md_bg_color = (1, 1, 1, 1)
-            self.text_color = (0.2, 0.2, 0.2, 1)
-
-    def on_release(self):
-        """Обработчик нажатия"""
-        if self.day_info['month'] == 'current':
-            self.on_select_callback(self.day_info)
-
-    def on_enter(self):
-        """При наведении курсора"""
-        if self.day_info['month'] == 'current' and not self.is_selected:
-            self.md_bg_color = (0.5, 0.3, 0.7, 0.3)  # Полупрозрачный фиолетовый
-            self.text_color = (0.5, 0.3, 0.7, 1)  # Фиолетовый текст
-
-    def on_leave(self):
-        """При уходе курсора"""
-        if self.day_info['month'] == 'current' and not self.is_selected:
-            self.update_appearance()  # Возвращаем обычный вид
-
-    def set_selected(self, selected):
-        """Устанавливает состояние выбора"""
-        self.is_selected = selected
-        self.update_appearance()
+from datetime import datetime
+from widgets.card_list import ListCard
+from widgets.dialogs import show_message, confirm, task_actions
+from widgets.subject_menu import SubjectMenu
+from widgets.calendar_grid import CalendarGrid
+from loader import ScreenLoader
+from database import add_task, delete_task, update_task, get_tasks, get_subjects, session, \
+    get_table_versions, get_regular_tasks_page, get_task, check_and_move_overdue_tasks, peek_month_counts, \
+    prefetch_month_counts, WEEKLY_RULE, get_next_occurrence, complete_occurrence, materialize_occurrence
+from frame_monitor import track
+
+
+class TaskCard(ListCard):
+    """Карточка задачи в списке CardList"""
+    title = StringProperty("")
+    type_text = StringProperty("")
+    subject_text = StringProperty("")
+    deadline_text = StringProperty("")
+    overdue = BooleanProperty(False)
+    description = StringProperty("")
+    repeating = BooleanProperty(False)  # шаблон повторяющейся задачи
 
 
 class TasksScreen(Screen):
     editing_task_id = None
     has_tasks = BooleanProperty(False)
+    form_visible = BooleanProperty(True)  # форма добавления развернута
+    loading = BooleanProperty(False)  # идёт фоновая загрузка списка
     selected_subject = StringProperty("")
     selected_subject_id = StringProperty("")
     deadline_date = StringProperty("")
@@ -76,46 +41,84 @@ class TasksScreen(Screen):
     current_picker_year = NumericProperty(2025)
     current_picker_month = NumericProperty(10)
     selected_picker_date = None
+    date_dialog = None
 
-    def on_pre_enter(self):
-        """Загрузка списка ТОЛЬКО обычных задач при открытии экрана"""
-        # АВТОМАТИЧЕСКАЯ ПРОВЕРКА ПРОСРОЧЕННЫХ ЗАДАЧ
-        self.check_overdue_tasks()
+    # версии таблиц, с которыми список был загружен в прошлый раз
+    loaded_versions = None
+    # курсор следующей страницы списка (None - всё загружено)
+    next_cursor = None
+    # загруженные задачи по id и имена предметов для карточек
+    tasks_by_id = {}
+    subject_names = {}
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loader = ScreenLoader("tasks")
+        # меню предметов: пункты перестраиваются только при изменении предметов
+        self.subject_menu = SubjectMenu(self.select_subject)
+
+    @track
+    def on_pre_enter(self):
+        """Загрузка списка ТОЛЬКО обычных задач при открытии экрана (в фоне)"""
         self.cancel_edit()
-        self.load_tasks()
         self.update_subject_button_text()
         self.update_deadline_button_text()
 
-    def check_overdue_tasks(self):
-        """Проверяет и перемещает просроченные задачи в задолженности"""
-        try:
-            from database import check_and_move_overdue_tasks
-            moved_count = check_and_move_overdue_tasks()
+        # пока идёт запрос, вместо устаревшего списка показываем заглушки
+        versions = get_table_versions("tasks", "subjects")
+        self.loading = versions is None or versions != self.loaded_versions
+        self.loader.submit(lambda loaded=self.loaded_versions: self.fetch_tasks(loaded), self.apply_tasks,
+                           on_error=self.on_load_error)
+
+    def on_leave(self):
+        # результаты загрузок, не успевших завершиться, экрану больше не нужны
+        self.loader.cancel()
+        self.loading = False
 
-            if moved_count > 0:
-                # Показываем уведомление о перемещенных задачах
-                self.show_info(f"Автоматически перемещено {moved_count} просроченных задач в задолженности")
+    def fetch_tasks(self, loaded_versions):
+        """Фоновая часть входа на экран: перенос просроченных задач и первая страница списка"""
+        # АВТОМАТИЧЕСКАЯ ПРОВЕРКА ПРОСРОЧЕННЫХ ЗАДАЧ
+        moved_count = self.check_overdue_tasks()
+
+        # список перестраиваем, только если задачи или предметы изменились
+        versions = get_table_versions("tasks", "subjects")
+        if versions is not None and versions == loaded_versions:
+            return moved_count, versions, None
+        # одна сессия на загрузку списка и предметов для карточек
+        with session():
+            subjects = self.get_available_subjects()
+            page = get_regular_tasks_page()
+        return moved_count, versions, (subjects, page)
+
+    def apply_tasks(self, result):
+        """UI-часть входа на экран: показывает загруженный список"""
+        moved_count, versions, data = result
+        if data is not None:
+            subjects, (tasks, next_cursor) = data
+            self.show_tasks(subjects, tasks, next_cursor)
+            self.loaded_versions = versions
+        self.loading = False
+
+        if moved_count > 0:
+            # Показываем уведомление о перемещенных задачах
+            self.show_info(f"Автоматически перемещено {moved_count} просроченных задач в задолженности")
+
+    def on_load_error(self, error):
+        self.loading = False
+        print(f"Ошибка при загрузке задач: {error}")
+        self.show_error(f"Ошибка загрузки: {error}")
 
+    def check_overdue_tasks(self):
+        """Перемещает просроченные задачи в задолженности, возвращает их число"""
+        try:
+            return check_and_move_overdue_tasks()
         except Exception as e:
             print(f"Ошибка при проверке просроченных задач: {e}")
+            return 0
 
     def show_info(self, message):
         """Показывает информационное сообщение"""
-        self.dialog = MDDialog(
-            title="Информация",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        self.dialog.buttons[0].md_bg_color = (0.3, 0.5, 0.7, 1)  # Синий цвет
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
+        show_message("Информация", message, button_color=(0.3, 0.5, 0.7, 1))  # Синий цвет
 
     def update_subject_button_text(self):
         """Обновляет текст кнопки выбора предмета"""
@@ -143,31 +146,11 @@ class TasksScreen(Screen):
             return []
 
     def open_subject_dropdown(self):
-        """Открывает выпадающий список предметов"""
-        subjects = self.get_available_subjects()
-
-        menu_items = [
-            {
-                "text": subject["name"],
-                "viewclass": "OneLineListItem",
-                "on_release": lambda x=subject: self.select_subject(x),
-            } for subject in subjects
-        ]
-
-        # Добавляем опцию "Без предмета"
-        menu_items.append({
-            "text": "Без предмета",
-            "viewclass": "OneLineListItem",
-            "on_release": lambda x=None: self.select_subject(None),
-        })
-
-        self.subject_menu = MDDropdownMenu(
-            caller=self.ids.subject_dropdown_btn,
-            items=menu_items,
-            width_mult=4,
-            max_height=dp(200)
-        )
-        self.subject_menu.open()
+        """Открывает выпадающий список предметов (пункты готовы заранее)"""
+        if not self.subject_menu.ready:
+            # список ещё не загружался - строим меню по (кэшированным) предметам
+            self.subject_menu.set_subjects(self.get_available_subjects())
+        self.subject_menu.open(self.ids.subject_dropdown_btn)
 
     def select_subject(self, subject):
         """Выбирает предмет из списка"""
@@ -180,25 +163,36 @@ class TasksScreen(Screen):
 
         self.update_subject_button_text()
 
-        if hasattr(self, 'subject_menu'):
-            self.subject_menu.dismiss()
+        self.subject_menu.dismiss()
 
     def open_date_picker(self):
         """Открывает кастомный диалог выбора даты"""
         self.show_custom_date_picker()
 
+    @track
     def show_custom_date_picker(self):
-        """Показывает кастомный диалог выбора даты на русском"""
-        # Закрываем предыдущий диалог если есть
-        if hasattr(self, 'date_dialog') and self.date_dialog:
-            self.date_dialog.dismiss()
+        """Показывает кастомный диалог выбора даты на русском.
+
+        Диалог создаётся при первом открытии, дальше только сбрасывается его состояние.
+        """
+        if self.date_dialog is None:
+            self.date_dialog = self.build_date_dialog()
 
         # Текущая дата
         now = datetime.now()
         self.current_picker_year = now.year
         self.current_picker_month = now.month
         self.selected_picker_date = None
+        self.picker_grid.selected_date = None
+        self.selected_date_label.text = "Дата не выбрана"
+        self.picker_month_label.text = self.get_russian_month_year(self.current_picker_month, self.current_picker_year)
+        self.update_calendar_days()
+
+        self.date_dialog.open()
 
+    @track
+    def build_date_dialog(self):
+        """Создаёт диалог выбора даты (один раз на экран)"""
         # Создаем контент
         content = MDBoxLayout(
             orientation="vertical",
@@ -264,37 +258,17 @@ class TasksScreen(Screen):
 
         content.add_widget(month_year_layout)
 
-        # Дни недели
-        week_days_layout = MDGridLayout(
-            cols=7,
+        # Календарь: дни недели и 42 ячейки, при смене месяца только перепривязываются
+        self.picker_grid = CalendarGrid(
+            selectable=True,
+            show_today=False,
+            cell_height=dp(35),
             spacing=dp(2),
-            size_hint_y=None,
-            height=dp(30)
-        )
-
-        week_days = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-        for day in week_days:
-            week_days_layout.add_widget(MDLabel(
-                text=day,
-                halign="center",
-                font_style="Caption",
-                bold=True,
-                theme_text_color="Custom",
-                text_color=(0.5, 0.3, 0.7, 1)
-            ))
-
-        content.add_widget(week_days_layout)
-
-        # Календарь
-        self.calendar_container = MDGridLayout(
-            cols=7,
-            spacing=dp(2),
-            adaptive_height=True,
-            size_hint_y=None,
-            height=dp(200)
+            header_color=(0.5, 0.3, 0.7, 1),
+            event_color=(0.5, 0.3, 0.7, 0.15)
         )
-        self.update_calendar_days()
-        content.add_widget(self.calendar_container)
+        self.picker_grid.bind(on_day_selected=lambda grid, day: self.on_day_selected(day))
+        content.add_widget(self.picker_grid)
 
         # Выбранная дата
         self.selected_date_label = MDLabel(
@@ -334,7 +308,7 @@ class TasksScreen(Screen):
         content.add_widget(buttons_layout)
 
         # Создаем диалог
-        self.date_dialog = MDDialog(
+        return MDDialog(
             type="custom",
             content_cls=content,
             size_hint=(0.8, None),
@@ -344,8 +318,6 @@ class TasksScreen(Screen):
             elevation=8
         )
 
-        self.date_dialog.open()
-
     def get_russian_month_year(self, month, year):
         """Возвращает месяц и год на русском"""
         months = [
@@ -370,102 +342,31 @@ class TasksScreen(Screen):
         self.update_calendar_days()
 
     def update_calendar_days(self):
-        """Обновляет дни в календаре"""
-        if not hasattr(self, 'calendar_container'):
+        """Показывает в календаре выбранный месяц"""
+        if not hasattr(self, 'picker_grid'):
             return
 
-        self.calendar_container.clear_widgets()
-
-        # Сохраняем ссылки на кнопки для управления выделением
-        self.day_buttons = []
-
-        # Генерируем дни месяца
-        calendar_days = self.generate_calendar_days(self.current_picker_year, self.current_picker_month)
-
-        for day_info in calendar_days:
-            btn = CalendarDayButton(
-                day_info=day_info,
-                on_select_callback=self.on_day_selected,
-                size_hint_y=None,
-                height=dp(35)
-            )
-            self.day_buttons.append(btn)
-            self.calendar_container.add_widget(btn)
-
-        # Если есть выбранная дата в этом месяце, выделяем её
-        if hasattr(self, 'selected_picker_date') and self.selected_picker_date:
-            for btn in self.day_buttons:
-                if (btn.day_info['month'] == 'current' and
-                        hasattr(btn.day_info, 'get') and
-                        btn.day_info.get('date') == self.selected_picker_date):
-                    btn.set_selected(True)
-                    break
-
-    def generate_calendar_days(self, year, month):
-        """Генерирует дни для календаря"""
-        first_day = datetime(year, month, 1)
-        if month == 12:
-            last_day = datetime(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            last_day = datetime(year, month + 1, 1) - timedelta(days=1)
+        year, month = self.current_picker_year, self.current_picker_month
+        self.picker_grid.show_month(year, month, peek_month_counts(year, month) or {})
+        self.load_picker_counts()
 
-        # Дни предыдущего месяца
-        days_before = (first_day.weekday() + 1) % 7  # Пн=0, Вс=6
-        prev_month = month - 1 if month > 1 else 12
-        prev_year = year if month > 1 else year - 1
+    def load_picker_counts(self):
+        """Догружает в фоне загруженность показанного месяца и соседних.
 
-        if prev_month == 12:
-            prev_last_day = datetime(prev_year, prev_month, 31)
-        else:
-            prev_last_day = datetime(prev_year, prev_month + 1, 1) - timedelta(days=1)
-
-        calendar_days = []
-
-        # Добавляем дни предыдущего месяца
-        for day in range(prev_last_day.day - days_before + 1, prev_last_day.day + 1):
-            calendar_days.append({
-                'day': day,
-                'month': 'prev'
-            })
-
-        # Добавляем дни текущего месяца (УБРАЛИ выделение сегодняшнего дня)
-        for day in range(1, last_day.day + 1):
-            current_date = datetime(year, month, day).date()
-
-            calendar_days.append({
-                'day': day,
-                'month': 'current',
-                'date': current_date
-            })
-
-        # Добавляем дни следующего месяца
-        days_after = 42 - len(calendar_days)
-        for day in range(1, days_after + 1):
-            calendar_days.append({
-                'day': day,
-                'month': 'next'
-            })
-
-        return calendar_days
-
-    def on_day_selected(self, day_info):
-        """Обрабатывает выбор дня"""
-        # Сбрасываем выделение у всех кнопок текущего месяца
-        for btn in self.day_buttons:
-            if hasattr(btn, 'set_selected') and btn.day_info['month'] == 'current':
-                btn.set_selected(False)
-
-        # Устанавливаем выделение для выбранной кнопки
-        selected_btn = None
-        for btn in self.day_buttons:
-            if (btn.day_info['month'] == 'current' and
-                    hasattr(btn.day_info, 'get') and
-                    btn.day_info.get('date') == day_info['date']):
-                btn.set_selected(True)
-                selected_btn = btn
-                break
-
-        self.selected_picker_date = day_info['date']
+        Если показанного месяца ещё не было в кэше, календарь перерисовывается.
+        """
+        year, month = self.current_picker_year, self.current_picker_month
+        shown = peek_month_counts(year, month) is not None
+
+        def apply(result):
+            if not shown and (year, month) == (self.current_picker_year, self.current_picker_month):
+                self.picker_grid.density = peek_month_counts(year, month) or {}
+
+        self.loader.submit(lambda: prefetch_month_counts(year, month), apply, key="picker")
+
+    def on_day_selected(self, selected_date):
+        """Обрабатывает выбор дня (выделение ячейки делает сама сетка)"""
+        self.selected_picker_date = selected_date
 
         # Форматируем дату по-русски
         month_names = [
@@ -473,10 +374,10 @@ class TasksScreen(Screen):
             "июля", "августа", "сентября", "октября", "ноября", "декабря"
         ]
 
-        day = day_info['date'].day
-        month = month_names[day_info['date'].month - 1]
-        year = day_info['date'].year
-        weekday = day_info['date'].strftime("%a")
+        day = selected_date.day
+        month = month_names[selected_date.month - 1]
+        year = selected_date.year
+        weekday = selected_date.strftime("%a")
 
         weekdays_ru = {
             "Mon": "Пн", "Tue": "Вт", "Wed": "Ср", "Thu": "Чт",
@@ -522,183 +423,109 @@ class TasksScreen(Screen):
             self.deadline_date_save = ""
         self.update_deadline_button_text()
 
+    @track
     def load_tasks(self):
-        """Загружает список ТОЛЬКО обычных учебных работ"""
-        self.ids.list_container.clear_widgets()
-        tasks = get_regular_tasks()
-
-        # Фильтруем экзамены
-        regular_tasks = [task for task in tasks if task.get('type') != 'exam']
-
-        if not regular_tasks:
-            # Если задач нет - показываем сообщение В list_container
-            self.show_empty_message()
-        else:
-            # Если есть задачи - показываем их
-            for task in regular_tasks:
-                self.add_task_to_list(task)
-
-    def show_empty_message(self):
-        """Показывает сообщение когда задач нет"""
-        empty_card = MDCard(
-            orientation="vertical",
-            padding=dp(20),
-            size_hint_y=None,
-            height=dp(120),
-            elevation=2,
-            md_bg_color=(0.95, 0.95, 0.95, 1)
-        )
-
-        content = MDBoxLayout(orientation="vertical", spacing=dp(10))
+        """Загружает первую страницу ТОЛЬКО обычных учебных работ"""
+        self.show_tasks(self.get_available_subjects(), *get_regular_tasks_page())
+
+    @track
+    def show_tasks(self, subjects, tasks, next_cursor):
+        """Заменяет список первой страницей задач"""
+        self.subject_names = {str(s['id']): s['name'] for s in subjects}
+        self.subject_menu.set_subjects(subjects)
+        self.tasks_by_id = {}
+        self.next_cursor = next_cursor
+        self.ids.card_list.set_rows([])
+        self.add_tasks_to_list(tasks)
+
+    def load_more_tasks(self):
+        """Догружает следующую страницу задач в конец списка (в фоне)"""
+        if not self.next_cursor or self.loader.pending("more"):
+            return
 
-        content.add_widget(MDLabel(
-            text="Пока нет задач",
-            theme_text_color="Secondary",
-            font_style="H6",
-            halign="center",
-            size_hint_y=None,
-            height=dp(30)
-        ))
+        def apply(page):
+            tasks, self.next_cursor = page
+            self.add_tasks_to_list(tasks)
 
-        content.add_widget(MDLabel(
-            text="Добавьте первую задачу используя форму выше",
-            theme_text_color="Secondary",
-            halign="center",
-            size_hint_y=None,
-            height=dp(25)
-        ))
+        self.loader.submit(lambda cursor=self.next_cursor: get_regular_tasks_page(cursor), apply, key="more")
 
-        empty_card.add_widget(content)
-        self.ids.list_container.add_widget(empty_card)
+    def on_list_scroll(self, scroll_view):
+        """При прокрутке к концу списка подгружаем следующую страницу"""
+        if self.next_cursor and scroll_view.scroll_y <= 0.05:
+            self.load_more_tasks()
 
-    def add_task_to_list(self, task_data):
-        """Добавляет одну учебную работу в список с кнопками редактирования и удаления"""
-        task_id = task_data['id']
-        title = task_data.get('title', 'Без названия')
-        task_type = task_data.get('type', 'не указан')
+    def task_to_row(self, task_data):
+        """Превращает строку задачи из базы в словарь данных для карточки TaskCard"""
+        task_type = task_data.get('type') or 'не указан'
         subject_id = task_data.get('subject_id')
-        description = task_data.get('description', '')
-        status = task_data.get('status', 'активно')
+        description = task_data.get('description') or ''
         due_date = task_data.get('due_date')
 
-        # Создаем карточку задачи
-        card = MDCard(
-            orientation="vertical",
-            padding=dp(20),
-            size_hint_y=None,
-            height=dp(200),
-            elevation=3
-        )
-
-        # Основной контент
-        content = MDBoxLayout(orientation="vertical", spacing=dp(8))
-
-        # Заголовок
-        title_label = MDLabel(
-            text=f"{title}",
-            theme_text_color="Custom",
-            text_color=(0.4, 0.2, 0.6, 1),
-            font_style="H6",
-            size_hint_y=None,
-            height=dp(30),
-            bold=True
-        )
-
-        # Тип работы
-        display_type = task_type if task_type != 'exam' else 'задача'
-        type_label = MDLabel(
-            text=f"Тип: {display_type}",
-            theme_text_color="Custom",
-            text_color=(0.3, 0.3, 0.4, 1),
-            size_hint_y=None,
-            height=dp(25)
-        )
-
         # ПРЕДМЕТ
         subject_name = "Не указан"
         if subject_id:
-            subject = self.get_subject_by_id(subject_id)
-            if subject:
-                subject_name = subject['name']
-
-        subject_label = MDLabel(
-            text=f"Предмет: {subject_name}",
-            theme_text_color="Custom",
-            text_color=(0.3, 0.3, 0.4, 1),
-            size_hint_y=None,
-            height=dp(25)
-        )
+            subject_name = self.subject_names.get(str(subject_id), subject_name)
 
         # ДЕДЛАЙН (если есть)
-        deadline_label = None
+        deadline_text = ""
+        overdue = False
         if due_date:
             try:
                 if isinstance(due_date, str):
-                    deadline_date = datetime.strptime(due_date, "%Y-%m-%d %H:%M:%S").strftime("%d.%m.%Y")
+                    due_date = datetime.strptime(due_date, "%Y-%m-%d %H:%M:%S")
+                deadline_text = due_date.strftime("%d.%m.%Y")
+                if task_data.get('recurrence'):
+                    # у шаблона дедлайн - первое повторение, просроченным он не бывает
+                    deadline_text = f"повторяется с {deadline_text}"
                 else:
-                    deadline_date = due_date.strftime("%d.%m.%Y")
-
-                deadline_label = MDLabel(
-                    text=f"Дедлайн: {deadline_date}",
-                    theme_text_color="Custom",
-                    text_color=(0.8, 0.2, 0.2, 1) if due_date < datetime.now() else (0.2, 0.6, 0.2, 1),
-                    size_hint_y=None,
-                    height=dp(25),
-                    bold=True if due_date < datetime.now() else False
-                )
+                    overdue = due_date < datetime.now()
             except Exception as e:
                 print(f"Ошибка при форматировании даты: {e}")
 
-        content.add_widget(title_label)
-        content.add_widget(type_label)
-        content.add_widget(subject_label)
-
-        if deadline_label:
-            content.add_widget(deadline_label)
-
-        # Описание
-        if description and "Предмет:" not in description:
-            desc_label = MDLabel(
-                text=f"{description}",
-                theme_text_color="Custom",
-                text_color=(0.3, 0.3, 0.4, 1),
-                size_hint_y=None,
-                height=dp(25)
-            )
-            content.add_widget(desc_label)
-
-        # Кнопки действий
-        buttons_layout = MDBoxLayout(
-            orientation="horizontal",
-            size_hint_y=None,
-            height=dp(50),
-            spacing=dp(10)
-        )
-
-        edit_btn = MDRaisedButton(
-            text="Редактировать",
-            size_hint_x=0.5,
-            on_release=lambda x, task_id=task_id: self.edit_task(task_id)
-        )
-        edit_btn.md_bg_color = (0.5, 0.3, 0.7, 1)
-        edit_btn.theme_text_color = "Custom"
-        edit_btn.text_color = (1, 1, 1, 1)
-
-        delete_btn = MDRaisedButton(
-            text="Удалить",
-            size_hint_x=0.5,
-            on_release=lambda x, task_id=task_id: self.delete_task_dialog(task_id, title)
-        )
-        delete_btn.md_bg_color = (0.8, 0.2, 0.2, 1)
-        delete_btn.theme_text_color = "Custom"
-        delete_btn.text_color = (1, 1, 1, 1)
-
-        buttons_layout.add_widget(edit_btn)
-        buttons_layout.add_widget(delete_btn)
+        # все ключи заполняются всегда: карточки переиспользуются между строками
+        repeating = bool(task_data.get('recurrence'))
+        return {
+            'row_id': task_data['id'],
+            'sort_key': task_data.get('created_at'),
+            'height': dp(250) if repeating else dp(200),
+            'title': task_data.get('title') or 'Без названия',
+            'type_text': task_type if task_type != 'exam' else 'задача',
+            'subject_text': subject_name,
+            'deadline_text': deadline_text,
+            'overdue': overdue,
+            'description': description if "Предмет:" not in description else '',
+            'repeating': repeating,
+        }
 
-        card.add_widget(content)
-        card.add_widget(buttons_layout)
-        self.ids.list_container.add_widget(card)
+    def add_tasks_to_list(self, tasks):
+        """Добавляет задачи в конец списка (данные RecycleView, а не виджеты)"""
+        for task in tasks:
+            self.tasks_by_id[task['id']] = task
+        self.ids.card_list.append_rows(self.task_to_row(task) for task in tasks)
+        self.has_tasks = bool(self.ids.card_list.data)
+
+    def refresh_task_row(self, task_id, versions_before):
+        """Точечно обновляет карточку задачи после добавления, изменения или удаления.
+
+        Если список устарел ещё до изменения (данные менял кто-то другой),
+        он перезагружается целиком.
+        """
+        # незавершённые фоновые загрузки принесли бы данные до изменения
+        self.loader.cancel()
+        self.loading = False
+        if versions_before is None or versions_before != self.loaded_versions:
+            with session():
+                self.load_tasks()
+        else:
+            task = get_task(task_id)
+            if task is None or task.get('type') == 'exam':
+                self.tasks_by_id.pop(task_id, None)
+                self.ids.card_list.remove_row(task_id)
+            else:
+                self.tasks_by_id[task_id] = task
+                self.ids.card_list.upsert_row(self.task_to_row(task), has_more=bool(self.next_cursor))
+            self.has_tasks = bool(self.ids.card_list.data)
+        self.loaded_versions = get_table_versions("tasks", "subjects")
 
     def get_subject_by_id(self, subject_id):
         """Получает предмет по ID"""
@@ -746,9 +573,17 @@ class TasksScreen(Screen):
                 self.show_error("Неверный формат даты дедлайна")
                 return
 
+        # Повторяющаяся задача: дедлайн - первое повторение
+        repeat_weekly = self.ids.repeat_weekly.active
+        if repeat_weekly and due_date is None:
+            self.show_error("Для повторяющейся задачи выберите дату первого выполнения")
+            return
+
         # Используем английские статусы для consistency
         task_type = work_type if work_type else 'task'
 
+        versions_before = get_table_versions("tasks", "subjects")
+        changed_id = None
         if self.editing_task_id:
             # Режим редактирования
             try:
@@ -758,8 +593,10 @@ class TasksScreen(Screen):
                     description=description,
                     task_type=task_type,
                     subject_id=self.selected_subject_id if self.selected_subject_id else None,
-                    due_date=due_date
+                    due_date=due_date,
+                    recurrence=WEEKLY_RULE if repeat_weekly else ""
                 )
+                changed_id = self.editing_task_id
                 self.show_success("Задача обновлена")
             except Exception as e:
                 self.show_error(f"Ошибка при обновлении: {e}")
@@ -772,26 +609,23 @@ class TasksScreen(Screen):
                     task_type=task_type,
                     status='active',
                     subject_id=self.selected_subject_id if self.selected_subject_id else None,
-                    due_date=due_date
+                    due_date=due_date,
+                    recurrence=WEEKLY_RULE if repeat_weekly else None
                 )
                 print(f"Задача добавлена с ID: {task_id}")
+                changed_id = task_id
                 self.show_success("Задача добавлена")
             except Exception as e:
                 self.show_error(f"Ошибка при добавлении: {e}")
 
-        # Обновляем список и сбрасываем форму
-        self.load_tasks()
+        # Обновляем в списке только изменённую задачу и сбрасываем форму
+        if changed_id is not None:
+            self.refresh_task_row(changed_id, versions_before)
         self.cancel_edit()
 
     def edit_task(self, task_id):
         """Редактирование учебной работы"""
-        tasks = get_regular_tasks()
-        task_to_edit = None
-
-        for task in tasks:
-            if task['id'] == task_id:
-                task_to_edit = task
-                break
+        task_to_edit = self.tasks_by_id.get(task_id)
 
         if not task_to_edit:
             self.show_error("Задача не найдена")
@@ -834,6 +668,7 @@ class TasksScreen(Screen):
                 self.deadline_date = ""
         else:
             self.deadline_date = ""
+        self.ids.repeat_weekly.active = bool(task_to_edit.get('recurrence'))
 
         self.update_subject_button_text()
         self.update_deadline_button_text()
@@ -841,42 +676,74 @@ class TasksScreen(Screen):
         # Устанавливаем режим редактирования
         self.editing_task_id = task_id
         self.ids.add_button.text = "Сохранить изменения"
+        self.form_visible = True
 
         self.show_success("Режим редактирования. Измените данные и нажмите 'Сохранить изменения'")
 
-    def delete_task_dialog(self, task_id, task_title):
-        """Диалог подтверждения удаления"""
-        self.dialog = MDDialog(
-            title="Удаление задачи",
-            text=f"Вы уверены, что хотите удалить задачу:\n\"{task_title}\"?",
-            buttons=[
-                MDRaisedButton(
-                    text="Отмена",
-                    on_release=lambda x: self.dialog.dismiss()
-                ),
-                MDRaisedButton(
-                    text="Удалить",
-                    on_release=lambda x: self.delete_task(task_id)
-                )
-            ]
+    def open_for_edit(self, task_id):
+        """Редактирование задачи, которой может не быть среди загруженных (переход с главного экрана)"""
+        task = get_task(task_id)
+        if task is None:
+            self.show_error("Задача не найдена")
+            return
+        self.tasks_by_id[task_id] = task
+        self.edit_task(task_id)
+
+    def occurrence_actions(self, template_id):
+        """Выполнение или изменение ближайшего повторения шаблона; остальные повторения не меняются"""
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        occurrence = get_next_occurrence(template_id, today)
+        if occurrence is None:
+            self.show_info("У задачи больше нет повторений")
+            return
+        task_actions(
+            occurrence['title'],
+            f"Ближайшее повторение: {occurrence['due_date'].strftime('%d.%m.%Y')}",
+            lambda: self.edit_occurrence(occurrence),
+            lambda: self.complete_occurrence(occurrence)
         )
-        # Устанавливаем цвета для кнопок диалога
-        self.dialog.buttons[0].md_bg_color = (0.8, 0.7, 0.9, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (0.4, 0.2, 0.6, 1)
 
-        self.dialog.buttons[1].md_bg_color = (0.8, 0.2, 0.2, 1)
-        self.dialog.buttons[1].theme_text_color = "Custom"
-        self.dialog.buttons[1].text_color = (1, 1, 1, 1)
+    def complete_occurrence(self, occurrence):
+        """Отмечает выполненным одно повторение: оно становится отдельной выполненной задачей"""
+        try:
+            versions_before = get_table_versions("tasks", "subjects")
+            task_id = complete_occurrence(occurrence['recurrence_parent_id'], occurrence['occurrence_date'])
+        except Exception as e:
+            self.show_error(f"Ошибка при выполнении: {e}")
+            return
+        if task_id is not None:
+            self.refresh_task_row(task_id, versions_before)
+        self.show_success(f"Повторение {occurrence['due_date'].strftime('%d.%m.%Y')} выполнено")
+
+    def edit_occurrence(self, occurrence):
+        """Открывает в форме одно повторение: сначала оно становится отдельной задачей"""
+        try:
+            versions_before = get_table_versions("tasks", "subjects")
+            task_id = materialize_occurrence(occurrence['recurrence_parent_id'], occurrence['occurrence_date'])
+        except Exception as e:
+            self.show_error(f"Ошибка при создании повторения: {e}")
+            return
+        if task_id is None:
+            self.show_error("Задача не найдена")
+            return
+        self.refresh_task_row(task_id, versions_before)
+        self.open_for_edit(task_id)
 
-        self.dialog.open()
+    def delete_task_dialog(self, task_id, task_title):
+        """Диалог подтверждения удаления"""
+        self.dialog = confirm(
+            "Удаление задачи",
+            f"Вы уверены, что хотите удалить задачу:\n\"{task_title}\"?",
+            lambda: self.delete_task(task_id)
+        )
 
     def delete_task(self, task_id):
         """Удаляет задачу"""
         try:
+            versions_before = get_table_versions("tasks", "subjects")
             delete_task(task_id)
             self.dialog.dismiss()
-            self.load_tasks()
+            self.refresh_task_row(task_id, versions_before)
             self.show_success("Задача удалена")
         except Exception as e:
             self.show_error(f"Ошибка при удалении: {e}")
@@ -894,6 +761,7 @@ class TasksScreen(Screen):
         self.deadline_date = ""
         if hasattr(self, 'deadline_date_save'):
             self.deadline_date_save = ""
+        self.ids.repeat_weekly.active = False
 
         self.update_subject_button_text()
         self.update_deadline_button_text()
@@ -909,34 +777,8 @@ class TasksScreen(Screen):
 
     def show_error(self, message):
         """Показывает сообщение об ошибке"""
-        self.dialog = MDDialog(
-            title="Ошибка",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        self.dialog.buttons[0].md_bg_color = (0.5, 0.3, 0.7, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
+        show_message("Ошибка", message)
 
     def show_success(self, message):
         """Показывает сообщение об успехе"""
-        self.dialog = MDDialog(
-            title="Успешно",
-            text=message,
-            buttons=[
-                MDRaisedButton(
-                    text="OK",
-                    on_release=lambda x: self.dialog.dismiss()
-                )
-            ]
-        )
-        self.dialog.buttons[0].md_bg_color = (0.5, 0.3, 0.7, 1)
-        self.dialog.buttons[0].theme_text_color = "Custom"
-        self.dialog.buttons[0].text_color = (1, 1, 1, 1)
-        self.dialog.open()
\ No newline at end of file
+        show_message("Успешно", message)
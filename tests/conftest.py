@@ -0,0 +1,114 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+# модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeDatabase:
+    """Строки в памяти вместо запросов к PostgreSQL"""
+
+    def __init__(self):
+        self.templates = []  # шаблоны повторяющихся задач
+        self.reminders = []
+        self.fired = []  # id напоминаний, отмеченных сработавшими
+
+    def add_template(self, task_id, due_date, recurrence="FREQ=WEEKLY", overrides=(), **fields):
+        task = {"id": task_id, "title": f"Задача {task_id}", "type": "homework", "status": "active",
+                "due_date": due_date, "recurrence": recurrence, "overrides": frozenset(overrides)}
+        task.update(fields)
+        self.templates.append(task)
+        return task
+
+    def add_reminder(self, reminder_id, minutes, title=None):
+        """Напоминание через minutes минут от текущего момента (отрицательные - в прошлом)"""
+        reminder = {"id": reminder_id, "task_id": reminder_id, "title": title,
+                    "reminder_time": datetime.now() + timedelta(minutes=minutes)}
+        self.reminders.append(reminder)
+        return reminder
+
+    # --- подменяемые функции database ---
+
+    def get_recurring_tasks(self):
+        return self.templates
+
+    def get_pending_reminders(self, after=None, until=None, limit=500):
+        rows = sorted(self.reminders, key=lambda r: (r["reminder_time"], r["id"]))
+        rows = [r for r in rows if r["id"] not in self.fired
+                and (after is None or (r["reminder_time"], r["id"]) > after)
+                and (until is None or r["reminder_time"] < until)]
+        return rows[:limit]
+
+    def mark_reminders_fired(self, reminder_ids, fired_at=None):
+        self.fired.extend(reminder_ids)
+
+    def get_table_versions(self, *tables):
+        return None
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Подменяет функции database, которые читают шаблоны повторений и напоминания"""
+    import database
+
+    fake = FakeDatabase()
+    for name in ("get_recurring_tasks", "get_pending_reminders", "mark_reminders_fired",
+                 "get_table_versions"):
+        monkeypatch.setattr(database, name, getattr(fake, name))
+    return fake
+
+
+class FakeEvent:
+    def __init__(self, callback, delay):
+        self.callback = callback
+        self.delay = delay
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeClock:
+    """Clock без цикла событий: таймеры только запоминаются"""
+
+    def __init__(self):
+        self.events = []
+
+    def schedule_once(self, callback, delay=0):
+        event = FakeEvent(callback, delay)
+        self.events.append(event)
+        return event
+
+
+class FakeLoader:
+    """Загрузчик без потоков: задания запоминаются и выполняются через run()"""
+
+    def __init__(self):
+        self.jobs = []
+        self.cancelled = []
+
+    def submit(self, fetch, apply, key=None, on_error=None):
+        self.jobs.append((key, fetch, apply))
+
+    def cancel(self, key=None):
+        self.cancelled.append(key)
+
+    def run(self, key):
+        """Выполняет последнее задание с этим ключом, как сделал бы фоновый поток"""
+        for job_key, fetch, apply in reversed(self.jobs):
+            if job_key == key:
+                return apply(fetch())
+        raise AssertionError(f"нет задания {key!r}")
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_loader():
+    return FakeLoader()
@@ -0,0 +1,137 @@
+"""Планы запросов по дедлайну на большой таблице задач.
+
+Запросы главного экрана и календаря фильтруют due_date полуоткрытыми
+интервалами (day_window, month_window и др.), поэтому должны идти по индексам,
+а не перебором таблицы. Каждый SELECT/EXECUTE, выполненный проверяемой
+функцией, повторяется через EXPLAIN на том же курсоре.
+
+Тесту нужна отдельная база PostgreSQL: её имя задаётся переменной окружения
+STUDY_TRACKER_TEST_DB (остальные параметры подключения - из DB_CONFIG). Без
+неё тесты пропускаются. Схема накатывается migrate(), в таблицу задач один раз
+загружается TASK_ROWS строк.
+"""
+import os
+from datetime import date
+
+import pytest
+
+TEST_DB = os.environ.get("STUDY_TRACKER_TEST_DB")
+
+pytestmark = pytest.mark.skipif(not TEST_DB, reason="не задана база STUDY_TRACKER_TEST_DB")
+
+TASK_ROWS = 1_000_000
+
+# Десять лет истории: около 270 задач на день, почти все выполнены, дедлайны
+# в прошлом (и до полудня завтрашнего дня). Каждая тысячная задача - без даты,
+# каждая пятидесятая - экзамен, каждая сотая привязана к тестовому предмету.
+FILL_SQL = """
+    INSERT INTO tasks (title, type, status, subject_id, due_date, created_at)
+    SELECT 'plan-test ' || i,
+           CASE WHEN i %% 50 = 0 THEN 'exam' ELSE 'homework' END,
+           CASE WHEN i %% 20 = 0 THEN 'active' ELSE 'completed' END,
+           CASE WHEN i %% 100 = 0 THEN %(subject_id)s END,
+           CASE WHEN i %% 1000 <> 0
+                THEN date_trunc('hour', NOW()) + INTERVAL '12 hours' - (i %% 3650) * INTERVAL '1 day'
+                                               - (i %% 24) * INTERVAL '1 hour'
+           END,
+           NOW() - (i %% 3650) * INTERVAL '1 day' - INTERVAL '7 days'
+    FROM generate_series(1, %(rows)s) AS i
+"""
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+
+TODAY = date.today()
+
+
+@pytest.fixture(scope="module")
+def db():
+    pytest.importorskip("psycopg2")
+    pytest.importorskip("dateutil")
+    import database
+
+    database.close_pool()
+    saved_name = database.DB_CONFIG["dbname"]
+    database.DB_CONFIG["dbname"] = TEST_DB
+    try:
+        database.migrate()
+        with database.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM subjects WHERE name = 'plan-test'")
+                row = cur.fetchone()
+                if row is None:
+                    cur.execute("INSERT INTO subjects (name) VALUES ('plan-test') RETURNING id")
+                    row = cur.fetchone()
+                cur.execute("SELECT COUNT(*) AS n FROM tasks")
+                missing = TASK_ROWS - cur.fetchone()["n"]
+                if missing > 0:
+                    cur.execute(FILL_SQL, {"subject_id": row["id"], "rows": missing})
+                cur.execute("ANALYZE tasks")
+        yield database
+    finally:
+        database.close_pool()
+        database.DB_CONFIG["dbname"] = saved_name
+
+
+@pytest.fixture(scope="module")
+def subject_id(db):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM subjects WHERE name = 'plan-test'")
+            return cur.fetchone()["id"]
+
+
+@pytest.fixture
+def plans(db, monkeypatch):
+    """Список (запрос, план) для каждого SELECT/EXECUTE, выполненного во время теста"""
+    from psycopg2.extras import RealDictCursor
+
+    # снимок главного экрана заполняет кэш счётчиков месяца - без сброса
+    # следующая проверка не дошла бы до базы
+    db.clear_cache()
+    captured = []
+    original = RealDictCursor.execute
+
+    def execute(cur, query, vars=None):
+        text = query.decode() if isinstance(query, bytes) else query
+        if text.lstrip().upper().startswith(("SELECT", "EXECUTE")):
+            original(cur, "EXPLAIN (FORMAT JSON) " + text, vars)
+            captured.append((text, cur.fetchone()["QUERY PLAN"][0]["Plan"]))
+        return original(cur, query, vars)
+
+    monkeypatch.setattr(RealDictCursor, "execute", execute)
+    return captured
+
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _nodes(child)
+
+
+def assert_index_scans(captured):
+    task_plans = [(query, plan) for query, plan in captured
+                  if any(node.get("Relation Name") == "tasks" for node in _nodes(plan))]
+    assert task_plans, "функция не обращалась к таблице tasks"
+    for query, plan in task_plans:
+        nodes = [node for node in _nodes(plan) if node.get("Relation Name") == "tasks"]
+        assert not any(node["Node Type"] == "Seq Scan" for node in nodes), f"перебор tasks: {query}"
+        assert any(node["Node Type"] in INDEX_NODES for node in nodes), f"нет индекса по tasks: {query}"
+
+
+CALLS = {
+    "month_counts": lambda db, subject_id: db.get_tasks_for_month(TODAY.year, TODAY.month),
+    "events_for_date": lambda db, subject_id: db.get_events_for_date(TODAY),
+    "today_tasks": lambda db, subject_id: db.get_today_tasks(TODAY),
+    "upcoming_deadlines": lambda db, subject_id: db.get_upcoming_deadlines(TODAY),
+    "next_exam": lambda db, subject_id: db.get_next_exam(TODAY),
+    "subject_and_date": lambda db, subject_id: db.get_tasks_by_subject_and_date(subject_id, TODAY),
+    # главный экран грузится одним снимком с теми же условиями
+    "dashboard_snapshot": lambda db, subject_id: db.get_dashboard_snapshot.uncached(TODAY),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CALLS))
+def test_due_date_filters_use_indexes(db, subject_id, plans, name):
+    CALLS[name](db, subject_id)
+    assert_index_scans(plans)
+
@@ -0,0 +1,57 @@
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("dateutil")
+
+import database  # noqa: E402
+
+
+def test_weekly_occurrences_in_window(fake_db):
+    fake_db.add_template(1, datetime(2026, 9, 1, 10, 0))
+    occurrences = database.expand_occurrences(datetime(2026, 9, 1), datetime(2026, 9, 22))
+    assert [o["due_date"] for o in occurrences] == [
+        datetime(2026, 9, 1, 10, 0), datetime(2026, 9, 8, 10, 0), datetime(2026, 9, 15, 10, 0)]
+    assert all(o["recurrence_parent_id"] == 1 and o["is_occurrence"] for o in occurrences)
+    assert "overrides" not in occurrences[0]
+
+
+def test_window_end_is_exclusive(fake_db):
+    fake_db.add_template(1, datetime(2026, 9, 1, 0, 0))
+    occurrences = database.expand_occurrences(datetime(2026, 9, 2), datetime(2026, 9, 8))
+    assert occurrences == []
+
+
+def test_materialized_dates_are_skipped(fake_db):
+    fake_db.add_template(1, datetime(2026, 9, 1, 10, 0), overrides=[datetime(2026, 9, 8, 10, 0)])
+    occurrences = database.expand_occurrences(datetime(2026, 9, 1), datetime(2026, 9, 16))
+    assert [o["due_date"].day for o in occurrences] == [1, 15]
+
+
+def test_occurrences_per_view_are_capped(fake_db):
+    fake_db.add_template(1, datetime(2026, 1, 1), recurrence="FREQ=HOURLY")
+    occurrences = database.expand_occurrences(datetime(2026, 1, 1), datetime(2027, 1, 1))
+    assert len(occurrences) == database.MAX_OCCURRENCES_PER_VIEW
+
+
+def test_predicate_and_next_occurrence(fake_db):
+    fake_db.add_template(1, datetime(2026, 9, 1, 10, 0))
+    fake_db.add_template(2, datetime(2026, 9, 3, 9, 0), type="exam")
+    exams = database.next_occurrences(datetime(2026, 9, 10), database._is_exam_template)
+    assert [(o["id"], o["due_date"]) for o in exams] == [(2, datetime(2026, 9, 10, 9, 0))]
+
+
+def test_counts_add_occurrences(fake_db):
+    fake_db.add_template(1, datetime(2026, 9, 1, 10, 0))
+    counts = database._count_occurrences({date(2026, 9, 1): 2}, datetime(2026, 9, 1), datetime(2026, 9, 10))
+    assert counts == {date(2026, 9, 1): 3, date(2026, 9, 8): 1}
+
+
+def test_next_occurrence_of_one_template(fake_db):
+    fake_db.add_template(1, datetime(2026, 9, 1, 10, 0), overrides=[datetime(2026, 9, 15, 10, 0)])
+    fake_db.add_template(2, datetime(2026, 9, 2, 10, 0))
+    occurrence = database.get_next_occurrence(1, datetime(2026, 9, 9))
+    # 15 сентября уже стало отдельной строкой - следующее свободное повторение 22-го
+    assert (occurrence["recurrence_parent_id"], occurrence["due_date"]) == (1, datetime(2026, 9, 22, 10, 0))
+    assert database.get_next_occurrence(3, datetime(2026, 9, 9)) is None
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("kivy")
+pytest.importorskip("psycopg2")
+
+import reminders  # noqa: E402
+
+
+@pytest.fixture
+def scheduler(monkeypatch, fake_db, fake_clock, fake_loader):
+    monkeypatch.setattr(reminders, "Clock", fake_clock)
+    scheduler = reminders.ReminderScheduler()
+    scheduler.loader = fake_loader
+    scheduler.running = True
+    scheduler.clock = fake_clock
+    return scheduler
+
+
+def load_window(scheduler, rows, hours=12):
+    scheduler._apply_window((rows, None), datetime.now() + timedelta(hours=hours))
+
+
+def test_timer_targets_earliest_reminder(scheduler, fake_db):
+    load_window(scheduler, [fake_db.add_reminder(1, 30), fake_db.add_reminder(2, 10)])
+    timer = scheduler.clock.events[-1]
+    assert not timer.cancelled
+    assert 9 * 60 < timer.delay <= 10 * 60
+    assert scheduler._top()[1] == 2
+
+
+def test_unschedule_and_reschedule_are_lazy(scheduler, fake_db):
+    load_window(scheduler, [fake_db.add_reminder(1, 10), fake_db.add_reminder(2, 20)])
+    scheduler.unschedule(1)
+    assert scheduler._top()[1] == 2
+    # перенос: старая запись в куче остаётся, но пропускается
+    scheduler.schedule(fake_db.add_reminder(2, 40))
+    assert scheduler.pending_count() == 1
+    assert 39 * 60 < scheduler.clock.events[-1].delay <= 40 * 60
+
+
+def test_reminder_after_window_waits_for_its_window(scheduler, fake_db):
+    load_window(scheduler, [], hours=1)
+    scheduler.schedule(fake_db.add_reminder(1, 120))
+    assert scheduler.pending_count() == 0
+
+
+def test_full_batch_continues_from_last_row(scheduler, fake_db, monkeypatch):
+    monkeypatch.setattr(reminders, "REMINDER_BATCH", 2)
+    rows = [fake_db.add_reminder(1, 10), fake_db.add_reminder(2, 20)]
+    load_window(scheduler, rows)
+    assert scheduler._loaded_until == (rows[-1]["reminder_time"], 2)
+
+
+def test_wake_fires_due_reminders_in_order(scheduler, fake_db):
+    fired = []
+    scheduler.bind(fired.append)
+    load_window(scheduler, [fake_db.add_reminder(1, -1, "первое"), fake_db.add_reminder(2, -2, "второе"),
+                            fake_db.add_reminder(3, 30)])
+    scheduler._wake(0)
+    assert [r["id"] for r in fired] == [2, 1]
+    assert scheduler.pending_count() == 1
+    key, _, _ = scheduler.loader.jobs[-1]
+    assert key == ("fired", 2)
+
+
+def test_refresh_cancels_armed_timer(scheduler, fake_db):
+    load_window(scheduler, [fake_db.add_reminder(1, -1)])
+    timer = scheduler.clock.events[-1]
+    scheduler.refresh()
+    assert timer.cancelled
+    assert scheduler._loaded_until is None
+    # запоздавший таймер до загрузки нового окна ничего не делает
+    scheduler._wake(0)
+    assert scheduler.pending_count() == 0
+
+
+def test_first_window_skips_reminders_missed_long_ago(scheduler, fake_db):
+    # приложение было закрыто: старые напоминания в базе так и не сработали
+    grace_minutes = reminders.REMINDER_GRACE.total_seconds() / 60
+    fake_db.add_reminder(1, -3 * 24 * 60)
+    fake_db.add_reminder(2, -grace_minutes - 5)
+    fake_db.add_reminder(3, -5)
+    fake_db.add_reminder(4, 30)
+    fired = []
+    scheduler.bind(fired.append)
+    scheduler.start()
+    scheduler.loader.run("window")
+    scheduler._wake(0)
+    assert [r["id"] for r in fired] == [3]
+    assert scheduler.pending_count() == 1
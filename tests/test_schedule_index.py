@@ -0,0 +1,115 @@
+import random
+from datetime import date, time
+
+import pytest
+
+from schedule_index import ScheduleIndex, WeekTypeIndex, academic_week, as_time, conflict_text, week_type
+
+
+def entry(entry_id, day, start, end, **fields):
+    return dict(id=entry_id, day_of_week=day, start_time=as_time(start), end_time=as_time(end), **fields)
+
+
+def brute_conflicts(entries, day, start, end, exclude_id=None):
+    return sorted(e["id"] for e in entries
+                  if e["day_of_week"] == day and e["id"] != exclude_id
+                  and e["start_time"] < end and start < e["end_time"])
+
+
+def test_touching_pairs_do_not_conflict():
+    index = ScheduleIndex([entry(1, 0, "09:00", "10:30"), entry(2, 0, "10:40", "12:10")])
+    assert index.conflicts(0, "10:30", "10:40") == []
+    assert [e["id"] for e in index.conflicts(0, "10:00", "10:45")] == [1, 2]
+    assert index.conflicts(1, "10:00", "10:45") == []
+
+
+def test_exclude_id_skips_edited_pair():
+    index = ScheduleIndex([entry(1, 2, "09:00", "10:30")])
+    assert index.conflicts(2, "09:15", "10:45", exclude_id=1) == []
+
+
+def test_remove():
+    index = ScheduleIndex([entry(1, 0, "09:00", "10:30")])
+    index.remove(1)
+    assert index.conflicts(0, "09:00", "10:30") == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_brute_force(seed):
+    rnd = random.Random(seed)
+    entries = []
+    for entry_id in range(rnd.randint(0, 25)):
+        start = rnd.randint(8 * 60, 18 * 60)
+        end = start + rnd.randint(30, 120)
+        entries.append(entry(entry_id, rnd.randint(0, 2), time(start // 60, start % 60),
+                             time(end // 60, end % 60)))
+    index = ScheduleIndex(entries)
+    for _ in range(20):
+        start = rnd.randint(8 * 60, 20 * 60)
+        end = min(start + rnd.randint(1, 180), 23 * 60 + 59)
+        day = rnd.randint(0, 2)
+        start_time, end_time = time(start // 60, start % 60), time(end // 60, end % 60)
+        exclude_id = rnd.choice([None] + [e["id"] for e in entries])
+        found = index.conflicts(day, start_time, end_time, exclude_id)
+        assert sorted(e["id"] for e in found) == brute_conflicts(entries, day, start_time, end_time, exclude_id)
+
+
+def test_validate_batch():
+    index = ScheduleIndex([entry(1, 0, "09:00", "10:30", subject_name="Матанализ")])
+    batch = [
+        entry(None, 0, "10:00", "11:00"),  # пересекается с сохранённой парой
+        entry(None, 1, "12:00", "11:00"),  # конец раньше начала
+        entry(None, 2, "09:00", "10:30"),
+        entry(None, 2, "10:00", "11:00"),  # пересекается с предыдущей парой пакета
+    ]
+    result = index.validate(batch)
+    assert [(item["entry"]["day_of_week"], item["reason"]) for item in result] == [
+        (0, "пересечение"), (1, "начало не раньше конца"), (2, "пересечение")]
+    assert conflict_text(result[0]["conflicts"][0]) == "Матанализ 09:00–10:30"
+
+
+# --- типы недель и даты действия ---
+
+def test_academic_weeks_start_on_first_of_september():
+    # 1 сентября 2025 - понедельник; 31 августа ещё относится к прошлому учебному году
+    assert academic_week(date(2025, 9, 1)) == 1
+    assert academic_week(date(2025, 9, 8)) == 2
+    assert academic_week(date(2025, 8, 31)) == 53
+    # 1 сентября 2026 - вторник: первая неделя начинается с понедельника 31 августа
+    assert academic_week(date(2026, 8, 31)) == 1
+    assert week_type(date(2026, 9, 6)) == "odd"
+    assert week_type(date(2026, 9, 7)) == "even"
+
+
+def test_odd_and_even_pairs_share_a_slot():
+    index = ScheduleIndex([entry(1, 0, "09:00", "10:30", week_type="odd")])
+    assert index.conflicts(0, "09:00", "10:30", week_type="even") == []
+    assert [e["id"] for e in index.conflicts(0, "09:00", "10:30", week_type="odd")] == [1]
+    # пара каждую неделю пересекается с парой любого типа недели
+    assert [e["id"] for e in index.conflicts(0, "09:00", "10:30")] == [1]
+
+
+def test_pairs_of_different_terms_share_a_slot():
+    index = ScheduleIndex([entry(1, 0, "09:00", "10:30",
+                                 valid_from=date(2026, 9, 1), valid_until=date(2026, 12, 31))])
+    assert index.conflicts(0, "09:00", "10:30", valid_from=date(2027, 2, 1)) == []
+    assert len(index.conflicts(0, "09:00", "10:30", valid_until=date(2026, 9, 1))) == 1
+    assert len(index.conflicts(0, "09:00", "10:30", valid_from="01.12.2026")) == 1
+
+
+def test_week_type_index_resolves_dates():
+    entries = [
+        entry(1, 0, "10:40", "12:10", week_type="odd"),
+        entry(2, 0, "09:00", "10:30"),
+        entry(3, 0, "10:40", "12:10", week_type="even", valid_until=date(2026, 9, 30)),
+    ]
+    index = WeekTypeIndex(entries)
+    odd_monday, even_monday = date(2026, 8, 31), date(2026, 9, 7)
+    assert [e["id"] for e in index.on_date(odd_monday)] == [2, 1]
+    assert [e["id"] for e in index.on_date(even_monday)] == [2, 3]
+    # 5 октября - чётная неделя, но чётная пара уже закончилась
+    assert [e["id"] for e in index.on_date(date(2026, 10, 5))] == [2]
+    assert [e["id"] for e in index.on_date(date(2026, 10, 12))] == [2, 1]
+    assert index.on_date(date(2026, 9, 1)) == []
+    assert [e["id"] for e in index.by_day(0)] == [2, 1, 3]
+    assert [e["id"] for e in index.by_day(0, "even")] == [2, 3]
@@ -0,0 +1,147 @@
+from datetime import date, timedelta
+from kivy.metrics import dp
+from kivy.properties import BooleanProperty, DictProperty, ListProperty, NumericProperty, ObjectProperty
+from kivymd.uix.button import MDFlatButton
+from kivymd.uix.gridlayout import MDGridLayout
+from kivymd.uix.label import MDLabel
+from frame_monitor import track
+
+WEEK_DAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+CELLS = 42  # 6 недель по 7 дней
+
+
+class CalendarHeaderLabel(MDLabel):
+    """Название дня недели над сеткой"""
+
+
+class CalendarCell(MDFlatButton):
+    """Ячейка дня в CalendarGrid: создаётся один раз, при смене месяца меняются только данные"""
+    date = ObjectProperty(None, allownone=True)
+    in_month = BooleanProperty(False)  # день показанного месяца (а не соседнего)
+    is_today = BooleanProperty(False)
+    selected = BooleanProperty(False)
+    density = NumericProperty(0)  # число событий в этот день
+    classes = NumericProperty(0)  # число пар расписания в этот день
+    grid = ObjectProperty(None, allownone=True)
+
+    def update_appearance(self):
+        grid = self.grid
+        if not self.in_month:
+            self.md_bg_color = (0, 0, 0, 0)
+            self.text_color = grid.other_month_color
+        elif self.selected:
+            self.md_bg_color = grid.selected_color
+            self.text_color = (1, 1, 1, 1)
+        else:
+            if self.is_today:
+                self.md_bg_color = grid.today_color
+            elif self.density:
+                self.md_bg_color = grid.event_color
+            elif self.classes:
+                self.md_bg_color = grid.class_color
+            else:
+                self.md_bg_color = (0, 0, 0, 0)
+            self.text_color = grid.day_color
+
+    def on_release(self):
+        self.grid.day_pressed(self)
+
+
+class CalendarGrid(MDGridLayout):
+    """Сетка месяца: строка дней недели и 42 ячейки, созданные один раз.
+
+    show_month() перепривязывает ячейки к другому месяцу без создания виджетов.
+    density - {date: число событий}, дни с событиями подсвечиваются;
+    classes - {date: число пар}, дни только с парами подсвечиваются слабее;
+    on_day_selected(date) - нажатие на день показанного месяца.
+    """
+    year = NumericProperty(0)
+    month = NumericProperty(0)
+    density = DictProperty({})
+    classes = DictProperty({})
+    selected_date = ObjectProperty(None, allownone=True)
+    selectable = BooleanProperty(False)  # нажатый день остаётся выделенным
+    show_today = BooleanProperty(True)
+    cell_height = NumericProperty(dp(36))
+
+    header_color = ListProperty([0.3, 0.3, 0.3, 1])
+    day_color = ListProperty([0.2, 0.2, 0.2, 1])
+    other_month_color = ListProperty([0.7, 0.7, 0.7, 1])
+    event_color = ListProperty([0.2, 0.6, 0.8, 0.3])
+    class_color = ListProperty([0.3, 0.6, 0.5, 0.12])
+    today_color = ListProperty([0.2, 0.8, 0.2, 0.3])
+    selected_color = ListProperty([0.5, 0.3, 0.7, 1])
+
+    __events__ = ("on_day_selected",)
+
+    def __init__(self, **kwargs):
+        self.headers = []
+        self.cells = []
+        super().__init__(**kwargs)
+
+    def on_kv_post(self, base_widget):
+        for name in WEEK_DAYS:
+            label = CalendarHeaderLabel(text=name, text_color=self.header_color)
+            self.headers.append(label)
+            self.add_widget(label)
+        for _ in range(CELLS):
+            cell = CalendarCell(grid=self)
+            self.cells.append(cell)
+            self.add_widget(cell)
+        if self.month:
+            self.rebind()
+
+    @track
+    def show_month(self, year, month, density=None, classes=None):
+        """Показывает месяц; density и classes - события и пары его дней (если известны)"""
+        self.year, self.month = year, month
+        if density is not None:
+            self.density = density
+        if classes is not None:
+            self.classes = classes
+        self.rebind()
+
+    def rebind(self):
+        """Привязывает ячейки к дням показанного месяца (неделя с понедельника)"""
+        first = date(self.year, self.month, 1)
+        start = first - timedelta(days=first.weekday())
+        today = date.today()
+        for index, cell in enumerate(self.cells):
+            day = start + timedelta(days=index)
+            cell.date = day
+            cell.text = str(day.day)
+            cell.in_month = day.month == self.month
+            cell.is_today = self.show_today and day == today
+            cell.selected = cell.in_month and day == self.selected_date
+            cell.density = self.density.get(day, 0) if cell.in_month else 0
+            cell.classes = self.classes.get(day, 0) if cell.in_month else 0
+            cell.update_appearance()
+
+    def on_density(self, instance, density):
+        for cell in self.cells:
+            cell.density = density.get(cell.date, 0) if cell.in_month else 0
+            cell.update_appearance()
+
+    def on_classes(self, instance, classes):
+        for cell in self.cells:
+            cell.classes = classes.get(cell.date, 0) if cell.in_month else 0
+            cell.update_appearance()
+
+    def on_selected_date(self, instance, selected_date):
+        for cell in self.cells:
+            cell.selected = cell.in_month and cell.date == selected_date
+            cell.update_appearance()
+
+    def on_header_color(self, instance, color):
+        for label in self.headers:
+            label.text_color = color
+
+    def day_pressed(self, cell):
+        if not cell.in_month:
+            return
+        if self.selectable:
+            self.selected_date = cell.date
+        self.dispatch("on_day_selected", cell.date)
+
+    def on_day_selected(self, day):
+        pass
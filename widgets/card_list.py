@@ -0,0 +1,99 @@
+from kivy.properties import BooleanProperty, NumericProperty, ObjectProperty, StringProperty
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.card import MDCard
+from frame_monitor import track
+
+
+class ListCard(RecycleDataViewBehavior, MDCard):
+    """Базовая карточка списка CardList: виджет переиспользуется, меняются только данные строки"""
+    row_id = NumericProperty(0)
+    sort_key = ObjectProperty(None, allownone=True)
+    screen = ObjectProperty(None, allownone=True)
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.screen = rv.screen
+        return super().refresh_view_attrs(rv, index, data)
+
+
+class CardList(RecycleView):
+    """Виртуализированный список карточек: виджеты создаются только для видимых строк.
+
+    data - список словарей (ключи - свойства карточки viewclass, плюс height),
+    screen - экран, методы которого вызывают кнопки карточек.
+    Строки упорядочены как ORDER BY sort_key, row_id (NULL в конце), что
+    позволяет точечно вставлять, обновлять и удалять их по row_id.
+    """
+    screen = ObjectProperty(None, allownone=True)
+    sort_descending = BooleanProperty(False)
+
+    @track
+    def set_rows(self, rows):
+        self.data = list(rows)
+
+    def append_rows(self, rows):
+        self.data.extend(rows)
+
+    def index_of(self, row_id):
+        for index, row in enumerate(self.data):
+            if row['row_id'] == row_id:
+                return index
+        return None
+
+    def _precedes(self, a, b):
+        """Стоит ли строка a раньше строки b"""
+        key_a, key_b = a.get('sort_key'), b.get('sort_key')
+        if (key_a is None) != (key_b is None):
+            return key_b is None
+        if key_a is None:
+            key_a = key_b = 0
+        if self.sort_descending:
+            return (key_a, a['row_id']) > (key_b, b['row_id'])
+        return (key_a, a['row_id']) < (key_b, b['row_id'])
+
+    def upsert_row(self, row, has_more=False):
+        """Вставляет новую или обновляет существующую строку, сохраняя порядок.
+
+        has_more - загружены не все страницы: строку, которая встала бы в самый
+        конец, не показываем, она придёт со следующей страницей.
+        """
+        old_index = self.index_of(row['row_id'])
+        if old_index is not None:
+            rest = self.data[:old_index] + self.data[old_index + 1:]
+        else:
+            rest = self.data
+        index = next((i for i, other in enumerate(rest) if self._precedes(row, other)), len(rest))
+
+        if old_index == index:
+            # порядок не изменился - обновляется одна карточка
+            self.data[index] = row
+            return
+        if old_index is not None:
+            self.data.pop(old_index)
+        if index == len(rest) and has_more:
+            return
+        self.data.insert(index, row)
+
+    def remove_row(self, row_id):
+        index = self.index_of(row_id)
+        if index is not None:
+            self.data.pop(index)
+
+
+class CardActions(MDBoxLayout):
+    """Кнопки "Редактировать" / "Удалить" карточки списка"""
+    __events__ = ("on_edit", "on_delete")
+
+    def on_edit(self):
+        pass
+
+    def on_delete(self):
+        pass
+
+
+class EmptyListCard(MDCard):
+    """Сообщение о пустом списке; сворачивается, когда shown = False"""
+    title = StringProperty("")
+    hint = StringProperty("")
+    shown = BooleanProperty(True)
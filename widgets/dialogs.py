@@ -0,0 +1,107 @@
+from kivymd.uix.button import MDFlatButton, MDRaisedButton
+from kivymd.uix.dialog import MDDialog
+from frame_monitor import track
+
+PURPLE = (0.5, 0.3, 0.7, 1)
+RED = (0.8, 0.2, 0.2, 1)
+
+# Диалоги одни на всё приложение: создаются при первом показе,
+# дальше у них меняются только заголовок, текст и обработчик кнопки.
+_message_dialog = None
+_confirm_dialog = None
+_on_confirm = None
+_actions_dialog = None
+_on_edit = None
+_on_complete = None
+
+
+@track
+def show_message(title, text, button_color=PURPLE):
+    """Сообщение с кнопкой OK («Ошибка», «Успешно», «Информация»)"""
+    global _message_dialog
+    if _message_dialog is None:
+        ok_button = MDRaisedButton(
+            text="OK",
+            theme_text_color="Custom",
+            text_color=(1, 1, 1, 1),
+            on_release=lambda x: _message_dialog.dismiss()
+        )
+        _message_dialog = MDDialog(title=title, text=text, buttons=[ok_button])
+    _message_dialog.title = title
+    _message_dialog.text = text
+    _message_dialog.buttons[0].md_bg_color = button_color
+    _message_dialog.open()
+    return _message_dialog
+
+
+@track
+def confirm(title, text, on_confirm, action_text="Удалить"):
+    """Подтверждение действия: «Отмена» и красная кнопка action_text.
+
+    on_confirm() вызывается по нажатию кнопки действия, закрыть диалог -
+    забота вызывающего (как и раньше с self.dialog).
+    """
+    global _confirm_dialog, _on_confirm
+    if _confirm_dialog is None:
+        cancel_button = MDFlatButton(
+            text="Отмена",
+            theme_text_color="Custom",
+            text_color=PURPLE,
+            on_release=lambda x: _confirm_dialog.dismiss()
+        )
+        action_button = MDRaisedButton(
+            text=action_text,
+            md_bg_color=RED,
+            theme_text_color="Custom",
+            text_color=(1, 1, 1, 1),
+            on_release=lambda x: _on_confirm()
+        )
+        _confirm_dialog = MDDialog(title=title, text=text, buttons=[cancel_button, action_button])
+    _on_confirm = on_confirm
+    _confirm_dialog.title = title
+    _confirm_dialog.text = text
+    _confirm_dialog.buttons[1].text = action_text
+    _confirm_dialog.open()
+    return _confirm_dialog
+
+
+def _run_action(handler):
+    _actions_dialog.dismiss()
+    handler()
+
+
+@track
+def task_actions(title, text, on_edit, on_complete):
+    """Действия с задачей: «Отмена», «Изменить» и «Выполнить».
+
+    Диалог закрывается до вызова обработчика.
+    """
+    global _actions_dialog, _on_edit, _on_complete
+    if _actions_dialog is None:
+        cancel_button = MDFlatButton(
+            text="Отмена",
+            theme_text_color="Custom",
+            text_color=PURPLE,
+            on_release=lambda x: _actions_dialog.dismiss()
+        )
+        edit_button = MDFlatButton(
+            text="Изменить",
+            theme_text_color="Custom",
+            text_color=PURPLE,
+            on_release=lambda x: _run_action(_on_edit)
+        )
+        complete_button = MDRaisedButton(
+            text="Выполнить",
+            md_bg_color=PURPLE,
+            theme_text_color="Custom",
+            text_color=(1, 1, 1, 1),
+            on_release=lambda x: _run_action(_on_complete)
+        )
+        _actions_dialog = MDDialog(title=title, text=text,
+                                   buttons=[cancel_button, edit_button, complete_button])
+    _on_edit = on_edit
+    _on_complete = on_complete
+    _actions_dialog.title = title
+    _actions_dialog.text = text
+    _actions_dialog.open()
+    return _actions_dialog
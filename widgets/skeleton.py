@@ -0,0 +1,21 @@
+from kivy.properties import BooleanProperty, NumericProperty
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.card import MDCard
+
+
+class SkeletonCard(MDCard):
+    """Серая заглушка карточки, пока данные загружаются"""
+
+
+class SkeletonLine(MDBoxLayout):
+    """Серая заглушка строки списка"""
+
+
+class SkeletonList(MDBoxLayout):
+    """Несколько заглушек карточек; сворачивается, когда shown = False"""
+    shown = BooleanProperty(False)
+    count = NumericProperty(3)
+
+    def on_kv_post(self, base_widget):
+        for _ in range(int(self.count)):
+            self.add_widget(SkeletonCard())
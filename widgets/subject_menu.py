@@ -0,0 +1,58 @@
+from kivy.metrics import dp
+from kivymd.uix.menu import MDDropdownMenu
+from frame_monitor import track
+
+
+class SubjectMenu:
+    """Выпадающий список предметов, который переиспользуется между открытиями.
+
+    Пункты перестраиваются только в set_subjects() и только если список
+    предметов (или текст пунктов) изменился; open() ничего не создаёт.
+    """
+
+    def __init__(self, on_select, item_text=None, empty_text="Без предмета", **menu_kwargs):
+        self.on_select = on_select
+        self.item_text = item_text or (lambda subject: subject["name"])
+        self.empty_text = empty_text  # пункт «без предмета» (None - не нужен)
+        self.menu_kwargs = dict(width_mult=4, max_height=dp(200), **menu_kwargs)
+        self.menu = None
+        self._items_key = None
+
+    @track
+    def set_subjects(self, subjects):
+        texts = [self.item_text(subject) for subject in subjects]
+        items_key = tuple(zip((subject["id"] for subject in subjects), texts))
+        if items_key == self._items_key:
+            return
+        self._items_key = items_key
+
+        items = [
+            {
+                "text": text,
+                "viewclass": "OneLineListItem",
+                "on_release": lambda x=subject: self.on_select(x),
+            } for subject, text in zip(subjects, texts)
+        ]
+        if self.empty_text:
+            items.append({
+                "text": self.empty_text,
+                "viewclass": "OneLineListItem",
+                "on_release": lambda x=None: self.on_select(None),
+            })
+
+        if self.menu is None:
+            self.menu = MDDropdownMenu(items=items, **self.menu_kwargs)
+        else:
+            self.menu.items = items
+
+    @property
+    def ready(self):
+        return self.menu is not None
+
+    def open(self, caller):
+        self.menu.caller = caller
+        self.menu.open()
+
+    def dismiss(self):
+        if self.menu is not None:
+            self.menu.dismiss()